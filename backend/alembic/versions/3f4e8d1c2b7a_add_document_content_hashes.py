@@ -0,0 +1,30 @@
+"""Add document content hashes
+
+Revision ID: 3f4e8d1c2b7a
+Revises: 8987770549c0
+Create Date: 2024-02-21 14:02:51.283761
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f4e8d1c2b7a"
+down_revision = "8987770549c0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "document",
+        sa.Column("chunk_hashes", postgresql.ARRAY(sa.String()), nullable=True),
+    )
+    op.add_column("document", sa.Column("metadata_hash", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("document", "metadata_hash")
+    op.drop_column("document", "chunk_hashes")
@@ -0,0 +1,28 @@
+"""Add chunk counts to document
+
+Revision ID: 3f9a7c2d6e1b
+Revises: 8d3b6f0a1c2e
+Create Date: 2024-02-28 11:17:45.902614
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f9a7c2d6e1b"
+down_revision = "8d3b6f0a1c2e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "document",
+        sa.Column("chunk_counts", postgresql.JSONB(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("document", "chunk_counts")
@@ -0,0 +1,42 @@
+"""Key document content hashes by index name
+
+Revision ID: 5b2e9c4a7d10
+Revises: 3f9a7c2d6e1b
+Create Date: 2024-03-04 10:26:13.518237
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5b2e9c4a7d10"
+down_revision = "3f9a7c2d6e1b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The hashes are only used to skip unchanged content, dropping them just means the
+    # next indexing of each document does the full work once
+    op.drop_column("document", "metadata_hash")
+    op.drop_column("document", "chunk_hashes")
+    op.add_column(
+        "document",
+        sa.Column("chunk_hashes", postgresql.JSONB(), nullable=True),
+    )
+    op.add_column(
+        "document",
+        sa.Column("metadata_hashes", postgresql.JSONB(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("document", "metadata_hashes")
+    op.drop_column("document", "chunk_hashes")
+    op.add_column(
+        "document",
+        sa.Column("chunk_hashes", postgresql.ARRAY(sa.String()), nullable=True),
+    )
+    op.add_column("document", sa.Column("metadata_hash", sa.String(), nullable=True))
@@ -0,0 +1,28 @@
+"""Add checkpoint to index attempt
+
+Revision ID: 5c7e2a9d4b1f
+Revises: 9b2c6f1e4a3d
+Create Date: 2024-02-26 14:02:31.518244
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5c7e2a9d4b1f"
+down_revision = "9b2c6f1e4a3d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "index_attempt",
+        sa.Column("checkpoint", postgresql.JSONB(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("index_attempt", "checkpoint")
@@ -0,0 +1,30 @@
+"""Add rate limit bucket
+
+Revision ID: 8d3b6f0a1c2e
+Revises: 5c7e2a9d4b1f
+Create Date: 2024-02-27 09:41:12.330571
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8d3b6f0a1c2e"
+down_revision = "5c7e2a9d4b1f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rate_limit_bucket",
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rate_limit_bucket")
@@ -0,0 +1,27 @@
+"""Add checkpoint config hash to index attempt
+
+Revision ID: 8d3f1b6c2a47
+Revises: 5b2e9c4a7d10
+Create Date: 2024-03-05 09:41:52.204617
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8d3f1b6c2a47"
+down_revision = "5b2e9c4a7d10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "index_attempt",
+        sa.Column("checkpoint_config_hash", sa.String(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("index_attempt", "checkpoint_config_hash")
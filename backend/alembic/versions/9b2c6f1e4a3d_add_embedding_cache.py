@@ -0,0 +1,55 @@
+"""Add embedding cache
+
+Revision ID: 9b2c6f1e4a3d
+Revises: 3f4e8d1c2b7a
+Create Date: 2024-02-22 10:17:44.602915
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9b2c6f1e4a3d"
+down_revision = "3f4e8d1c2b7a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "embedding_cache",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("model_name", sa.String(), nullable=False),
+        sa.Column("normalize", sa.Boolean(), nullable=False),
+        sa.Column("prefix", sa.String(), nullable=False),
+        sa.Column("text_hash", sa.String(), nullable=False),
+        sa.Column("embedding", sa.LargeBinary(), nullable=False),
+        sa.Column(
+            "last_accessed",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "model_name",
+            "normalize",
+            "prefix",
+            "text_hash",
+            name="_embedding_cache_key_uc",
+        ),
+    )
+    op.create_index(
+        op.f("ix_embedding_cache_last_accessed"),
+        "embedding_cache",
+        ["last_accessed"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_embedding_cache_last_accessed"), table_name="embedding_cache"
+    )
+    op.drop_table("embedding_cache")
@@ -15,11 +15,11 @@ from danswer.configs.app_configs import JOB_TIMEOUT
 from danswer.connectors.file.utils import file_age_in_hours
 from danswer.db.connector_credential_pair import get_connector_credential_pair
 from danswer.db.deletion_attempt import check_deletion_attempt_is_allowed
+from danswer.db.document import get_index_info_for_documents
 from danswer.db.document import prepare_to_modify_documents
 from danswer.db.document_set import delete_document_set
 from danswer.db.document_set import fetch_document_sets
-from danswer.db.document_set import fetch_document_sets_for_documents
-from danswer.db.document_set import fetch_documents_for_document_set
+from danswer.db.document_set import fetch_documents_for_changed_cc_pairs
 from danswer.db.document_set import get_document_set_by_id
 from danswer.db.document_set import mark_document_set_as_synced
 from danswer.db.engine import build_connection_string
@@ -30,7 +30,12 @@ from danswer.db.tasks import check_live_task_not_timed_out
 from danswer.db.tasks import get_latest_task
 from danswer.document_index.document_index_utils import get_both_index_names
 from danswer.document_index.factory import get_default_document_index
+from danswer.document_index.interfaces import ChunkSelection
+from danswer.document_index.interfaces import SelectionUpdateProgress
+from danswer.document_index.interfaces import SelectionUpdateRequest
 from danswer.document_index.interfaces import UpdateRequest
+from danswer.dynamic_configs import get_dynamic_config_store
+from danswer.dynamic_configs.interface import ConfigNotFoundError
 from danswer.utils.batching import batch_generator
 from danswer.utils.logger import setup_logger
 
@@ -108,12 +113,9 @@ def sync_document_set_task(document_set_id: int) -> None:
             )
 
             # get current state of document sets for these documents
-            document_set_map = {
-                document_id: document_sets
-                for document_id, document_sets in fetch_document_sets_for_documents(
-                    document_ids=document_ids, db_session=db_session
-                )
-            }
+            document_index_info = get_index_info_for_documents(
+                document_ids=document_ids, db_session=db_session
+            )
 
             # update Vespa
             curr_ind_name, sec_ind_name = get_both_index_names(db_session)
@@ -123,18 +125,68 @@ def sync_document_set_task(document_set_id: int) -> None:
             update_requests = [
                 UpdateRequest(
                     document_ids=[document_id],
-                    document_sets=set(document_set_map.get(document_id, [])),
+                    document_sets=document_index_info[document_id].document_sets
+                    if document_id in document_index_info
+                    else set(),
+                    chunk_counts={
+                        document_id: document_index_info[document_id].chunk_counts
+                    }
+                    if document_id in document_index_info
+                    else None,
                 )
                 for document_id in document_ids
             ]
             document_index.update(update_requests=update_requests)
 
+    def _remove_document_set_from_index(document_set_name: str) -> None:
+        """The rows linking a deleted document set to its documents are already gone, so
+        the set is removed from every chunk that has it with a selection update instead.
+        Progress is stored so a retried task picks up where the failed one stopped"""
+        progress_key = f"document_set_removal_progress_{document_set_id}"
+        dynamic_config_store = get_dynamic_config_store()
+        try:
+            progress = SelectionUpdateProgress(
+                **cast(dict, dynamic_config_store.load(progress_key))
+            )
+            logger.info(f"Resuming removal of document set '{document_set_name}'")
+        except ConfigNotFoundError:
+            progress = SelectionUpdateProgress()
+
+        def _store_progress(progress: SelectionUpdateProgress) -> None:
+            dynamic_config_store.store(
+                progress_key,
+                {
+                    "continuations": progress.continuations,
+                    "num_chunks_updated": progress.num_chunks_updated,
+                },
+            )
+
+        with Session(get_sqlalchemy_engine()) as db_session:
+            curr_ind_name, sec_ind_name = get_both_index_names(db_session)
+        document_index = get_default_document_index(
+            primary_index_name=curr_ind_name, secondary_index_name=sec_ind_name
+        )
+        progress = document_index.update_by_selection(
+            selection_update=SelectionUpdateRequest(
+                selection=ChunkSelection(document_set=document_set_name),
+                remove_document_sets={document_set_name},
+            ),
+            progress=progress,
+            progress_callback=_store_progress,
+        )
+        logger.info(
+            f"Removed document set '{document_set_name}' from "
+            f"{progress.num_chunks_updated} chunks"
+        )
+        dynamic_config_store.delete(progress_key)
+
     with Session(get_sqlalchemy_engine()) as db_session:
         try:
-            documents_to_update = fetch_documents_for_document_set(
-                document_set_id=document_set_id,
-                db_session=db_session,
-                current_only=False,
+            # Chunks don't record their cc pair so changes to the cc pairs of the set
+            # can't be a selection update, only the documents of the added and removed
+            # cc pairs are updated
+            documents_to_update = fetch_documents_for_changed_cc_pairs(
+                document_set_id=document_set_id, db_session=db_session
             )
             for document_batch in batch_generator(
                 documents_to_update, _SYNC_BATCH_SIZE
@@ -152,6 +204,7 @@ def sync_document_set_task(document_set_id: int) -> None:
                 ),
             )  # casting since we "know" a document set with this ID exists
             if not document_set.connector_credential_pairs:
+                _remove_document_set_from_index(document_set.name)
                 delete_document_set(
                     document_set_row=document_set, db_session=db_session
                 )
@@ -23,6 +23,7 @@ from danswer.db.document import delete_document_by_connector_credential_pair
 from danswer.db.document import delete_documents_complete
 from danswer.db.document import get_document_connector_cnts
 from danswer.db.document import get_documents_for_connector_credential_pair
+from danswer.db.document import get_index_info_for_documents
 from danswer.db.document import prepare_to_modify_documents
 from danswer.db.document_set import get_document_sets_by_ids
 from danswer.db.document_set import (
@@ -73,18 +74,29 @@ def _delete_connector_credential_pair_batch(
         document_ids_to_update = [
             document_id for document_id, cnt in document_connector_cnts if cnt > 1
         ]
+        cc_pair_to_delete = ConnectorCredentialPairIdentifier(
+            connector_id=connector_id,
+            credential_id=credential_id,
+        )
         access_for_documents = get_access_for_documents(
             document_ids=document_ids_to_update,
             db_session=db_session,
-            cc_pair_to_delete=ConnectorCredentialPairIdentifier(
-                connector_id=connector_id,
-                credential_id=credential_id,
-            ),
+            cc_pair_to_delete=cc_pair_to_delete,
+        )
+        index_info_for_documents = get_index_info_for_documents(
+            document_ids=document_ids_to_update,
+            db_session=db_session,
+            cc_pair_to_delete=cc_pair_to_delete,
         )
         update_requests = [
             UpdateRequest(
                 document_ids=[document_id],
                 access=access,
+                chunk_counts={
+                    document_id: index_info_for_documents[document_id].chunk_counts
+                }
+                if document_id in index_info_for_documents
+                else None,
             )
             for document_id, access in access_for_documents.items()
         ]
@@ -95,10 +107,7 @@ def _delete_connector_credential_pair_batch(
         delete_document_by_connector_credential_pair(
             db_session=db_session,
             document_ids=document_ids_to_update,
-            connector_credential_pair_identifier=ConnectorCredentialPairIdentifier(
-                connector_id=connector_id,
-                credential_id=credential_id,
-            ),
+            connector_credential_pair_identifier=cc_pair_to_delete,
         )
         db_session.commit()
 
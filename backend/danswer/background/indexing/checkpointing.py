@@ -2,10 +2,15 @@
 into a series of checkpoints to better handle intermittent failures
 / jobs being killed by cloud providers."""
 import datetime
+from collections import deque
+from collections.abc import Iterator
 
 from danswer.configs.app_configs import EXPERIMENTAL_CHECKPOINTING_ENABLED
 from danswer.configs.constants import DocumentSource
 from danswer.connectors.cross_connector_utils.miscellaneous_utils import datetime_to_utc
+from danswer.connectors.interfaces import ConnectorCheckpoint
+from danswer.connectors.interfaces import GenerateDocumentsOutput
+from danswer.connectors.models import Document
 
 
 def _2010_dt() -> datetime.datetime:
@@ -78,3 +83,32 @@ def get_time_windows_for_index_attempt(
         start_of_window = end_of_window
 
     return time_windows
+
+
+class ConnectorCheckpointTracker:
+    """Tracks the checkpoints yielded by a connector along with the number of documents
+    loaded up to each of them. Batches are regrouped and indexed concurrently after being
+    loaded, so a checkpoint can only be committed once that many documents have made it
+    through the whole pipeline, batches come out of the pipeline in order"""
+
+    def __init__(self) -> None:
+        # Appended to by the thread loading documents, popped by the indexing loop
+        self._pending: deque[tuple[int, ConnectorCheckpoint]] = deque()
+        self._num_docs_loaded = 0
+
+    def track(
+        self,
+        doc_batches: Iterator[tuple[list[Document], ConnectorCheckpoint | None]],
+    ) -> GenerateDocumentsOutput:
+        for doc_batch, checkpoint in doc_batches:
+            self._num_docs_loaded += len(doc_batch)
+            if checkpoint is not None:
+                self._pending.append((self._num_docs_loaded, checkpoint))
+            yield doc_batch
+
+    def pop_committable(self, num_docs_indexed: int) -> ConnectorCheckpoint | None:
+        """Latest checkpoint whose documents are all indexed, None if there is no new one"""
+        checkpoint = None
+        while self._pending and self._pending[0][0] <= num_docs_indexed:
+            _, checkpoint = self._pending.popleft()
+        return checkpoint
@@ -11,6 +11,7 @@ from typing import Literal
 
 from torch import multiprocessing
 
+from danswer.configs.app_configs import NUM_CHUNKING_WORKERS
 from danswer.utils.logger import setup_logger
 
 logger = setup_logger()
@@ -95,7 +96,10 @@ class SimpleJobClient:
         job_id = self.job_id_counter
         self.job_id_counter += 1
 
-        process = multiprocessing.Process(target=func, args=args, daemon=True)
+        # Daemonic processes can't start child processes, which chunking in parallel needs
+        process = multiprocessing.Process(
+            target=func, args=args, daemon=NUM_CHUNKING_WORKERS <= 1
+        )
         job = SimpleJob(id=job_id, process=process)
         process.start()
 
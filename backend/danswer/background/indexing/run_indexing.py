@@ -1,18 +1,25 @@
+import signal
+import threading
 import time
 import traceback
+from collections.abc import Iterator
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
+from types import FrameType
 
 import torch
 from sqlalchemy.orm import Session
 
+from danswer.background.indexing.checkpointing import ConnectorCheckpointTracker
 from danswer.background.indexing.checkpointing import get_time_windows_for_index_attempt
 from danswer.configs.app_configs import POLL_CONNECTOR_OFFSET
 from danswer.connectors.factory import instantiate_connector
-from danswer.connectors.interfaces import GenerateDocumentsOutput
+from danswer.connectors.interfaces import CheckpointedLoadConnector
+from danswer.connectors.interfaces import ConnectorCheckpoint
 from danswer.connectors.interfaces import LoadConnector
 from danswer.connectors.interfaces import PollConnector
+from danswer.connectors.models import Document
 from danswer.connectors.models import IndexAttemptMetadata
 from danswer.connectors.models import InputType
 from danswer.db.connector import disable_connector
@@ -20,17 +27,22 @@ from danswer.db.connector_credential_pair import get_last_successful_attempt_tim
 from danswer.db.connector_credential_pair import update_connector_credential_pair
 from danswer.db.credentials import backend_update_credential_json
 from danswer.db.engine import get_sqlalchemy_engine
+from danswer.db.index_attempt import get_checkpoint_to_resume_from
 from danswer.db.index_attempt import get_index_attempt
 from danswer.db.index_attempt import mark_attempt_failed
 from danswer.db.index_attempt import mark_attempt_in_progress
 from danswer.db.index_attempt import mark_attempt_succeeded
 from danswer.db.index_attempt import update_docs_indexed
+from danswer.db.index_attempt import update_index_attempt_checkpoint
 from danswer.db.models import IndexAttempt
 from danswer.db.models import IndexingStatus
 from danswer.db.models import IndexModelStatus
 from danswer.document_index.factory import get_default_document_index
+from danswer.indexing.chunker import shutdown_chunking_pools
+from danswer.indexing.document_batching import DocBatchStats
+from danswer.indexing.document_batching import rebatch_documents
 from danswer.indexing.embedder import DefaultIndexingEmbedder
-from danswer.indexing.indexing_pipeline import build_indexing_pipeline
+from danswer.indexing.pipelined_indexing import PipelinedIndexingRunner
 from danswer.utils.logger import IndexAttemptSingleton
 from danswer.utils.logger import setup_logger
 
@@ -42,8 +54,12 @@ def _get_document_generator(
     attempt: IndexAttempt,
     start_time: datetime,
     end_time: datetime,
-) -> GenerateDocumentsOutput:
-    """NOTE: `start_time` and `end_time` are only used for poll connectors"""
+    checkpoint: ConnectorCheckpoint | None = None,
+) -> Iterator[tuple[list[Document], ConnectorCheckpoint | None]]:
+    """Yields the batches of the connector along with their checkpoint, always None for
+    connectors that don't support checkpoints.
+    NOTE: `start_time` and `end_time` are only used for poll connectors, `checkpoint` only
+    for checkpointed load connectors"""
     task = attempt.connector.input_type
 
     try:
@@ -64,6 +80,11 @@ def _get_document_generator(
 
     if task == InputType.LOAD_STATE:
         assert isinstance(runnable_connector, LoadConnector)
+        if isinstance(runnable_connector, CheckpointedLoadConnector):
+            if checkpoint is not None:
+                logger.info(f"Resuming loading from checkpoint: {checkpoint}")
+            return runnable_connector.load_from_checkpoint(checkpoint)
+
         doc_batch_generator = runnable_connector.load_from_state()
 
     elif task == InputType.POLL:
@@ -83,7 +104,7 @@ def _get_document_generator(
         # Event types cannot be handled by a background type
         raise RuntimeError(f"Invalid task type: {task}")
 
-    return doc_batch_generator
+    return ((doc_batch, None) for doc_batch in doc_batch_generator)
 
 
 def _run_indexing(
@@ -126,7 +147,7 @@ def _run_indexing(
         passage_prefix=db_embedding_model.passage_prefix,
     )
 
-    indexing_pipeline = build_indexing_pipeline(
+    indexing_runner = PipelinedIndexingRunner(
         embedder=embedding_model,
         document_index=document_index,
         ignore_time_skip=index_attempt.from_beginning
@@ -146,6 +167,38 @@ def _run_indexing(
         )
     )
 
+    def _raise_if_stopped() -> None:
+        # Check if connector is disabled mid run and stop if so unless it's the secondary
+        # index being built. We want to populate it even for paused connectors
+        # Often paused connectors are sources that aren't updated frequently but the
+        # contents still need to be initially pulled.
+        db_session.refresh(db_connector)
+        if (
+            db_connector.disabled
+            and db_embedding_model.status != IndexModelStatus.FUTURE
+        ):
+            # let the `except` block handle this
+            raise RuntimeError("Connector was disabled mid run")
+
+        db_session.refresh(index_attempt)
+        if index_attempt.status != IndexingStatus.IN_PROGRESS:
+            raise RuntimeError("Index Attempt was canceled")
+
+    # A failed attempt of a checkpointed connector is resumed from its last checkpoint
+    # instead of loading everything again, unless explicitly asked to start over
+    resume_checkpoint = (
+        None
+        if index_attempt.from_beginning
+        else get_checkpoint_to_resume_from(index_attempt, db_session)
+    )
+    if resume_checkpoint is not None:
+        update_index_attempt_checkpoint(
+            db_session=db_session,
+            index_attempt=index_attempt,
+            checkpoint=resume_checkpoint,
+        )
+
+    batch_stats = DocBatchStats()
     net_doc_change = 0
     document_count = 0
     chunk_count = 0
@@ -163,45 +216,41 @@ def _run_indexing(
             datetime(1970, 1, 1, tzinfo=timezone.utc),
         )
 
-        doc_batch_generator = _get_document_generator(
-            db_session=db_session,
-            attempt=index_attempt,
-            start_time=window_start,
-            end_time=window_end,
+        checkpoint_tracker = ConnectorCheckpointTracker()
+        doc_batch_generator = checkpoint_tracker.track(
+            _get_document_generator(
+                db_session=db_session,
+                attempt=index_attempt,
+                start_time=window_start,
+                end_time=window_end,
+                # Load connectors ignore the time windows, only the first one can resume
+                checkpoint=resume_checkpoint if ind == 0 else None,
+            )
         )
+        window_document_count = 0
 
         try:
-            for doc_batch in doc_batch_generator:
-                # Check if connector is disabled mid run and stop if so unless it's the secondary
-                # index being built. We want to populate it even for paused connectors
-                # Often paused connectors are sources that aren't updated frequently but the
-                # contents still need to be initially pulled.
-                db_session.refresh(db_connector)
-                if (
-                    db_connector.disabled
-                    and db_embedding_model.status != IndexModelStatus.FUTURE
-                ):
-                    # let the `except` block handle this
-                    raise RuntimeError("Connector was disabled mid run")
-
-                db_session.refresh(index_attempt)
-                if index_attempt.status != IndexingStatus.IN_PROGRESS:
-                    raise RuntimeError("Index Attempt was canceled")
-
+            # Connector fetching, chunking, embedding and writing run concurrently, batches
+            # come back in order once they are fully indexed
+            for doc_batch, new_docs, total_batch_chunks in indexing_runner.run(
+                # Connector batches are sized by document count, the pipeline gets batches
+                # sized by content so a batch of very large documents can't exhaust memory
+                doc_batches=rebatch_documents(doc_batch_generator, stats=batch_stats),
+                index_attempt_metadata=IndexAttemptMetadata(
+                    connector_id=db_connector.id,
+                    credential_id=db_credential.id,
+                ),
+                # Checked before each batch enters the pipeline so no new work is started
+                # once the connector is disabled or the attempt is canceled
+                raise_if_stopped=_raise_if_stopped,
+            ):
                 logger.debug(
-                    f"Indexing batch of documents: {[doc.to_short_descriptor() for doc in doc_batch]}"
-                )
-
-                new_docs, total_batch_chunks = indexing_pipeline(
-                    documents=doc_batch,
-                    index_attempt_metadata=IndexAttemptMetadata(
-                        connector_id=db_connector.id,
-                        credential_id=db_credential.id,
-                    ),
+                    f"Indexed batch of documents: {[doc.to_short_descriptor() for doc in doc_batch]}"
                 )
                 net_doc_change += new_docs
                 chunk_count += total_batch_chunks
                 document_count += len(doc_batch)
+                window_document_count += len(doc_batch)
 
                 # commit transaction so that the `update` below begins
                 # with a brand new transaction. Postgres uses the start
@@ -218,6 +267,14 @@ def _run_indexing(
                     new_docs_indexed=net_doc_change,
                 )
 
+                checkpoint = checkpoint_tracker.pop_committable(window_document_count)
+                if checkpoint is not None:
+                    update_index_attempt_checkpoint(
+                        db_session=db_session,
+                        index_attempt=index_attempt,
+                        checkpoint=checkpoint,
+                    )
+
             run_end_dt = window_end
             if is_primary:
                 update_connector_credential_pair(
@@ -277,15 +334,24 @@ def _run_indexing(
     logger.info(
         f"Indexed or refreshed {document_count} total documents for a total of {chunk_count} indexed chunks"
     )
+    logger.info(f"Indexing batch sizes: {batch_stats.summary()}")
     logger.info(
         f"Connector successfully finished, elapsed time: {time.time() - start_time} seconds"
     )
 
 
+def _exit_on_sigterm(signum: int, frame: FrameType | None) -> None:
+    # Cancelled jobs are terminated, exit normally so that the cleanup below still runs
+    raise SystemExit(f"Received signal {signum}, exiting")
+
+
 def run_indexing_entrypoint(index_attempt_id: int, num_threads: int) -> None:
     """Entrypoint for indexing run when using dask distributed.
     Wraps the actual logic in a `try` block so that we can catch any exceptions
     and mark the attempt as failed."""
+    # Dask runs jobs on worker threads, handlers can only be installed on the main one
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _exit_on_sigterm)
     try:
         # set the indexing attempt ID so that all log messages from this process
         # will have it added as a prefix
@@ -321,3 +387,7 @@ def run_indexing_entrypoint(index_attempt_id: int, num_threads: int) -> None:
             )
     except Exception as e:
         logger.exception(f"Indexing job with ID '{index_attempt_id}' failed due to {e}")
+    finally:
+        # The chunking workers would outlive the job, job processes aren't daemonic when
+        # chunking in parallel
+        shutdown_chunking_pools()
@@ -99,11 +99,29 @@ VESPA_TENANT_PORT = os.environ.get("VESPA_TENANT_PORT") or "19071"
 VESPA_DEPLOYMENT_ZIP = (
     os.environ.get("VESPA_DEPLOYMENT_ZIP") or "/app/danswer/vespa-app.zip"
 )
+# If set, chunks are streamed into Vespa with a bounded number of in-flight requests over a
+# single HTTP/2 connection and failures are reported per document instead of failing the batch
+VESPA_FEED_ENABLED = os.environ.get("VESPA_FEED_ENABLED", "").lower() == "true"
+VESPA_FEED_MAX_IN_FLIGHT = int(os.environ.get("VESPA_FEED_MAX_IN_FLIGHT") or 64)
+# Limits of the keep-alive connection pool shared by all requests to Vespa in a process. Should
+# be at least the feed concurrency above, otherwise requests queue up for a free connection
+VESPA_HTTP_MAX_CONNECTIONS = int(os.environ.get("VESPA_HTTP_MAX_CONNECTIONS") or 128)
+VESPA_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("VESPA_HTTP_MAX_KEEPALIVE_CONNECTIONS") or 64
+)
+# Client side timeout of requests to Vespa, including waiting for a free connection
+VESPA_HTTP_TIMEOUT_SECONDS = float(os.environ.get("VESPA_HTTP_TIMEOUT_SECONDS") or 30)
 # Number of documents in a batch during indexing (further batching done by chunks before passing to bi-encoder)
 try:
     INDEX_BATCH_SIZE = int(os.environ.get("INDEX_BATCH_SIZE", 16))
 except ValueError:
     INDEX_BATCH_SIZE = 16
+# Connector batches are re-grouped into batches of at most this many estimated tokens (merging
+# batches of small documents, splitting batches of large ones) to bound the memory used per
+# batch. A single document is never split. Set to 0 to index the connector batches as is
+INDEX_BATCH_TOKEN_BUDGET = int(os.environ.get("INDEX_BATCH_TOKEN_BUDGET") or 200_000)
+# Upper bound on the number of documents in a re-grouped batch, regardless of their size
+INDEX_BATCH_MAX_DOCS = int(os.environ.get("INDEX_BATCH_MAX_DOCS") or 128)
 
 # Below are intended to match the env variables names used by the official postgres docker image
 # https://hub.docker.com/_/postgres
@@ -124,6 +142,17 @@ POLL_CONNECTOR_OFFSET = 30  # Minutes overlap between poll windows
 # for some connectors
 ENABLE_EXPENSIVE_EXPERT_CALLS = False
 
+# Max number of concurrent requests a connector makes to fetch the details (contents,
+# comments, labels...) of the items of a batch. Set to 1 to fetch them one at a time
+CONNECTOR_FETCH_CONCURRENCY = int(os.environ.get("CONNECTOR_FETCH_CONCURRENCY") or 8)
+
+# Where the token buckets limiting the request rate of connectors live. "memory" only limits
+# within each process, "postgres" also coordinates the indexing jobs of different processes
+# hitting the same tenant (e.g. two connectors or a primary and a secondary index build)
+CONNECTOR_RATE_LIMIT_BACKEND = (
+    os.environ.get("CONNECTOR_RATE_LIMIT_BACKEND") or "memory"
+).lower()
+
 GOOGLE_DRIVE_INCLUDE_SHARED = False
 GOOGLE_DRIVE_FOLLOW_SHORTCUTS = False
 GOOGLE_DRIVE_ONLY_ORG_PUBLIC = False
@@ -142,6 +171,22 @@ WEB_CONNECTOR_IGNORED_ELEMENTS = os.environ.get(
 WEB_CONNECTOR_OAUTH_CLIENT_ID = os.environ.get("WEB_CONNECTOR_OAUTH_CLIENT_ID")
 WEB_CONNECTOR_OAUTH_CLIENT_SECRET = os.environ.get("WEB_CONNECTOR_OAUTH_CLIENT_SECRET")
 WEB_CONNECTOR_OAUTH_TOKEN_URL = os.environ.get("WEB_CONNECTOR_OAUTH_TOKEN_URL")
+# Pages are cached here with their ETag / Last-Modified so pages the server reports as
+# unchanged aren't rendered again on every run, set to an empty string to disable the cache
+WEB_CONNECTOR_CACHE_DIR = os.environ.get(
+    "WEB_CONNECTOR_CACHE_DIR", "/home/web_connector_cache"
+)
+# Max number of pages cached per web connector, the least recently used ones are evicted
+WEB_CONNECTOR_CACHE_MAX_PAGES = int(
+    os.environ.get("WEB_CONNECTOR_CACHE_MAX_PAGES") or 10000
+)
+# Number of pages fetched / rendered at the same time. Each one gets its own browser, which
+# takes a few hundred MB, so only raise this if the indexing workers have the memory for it
+WEB_CONNECTOR_CONCURRENCY = int(os.environ.get("WEB_CONNECTOR_CONCURRENCY") or 1)
+# Minimum time between two page visits to the same host, to not overload the crawled site
+WEB_CONNECTOR_HOST_DELAY_SECONDS = float(
+    os.environ.get("WEB_CONNECTOR_HOST_DELAY_SECONDS") or 0.5
+)
 
 NOTION_CONNECTOR_ENABLE_RECURSIVE_PAGE_LOOKUP = (
     os.environ.get("NOTION_CONNECTOR_ENABLE_RECURSIVE_PAGE_LOOKUP", "").lower()
@@ -182,6 +227,18 @@ CONTINUE_ON_CONNECTOR_FAILURE = os.environ.get(
 # fairly large amount of memory in order to increase substantially, since
 # each worker loads the embedding models into memory.
 NUM_INDEXING_WORKERS = int(os.environ.get("NUM_INDEXING_WORKERS") or 1)
+# Within an indexing job, fetching from the connector, chunking, embedding and writing to the
+# document index run concurrently on consecutive batches. Number of batches fetched ahead from
+# the connector and max number of batches being processed at once (1 processes batches serially)
+INDEXING_PIPELINE_PREFETCH_BATCHES = int(
+    os.environ.get("INDEXING_PIPELINE_PREFETCH_BATCHES") or 2
+)
+INDEXING_PIPELINE_MAX_IN_FLIGHT_BATCHES = int(
+    os.environ.get("INDEXING_PIPELINE_MAX_IN_FLIGHT_BATCHES") or 3
+)
+# Number of worker processes used by an indexing job to chunk documents in parallel, each loads
+# its own tokenizer. 0 or 1 chunks within the indexing job process
+NUM_CHUNKING_WORKERS = int(os.environ.get("NUM_CHUNKING_WORKERS") or 0)
 CHUNK_OVERLAP = 0
 # More accurate results at the expense of indexing speed and index size (stores additional 4 MINI_CHUNK vectors)
 ENABLE_MINI_CHUNK = os.environ.get("ENABLE_MINI_CHUNK", "").lower() == "true"
@@ -189,6 +246,12 @@ ENABLE_MINI_CHUNK = os.environ.get("ENABLE_MINI_CHUNK", "").lower() == "true"
 # Slightly larger since the sentence aware split is a max cutoff so most minichunks will be under MINI_CHUNK_SIZE
 # tokens. But we need it to be at least as big as 1/4th chunk size to avoid having a tiny mini-chunk at the end
 MINI_CHUNK_SIZE = 150
+# Persistent cache of passage embeddings keyed by the model and the text, avoids re-embedding
+# identical texts (boilerplate, repeated messages, reindexing after a connector reset).
+# Set to "PostgresEmbeddingCache" to enable
+EMBEDDING_CACHE_TYPE = os.environ.get("EMBEDDING_CACHE_TYPE", "")
+# Max number of cached embeddings, least recently used ones are evicted past this
+EMBEDDING_CACHE_MAX_SIZE = int(os.environ.get("EMBEDDING_CACHE_MAX_SIZE") or 1_000_000)
 # Timeout to wait for job's last update before killing it, in hours
 CLEANUP_INDEXING_JOBS_TIMEOUT = int(os.environ.get("CLEANUP_INDEXING_JOBS_TIMEOUT", 3))
 
@@ -201,6 +264,11 @@ CLEANUP_INDEXING_JOBS_TIMEOUT = int(os.environ.get("CLEANUP_INDEXING_JOBS_TIMEOU
 MODEL_SERVER_HOST = os.environ.get("MODEL_SERVER_HOST") or None
 MODEL_SERVER_ALLOWED_HOST = os.environ.get("MODEL_SERVER_HOST") or "0.0.0.0"
 MODEL_SERVER_PORT = int(os.environ.get("MODEL_SERVER_PORT") or "9000")
+# Format of the embeddings returned by the model server: "float32" or "float16" for the compact
+# binary format (float16 halves the payload at a small loss of precision) or "json"
+MODEL_SERVER_EMBEDDING_FORMAT = (
+    os.environ.get("MODEL_SERVER_EMBEDDING_FORMAT") or "float32"
+).lower()
 
 # specify this env variable directly to have a different model server for the background
 # indexing job vs the api server so that background indexing does not effect query-time
@@ -11,6 +11,7 @@ SEMANTIC_IDENTIFIER = "semantic_identifier"
 TITLE = "title"
 SKIP_TITLE_EMBEDDING = "skip_title"
 SECTION_CONTINUATION = "section_continuation"
+CONTENT_HASH = "content_hash"
 EMBEDDINGS = "embeddings"
 TITLE_EMBEDDING = "title_embedding"
 ALLOWED_USERS = "allowed_users"
@@ -35,6 +35,29 @@ BATCH_SIZE_ENCODE_CHUNKS = 8
 # This controls the minimum number of pytorch "threads" to allocate to the embedding
 # model. If torch finds more threads on its own, this value is not used.
 MIN_THREADS_ML_MODELS = int(os.environ.get("MIN_THREADS_ML_MODELS") or 1)
+# The model server coalesces concurrent embedding / reranking requests for the same model
+# into a single forward pass. It waits up to this long for more requests to arrive after the
+# first one, set to 0 to disable batching across requests
+MODEL_SERVER_BATCH_WAIT_MS = float(os.environ.get("MODEL_SERVER_BATCH_WAIT_MS") or 5)
+# Max number of texts (or query/document pairs for reranking) coalesced into one batch
+MODEL_SERVER_MAX_BATCH_SIZE = int(os.environ.get("MODEL_SERVER_MAX_BATCH_SIZE") or 64)
+# Comma separated names of embedding / reranking models to run on ONNX Runtime instead of
+# PyTorch in the model server, mostly useful for CPU only deployments. The ONNX export is done
+# on first load and cached on disk (under the Hugging Face cache so it shares the same volume)
+_ONNX_MODEL_NAMES_STR = os.environ.get("ONNX_MODEL_NAMES", "")
+ONNX_MODEL_NAMES = [
+    model_name.strip()
+    for model_name in _ONNX_MODEL_NAMES_STR.split(",")
+    if model_name.strip()
+]
+ONNX_MODEL_CACHE_DIR = os.environ.get("ONNX_MODEL_CACHE_DIR") or os.path.expanduser(
+    "~/.cache/huggingface/onnx"
+)
+# Dynamic int8 quantization of the weights, faster on CPU at a small cost in accuracy
+ONNX_QUANTIZE = os.environ.get("ONNX_QUANTIZE", "true").lower() == "true"
+# The ONNX model is only used if its outputs agree with the PyTorch model on a set of sample
+# inputs: min cosine similarity of the embeddings / correlation of the rerank scores
+ONNX_PARITY_MIN_SIMILARITY = float(os.environ.get("ONNX_PARITY_MIN_SIMILARITY") or 0.98)
 
 
 # Cross Encoder Settings
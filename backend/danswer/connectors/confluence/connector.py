@@ -15,9 +15,18 @@ from danswer.configs.app_configs import CONFLUENCE_CONNECTOR_LABELS_TO_SKIP
 from danswer.configs.app_configs import CONTINUE_ON_CONNECTOR_FAILURE
 from danswer.configs.app_configs import INDEX_BATCH_SIZE
 from danswer.configs.constants import DocumentSource
+from danswer.connectors.cross_connector_utils.concurrent_fetch import (
+    fetch_concurrently,
+)
 from danswer.connectors.cross_connector_utils.html_utils import format_document_soup
+from danswer.connectors.cross_connector_utils.rate_limit_wrapper import (
+    get_token_bucket_rate_limiter,
+)
+from danswer.connectors.cross_connector_utils.retry_wrapper import retry_builder
+from danswer.connectors.interfaces import CheckpointedLoadConnector
+from danswer.connectors.interfaces import ConnectorCheckpoint
 from danswer.connectors.interfaces import GenerateDocumentsOutput
-from danswer.connectors.interfaces import LoadConnector
+from danswer.connectors.interfaces import GenerateDocumentsWithCheckpointOutput
 from danswer.connectors.interfaces import PollConnector
 from danswer.connectors.interfaces import SecondsSinceUnixEpoch
 from danswer.connectors.models import BasicExpertInfo
@@ -28,6 +37,13 @@ from danswer.utils.logger import setup_logger
 
 logger = setup_logger()
 
+# Fetching a page takes a few requests (labels, comments, user names). Confluence Cloud
+# doesn't publish fixed limits, this keeps well clear of them while still letting the
+# pages of a batch be fetched concurrently
+_PAGE_FETCHES_PER_MINUTE = 300
+# Only HTTP errors are worth retrying, e.g. rate limiting or a flaky server
+_add_page_fetch_retries = retry_builder(tries=5, max_delay=30, exceptions=HTTPError)
+
 # Potential Improvements
 # 1. If wiki page instead of space, do a search of all the children of the page instead of index all in the space
 # 2. Include attachments, etc
@@ -157,7 +173,7 @@ def _comment_dfs(
     return comments_str
 
 
-class ConfluenceConnector(LoadConnector, PollConnector):
+class ConfluenceConnector(CheckpointedLoadConnector, PollConnector):
     def __init__(
         self,
         wiki_page_url: str,
@@ -289,81 +305,102 @@ class ConfluenceConnector(LoadConnector, PollConnector):
             logger.exception("Ran into exception when fetching labels from Confluence")
             return []
 
+    def _page_to_document(
+        self, page: dict[str, Any], time_filter: Callable[[datetime], bool] | None
+    ) -> Document | None:
+        if self.confluence_client is None:
+            raise ConnectorMissingCredentialError("Confluence")
+
+        last_modified_str = page["version"]["when"]
+        author = cast(str | None, page["version"].get("by", {}).get("email"))
+        last_modified = datetime.fromisoformat(last_modified_str)
+
+        if last_modified.tzinfo is None:
+            # If no timezone info, assume it is UTC
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        else:
+            # If not in UTC, translate it
+            last_modified = last_modified.astimezone(timezone.utc)
+
+        if time_filter is not None and not time_filter(last_modified):
+            return None
+
+        page_id = page["id"]
+
+        # check disallowed labels
+        if self.labels_to_skip:
+            page_labels = self._fetch_labels(self.confluence_client, page_id)
+            label_intersection = self.labels_to_skip.intersection(page_labels)
+            if label_intersection:
+                logger.info(
+                    f"Page with ID '{page_id}' has a label which has been "
+                    f"designated as disallowed: {label_intersection}. Skipping."
+                )
+                return None
+
+        page_html = (
+            page["body"].get("storage", page["body"].get("view", {})).get("value")
+        )
+        page_url = self.wiki_base + page["_links"]["webui"]
+        if not page_html:
+            logger.debug("Page is empty, skipping: %s", page_url)
+            return None
+        page_text = parse_html_page(page_html, self.confluence_client)
+        comments_text = self._fetch_comments(self.confluence_client, page_id)
+        page_text += comments_text
+
+        return Document(
+            id=page_url,
+            sections=[Section(link=page_url, text=page_text)],
+            source=DocumentSource.CONFLUENCE,
+            semantic_identifier=page["title"],
+            doc_updated_at=last_modified,
+            primary_owners=[BasicExpertInfo(email=author)] if author else None,
+            metadata={
+                "Wiki Space Name": self.space,
+            },
+        )
+
     def _get_doc_batch(
         self, start_ind: int, time_filter: Callable[[datetime], bool] | None = None
     ) -> tuple[list[Document], int]:
-        doc_batch: list[Document] = []
-
         if self.confluence_client is None:
             raise ConnectorMissingCredentialError("Confluence")
 
         batch = self._fetch_pages(self.confluence_client, start_ind)
-        for page in batch:
-            last_modified_str = page["version"]["when"]
-            author = cast(str | None, page["version"].get("by", {}).get("email"))
-            last_modified = datetime.fromisoformat(last_modified_str)
-
-            if last_modified.tzinfo is None:
-                # If no timezone info, assume it is UTC
-                last_modified = last_modified.replace(tzinfo=timezone.utc)
-            else:
-                # If not in UTC, translate it
-                last_modified = last_modified.astimezone(timezone.utc)
-
-            if time_filter is None or time_filter(last_modified):
-                page_id = page["id"]
-
-                # check disallowed labels
-                if self.labels_to_skip:
-                    page_labels = self._fetch_labels(self.confluence_client, page_id)
-                    label_intersection = self.labels_to_skip.intersection(page_labels)
-                    if label_intersection:
-                        logger.info(
-                            f"Page with ID '{page_id}' has a label which has been "
-                            f"designated as disallowed: {label_intersection}. Skipping."
-                        )
-                        continue
-
-                page_html = (
-                    page["body"]
-                    .get("storage", page["body"].get("view", {}))
-                    .get("value")
-                )
-                page_url = self.wiki_base + page["_links"]["webui"]
-                if not page_html:
-                    logger.debug("Page is empty, skipping: %s", page_url)
-                    continue
-                page_text = parse_html_page(page_html, self.confluence_client)
-                comments_text = self._fetch_comments(self.confluence_client, page_id)
-                page_text += comments_text
-
-                doc_batch.append(
-                    Document(
-                        id=page_url,
-                        sections=[Section(link=page_url, text=page_text)],
-                        source=DocumentSource.CONFLUENCE,
-                        semantic_identifier=page["title"],
-                        doc_updated_at=last_modified,
-                        primary_owners=[BasicExpertInfo(email=author)]
-                        if author
-                        else None,
-                        metadata={
-                            "Wiki Space Name": self.space,
-                        },
-                    )
-                )
+        # Labels, user names and comments are fetched per page, pages are processed
+        # concurrently since this is bound by the latency of the Confluence API
+        documents = fetch_concurrently(
+            lambda page: self._page_to_document(page, time_filter),
+            batch,
+            # The limit applies to the whole site, so it's shared with any other
+            # connector indexing the same Confluence
+            rate_limiter=get_token_bucket_rate_limiter(
+                DocumentSource.CONFLUENCE,
+                tenant=self.wiki_base,
+                max_calls=_PAGE_FETCHES_PER_MINUTE,
+                period=60,
+            ),
+            retry_decorator=_add_page_fetch_retries,
+        )
+        doc_batch = [document for document in documents if document is not None]
         return doc_batch, len(batch)
 
-    def load_from_state(self) -> GenerateDocumentsOutput:
+    def load_from_checkpoint(
+        self, checkpoint: ConnectorCheckpoint | None
+    ) -> GenerateDocumentsWithCheckpointOutput:
         if self.confluence_client is None:
             raise ConnectorMissingCredentialError("Confluence")
 
-        start_ind = 0
+        # Pages of a space are listed in a stable order, so the offset of the next page is
+        # enough to resume. Pages added or removed since may shift it slightly, the next full
+        # load picks up anything missed
+        start_ind = checkpoint.get("start_ind", 0) if checkpoint else 0
         while True:
             doc_batch, num_pages = self._get_doc_batch(start_ind)
             start_ind += num_pages
             if doc_batch:
-                yield doc_batch
+                yield doc_batch, {"start_ind": start_ind}
 
             if num_pages < self.batch_size:
                 break
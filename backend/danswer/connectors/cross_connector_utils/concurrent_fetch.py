@@ -0,0 +1,72 @@
+from collections.abc import Callable
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import TypeVar
+
+from danswer.configs.app_configs import CONNECTOR_FETCH_CONCURRENCY
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+T = TypeVar("T")
+R = TypeVar("R")
+# Such as the decorators built by `rate_limit_builder` and `retry_builder`
+CallDecorator = Callable[[Callable[..., Any]], Callable[..., Any]]
+
+
+def _handle_errors(
+    func: Callable[[T], R], on_error: Callable[[T, Exception], R]
+) -> Callable[[T], R]:
+    def wrapped_func(item: T) -> R:
+        try:
+            return func(item)
+        except Exception as e:
+            return on_error(item, e)
+
+    return wrapped_func
+
+
+def fetch_concurrently(
+    fetch_func: Callable[[T], R],
+    items: Iterable[T],
+    max_workers: int = CONNECTOR_FETCH_CONCURRENCY,
+    rate_limiter: CallDecorator | None = None,
+    retry_decorator: CallDecorator | None = None,
+    on_error: Callable[[T, Exception], R] | None = None,
+) -> list[R]:
+    """Calls `fetch_func` on every item with at most `max_workers` calls in flight, for
+    fetching per item details (content, comments, permissions...) of a batch from an
+    external API. Results are in the order of the items.
+
+    Each call is wrapped by `retry_decorator` (e.g. `retry_builder()`) and each attempt
+    counts against `rate_limiter` (e.g. `rate_limit_builder(...)`), which is shared by all
+    the workers. The exception of the first failed item is raised once the calls already
+    in flight are done, calls that haven't started are cancelled. Connectors that want to
+    skip failed items can pass `on_error`, which gets the item and its exception once
+    retries are exhausted and returns the result for that item or raises"""
+    item_list = list(items)
+    if not item_list:
+        return []
+
+    wrapped_func: Callable[[T], R] = fetch_func
+    if rate_limiter is not None:
+        wrapped_func = rate_limiter(wrapped_func)
+    if retry_decorator is not None:
+        wrapped_func = retry_decorator(wrapped_func)
+    if on_error is not None:
+        wrapped_func = _handle_errors(wrapped_func, on_error)
+
+    # Not worth the threads for a single item or if concurrency is turned off
+    if max_workers <= 1 or len(item_list) == 1:
+        return [wrapped_func(item) for item in item_list]
+
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_workers, len(item_list)),
+        thread_name_prefix="connector-fetch",
+    )
+    try:
+        futures = [executor.submit(wrapped_func, item) for item in item_list]
+        return [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
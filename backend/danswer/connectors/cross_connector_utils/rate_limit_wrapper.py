@@ -1,10 +1,22 @@
+import abc
+import threading
 import time
+from collections import deque
 from collections.abc import Callable
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
 from functools import wraps
 from typing import Any
 from typing import cast
 from typing import TypeVar
 
+from sqlalchemy.orm import Session
+
+from danswer.configs.app_configs import CONNECTOR_RATE_LIMIT_BACKEND
+from danswer.configs.constants import DocumentSource
+from danswer.db.engine import get_sqlalchemy_engine
+from danswer.db.models import RateLimitBucket
+from danswer.db.rate_limit import lock_rate_limit_bucket
 from danswer.utils.logger import setup_logger
 
 logger = setup_logger()
@@ -24,7 +36,8 @@ class _RateLimitDecorator:
     Implementation inspired by the `ratelimit` library:
     https://github.com/tomasbasham/ratelimit.
 
-    NOTE: is not thread safe.
+    Thread safe, so a single instance can limit calls made concurrently (see
+    `fetch_concurrently`). Waiting callers are served one at a time.
     """
 
     def __init__(
@@ -41,46 +54,245 @@ class _RateLimitDecorator:
         self.sleep_backoff = sleep_backoff
         self.max_num_sleep = max_num_sleep
 
-        self.call_history: list[float] = []
+        self.call_history: deque[float] = deque()
         self.curr_calls = 0
+        self._lock = threading.Lock()
 
     def __call__(self, func: F) -> F:
         @wraps(func)
         def wrapped_func(*args: list, **kwargs: dict[str, Any]) -> Any:
-            # cleanup calls which are no longer relevant
-            self._cleanup()
+            with self._lock:
+                self._wait_for_call_slot(func.__name__)
+            return func(*args, **kwargs)
 
-            # check if we've exceeded the rate limit
-            sleep_cnt = 0
-            while len(self.call_history) == self.max_calls:
-                sleep_time = self.sleep_time * (self.sleep_backoff**sleep_cnt)
-                logger.info(
-                    f"Rate limit exceeded for function {func.__name__}. "
-                    f"Waiting {sleep_time} seconds before retrying."
-                )
-                time.sleep(sleep_time)
-                sleep_cnt += 1
-                if self.max_num_sleep != 0 and sleep_cnt >= self.max_num_sleep:
-                    raise RateLimitTriedTooManyTimesError(
-                        f"Exceeded '{self.max_num_sleep}' retries for function '{func.__name__}'"
-                    )
+        return cast(F, wrapped_func)
 
-                self._cleanup()
+    def _wait_for_call_slot(self, func_name: str) -> None:
+        # cleanup calls which are no longer relevant
+        self._cleanup()
 
-            # add the current call to the call history
-            self.call_history.append(time.monotonic())
-            return func(*args, **kwargs)
+        # check if we've exceeded the rate limit
+        sleep_cnt = 0
+        while len(self.call_history) == self.max_calls:
+            sleep_time = self.sleep_time * (self.sleep_backoff**sleep_cnt)
+            logger.info(
+                f"Rate limit exceeded for function {func_name}. "
+                f"Waiting {sleep_time} seconds before retrying."
+            )
+            time.sleep(sleep_time)
+            sleep_cnt += 1
+            if self.max_num_sleep != 0 and sleep_cnt >= self.max_num_sleep:
+                raise RateLimitTriedTooManyTimesError(
+                    f"Exceeded '{self.max_num_sleep}' retries for function '{func_name}'"
+                )
 
-        return cast(F, wrapped_func)
+            self._cleanup()
+
+        # add the current call to the call history
+        self.call_history.append(time.monotonic())
 
     def _cleanup(self) -> None:
         curr_time = time.monotonic()
         time_to_expire_before = curr_time - self.period
-        self.call_history = [
-            call_time
-            for call_time in self.call_history
-            if call_time > time_to_expire_before
-        ]
+        # Calls are recorded in order, expired ones are always at the front
+        while self.call_history and self.call_history[0] <= time_to_expire_before:
+            self.call_history.popleft()
 
 
 rate_limit_builder = _RateLimitDecorator
+
+
+@dataclass
+class _InMemoryBucket:
+    tokens: float
+    updated_at: float
+
+
+def _reserve_token(
+    bucket: _InMemoryBucket | RateLimitBucket, now: float, rate: float, capacity: float
+) -> float:
+    """Takes a token from the bucket, going into debt if there is none left, and returns how
+    long to wait before the token is actually available. Debt is paid back in order, so
+    waiting callers are spread evenly at `rate` instead of all retrying at once"""
+    if now > bucket.updated_at:
+        bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated_at) * rate)
+        bucket.updated_at = now
+
+    bucket.tokens -= 1
+    # `updated_at` is in the future while the API asked to back off
+    return (bucket.updated_at - now) + max(-bucket.tokens, 0) / rate
+
+
+def _block_bucket(bucket: _InMemoryBucket | RateLimitBucket, until: float) -> None:
+    if until > bucket.updated_at:
+        bucket.updated_at = until
+        bucket.tokens = min(bucket.tokens, 0)
+
+
+class _TokenBucketBackend(abc.ABC):
+    @abc.abstractmethod
+    def reserve(self, key: str, rate: float, capacity: float) -> float:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def block_until(self, key: str, capacity: float, until: float) -> None:
+        raise NotImplementedError
+
+
+class _InMemoryTokenBucketBackend(_TokenBucketBackend):
+    """Shared by the threads of a single process"""
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, _InMemoryBucket] = {}
+        self._lock = threading.Lock()
+
+    def _get_bucket(self, key: str, capacity: float) -> _InMemoryBucket:
+        if key not in self._buckets:
+            self._buckets[key] = _InMemoryBucket(
+                tokens=capacity, updated_at=time.time()
+            )
+        return self._buckets[key]
+
+    def reserve(self, key: str, rate: float, capacity: float) -> float:
+        with self._lock:
+            bucket = self._get_bucket(key, capacity)
+            return _reserve_token(bucket, time.time(), rate, capacity)
+
+    def block_until(self, key: str, capacity: float, until: float) -> None:
+        with self._lock:
+            _block_bucket(self._get_bucket(key, capacity), until)
+
+
+class _PostgresTokenBucketBackend(_TokenBucketBackend):
+    """Shared by every process using the same Postgres, e.g. the indexing jobs of two
+    connectors pointing at the same tenant. Costs a short transaction per call"""
+
+    def reserve(self, key: str, rate: float, capacity: float) -> float:
+        with Session(get_sqlalchemy_engine()) as db_session:
+            now = time.time()
+            bucket = lock_rate_limit_bucket(db_session, key, capacity, now)
+            wait_time = _reserve_token(bucket, now, rate, capacity)
+            db_session.commit()
+        return wait_time
+
+    def block_until(self, key: str, capacity: float, until: float) -> None:
+        with Session(get_sqlalchemy_engine()) as db_session:
+            bucket = lock_rate_limit_bucket(db_session, key, capacity, time.time())
+            _block_bucket(bucket, until)
+            db_session.commit()
+
+
+_IN_MEMORY_BACKEND = _InMemoryTokenBucketBackend()
+
+
+def _get_token_bucket_backend() -> _TokenBucketBackend:
+    if CONNECTOR_RATE_LIMIT_BACKEND == "postgres":
+        return _PostgresTokenBucketBackend()
+    return _IN_MEMORY_BACKEND
+
+
+def get_retry_after_seconds(error: BaseException) -> float | None:
+    """Seconds to wait from the `Retry-After` header of a rate limited (429 / 503) response
+    carried by a `requests` or `googleapiclient` HTTP error, None if there is none"""
+    # NOTE: a `requests` response of an error status is falsy
+    response = getattr(error, "response", None)
+    if response is None:
+        response = getattr(error, "resp", None)
+    if response is None:
+        return None
+
+    status_code = getattr(response, "status_code", None) or getattr(
+        response, "status", None
+    )
+    if status_code is None or int(status_code) not in (429, 503):
+        return None
+
+    headers = getattr(response, "headers", response)
+    try:
+        retry_after = headers.get("Retry-After") or headers.get("retry-after")
+    except AttributeError:
+        return None
+    if not retry_after:
+        return None
+
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    # Can also be an HTTP date
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class TokenBucketRateLimiter:
+    """Thread safe rate limiter allowing bursts of up to `max_calls` and `max_calls` per
+    `period` on average. Limiters with the same key share their bucket, within the process
+    or across processes with the Postgres backend (`CONNECTOR_RATE_LIMIT_BACKEND`), so the
+    key should identify the rate limited account, e.g. source + tenant.
+
+    Callers wait for their turn instead of sleeping with backoff. If a call fails with a
+    `Retry-After`, the whole bucket waits that long, the call itself should be retried by
+    the caller (e.g. with `retry_builder`)."""
+
+    def __init__(
+        self,
+        key: str,
+        max_calls: int,
+        period: float,  # in seconds
+        backend: _TokenBucketBackend | None = None,
+    ) -> None:
+        if max_calls <= 0 or period <= 0:
+            raise ValueError("max_calls and period must be positive")
+
+        self.key = key
+        self.capacity = float(max_calls)
+        self.rate = max_calls / period
+        self.backend = backend or _get_token_bucket_backend()
+
+    def acquire(self) -> None:
+        wait_time = self.backend.reserve(self.key, self.rate, self.capacity)
+        if wait_time > 0:
+            logger.debug(
+                f"Rate limit reached for '{self.key}', waiting {wait_time:.2f} seconds"
+            )
+            time.sleep(wait_time)
+
+    def back_off(self, seconds: float) -> None:
+        logger.info(
+            f"Rate limited by the API for '{self.key}', pausing for {seconds} seconds"
+        )
+        self.backend.block_until(self.key, self.capacity, time.time() + seconds)
+
+    def __call__(self, func: F) -> F:
+        @wraps(func)
+        def wrapped_func(*args: list, **kwargs: dict[str, Any]) -> Any:
+            self.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                retry_after = get_retry_after_seconds(e)
+                if retry_after is not None:
+                    self.back_off(retry_after)
+                raise
+
+        return cast(F, wrapped_func)
+
+
+_TOKEN_BUCKET_RATE_LIMITERS: dict[tuple[str, int, float], TokenBucketRateLimiter] = {}
+_TOKEN_BUCKET_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_token_bucket_rate_limiter(
+    source: DocumentSource, tenant: str, max_calls: int, period: float
+) -> TokenBucketRateLimiter:
+    key = f"{source.value}:{tenant}"
+    with _TOKEN_BUCKET_RATE_LIMITERS_LOCK:
+        limiter_key = (key, max_calls, period)
+        if limiter_key not in _TOKEN_BUCKET_RATE_LIMITERS:
+            _TOKEN_BUCKET_RATE_LIMITERS[limiter_key] = TokenBucketRateLimiter(
+                key=key, max_calls=max_calls, period=period
+            )
+        return _TOKEN_BUCKET_RATE_LIMITERS[limiter_key]
@@ -20,20 +20,23 @@ def retry_builder(
     max_delay: float | None = None,
     backoff: float = 2,
     jitter: tuple[float, float] | float = 1,
+    exceptions: type[Exception] | tuple[type[Exception], ...] = Exception,
 ) -> Callable[[F], F]:
     """Builds a generic wrapper/decorator for calls to external APIs that
     may fail due to rate limiting, flakes, or other reasons. Applies expontential
-    backoff with jitter to retry the call."""
-
-    @retry(
-        tries=tries,
-        delay=delay,
-        max_delay=max_delay,
-        backoff=backoff,
-        jitter=jitter,
-        logger=cast(Logger, logger),
-    )
+    backoff with jitter to retry the call. Only `exceptions` are retried, any other
+    error is raised right away."""
+
     def retry_with_default(func: F) -> F:
+        @retry(
+            exceptions=exceptions,
+            tries=tries,
+            delay=delay,
+            max_delay=max_delay,
+            backoff=backoff,
+            jitter=jitter,
+            logger=cast(Logger, logger),
+        )
         def wrapped_func(*args: list, **kwargs: dict[str, Any]) -> Any:
             return func(*args, **kwargs)
 
@@ -10,7 +10,7 @@ from danswer.configs.app_configs import INDEX_BATCH_SIZE
 from danswer.configs.constants import DocumentSource
 from danswer.connectors.cross_connector_utils.html_utils import parse_html_page_basic
 from danswer.connectors.cross_connector_utils.rate_limit_wrapper import (
-    rate_limit_builder,
+    get_token_bucket_rate_limiter,
 )
 from danswer.connectors.cross_connector_utils.retry_wrapper import retry_builder
 from danswer.connectors.interfaces import GenerateDocumentsOutput
@@ -52,13 +52,26 @@ class Document360Connector(LoadConnector, PollConnector):
 
     # rate limiting set based on the enterprise plan: https://apidocs.document360.com/apidocs/rate-limiting
     # NOTE: retry will handle cases where user is not on enterprise plan - we will just hit the rate limit
-    # and then retry after a period
-    @retry_builder()
-    @rate_limit_builder(max_calls=100, period=60)
+    # and then retry after a period. A missing credential won't be fixed by retrying
+    @retry_builder(exceptions=requests.RequestException)
     def _make_request(self, endpoint: str, params: Optional[dict] = None) -> Any:
         if not self.api_token:
             raise ConnectorMissingCredentialError("Document360")
 
+        # The limit applies to the whole portal, so it's shared with any other connector
+        # indexing the same portal
+        rate_limiter = get_token_bucket_rate_limiter(
+            DocumentSource.DOCUMENT360,
+            tenant=self.portal_id or self.workspace,
+            max_calls=100,
+            period=60,
+        )
+        return rate_limiter(self._send_request)(endpoint, params)
+
+    def _send_request(self, endpoint: str, params: Optional[dict]) -> Any:
+        if not self.api_token:
+            raise ConnectorMissingCredentialError("Document360")
+
         headers = {"accept": "application/json", "api_token": self.api_token}
 
         response = requests.get(
@@ -1,5 +1,6 @@
 import io
 import tempfile
+import threading
 from collections.abc import Iterator
 from collections.abc import Sequence
 from datetime import datetime
@@ -21,7 +22,13 @@ from danswer.configs.app_configs import GOOGLE_DRIVE_ONLY_ORG_PUBLIC
 from danswer.configs.app_configs import INDEX_BATCH_SIZE
 from danswer.configs.constants import DocumentSource
 from danswer.configs.constants import IGNORE_FOR_QA
+from danswer.connectors.cross_connector_utils.concurrent_fetch import (
+    fetch_concurrently,
+)
 from danswer.connectors.cross_connector_utils.file_utils import read_pdf_file
+from danswer.connectors.cross_connector_utils.rate_limit_wrapper import (
+    get_token_bucket_rate_limiter,
+)
 from danswer.connectors.cross_connector_utils.retry_wrapper import retry_builder
 from danswer.connectors.google_drive.connector_auth import (
     get_google_drive_creds_for_authorized_user,
@@ -65,6 +72,13 @@ GoogleDriveFileType = dict[str, Any]
 # extended period of time. Trying to combat here by adding a very
 # long retry period (~20 minutes of trying every minute)
 add_retries = retry_builder(tries=50, max_delay=30)
+# Contents are fetched for many files at once, a file failing for that long is given up on
+# rather than holding up the whole batch
+add_file_fetch_retries = retry_builder(tries=5, max_delay=30, exceptions=HttpError)
+
+# Well below the default Drive API quota of 12,000 requests per minute, which is shared by
+# every connector using the same credentials
+_FILE_FETCHES_PER_MINUTE = 1000
 
 
 def _run_drive_file_query(
@@ -334,6 +348,15 @@ def extract_text(file: dict[str, str], service: discovery.Resource) -> str:
     return UNSUPPORTED_FILE_TYPE_CONTENT
 
 
+def _get_rate_limit_tenant(creds: Credentials) -> str:
+    """Quotas are per Google Cloud project and user, a service account is its own user"""
+    return (
+        getattr(creds, "service_account_email", None)
+        or getattr(creds, "client_id", None)
+        or "default"
+    )
+
+
 class GoogleDriveConnector(LoadConnector, PollConnector):
     def __init__(
         self,
@@ -463,44 +486,62 @@ class GoogleDriveConnector(LoadConnector, PollConnector):
                 for folder_id in folder_ids
             ]
         )
-        for files_batch in file_batches:
-            doc_batch = []
-            for file in files_batch:
-                try:
-                    if self.only_org_public:
-                        if "permissions" not in file:
-                            continue
-                        if not any(
-                            permission["type"] == "domain"
-                            for permission in file["permissions"]
-                        ):
-                            continue
-
-                    text_contents = extract_text(file, service) or ""
-
-                    doc_batch.append(
-                        Document(
-                            id=file["webViewLink"],
-                            sections=[
-                                Section(link=file["webViewLink"], text=text_contents)
-                            ],
-                            source=DocumentSource.GOOGLE_DRIVE,
-                            semantic_identifier=file["name"],
-                            doc_updated_at=datetime.fromisoformat(
-                                file["modifiedTime"]
-                            ).astimezone(timezone.utc),
-                            metadata={} if text_contents else {IGNORE_FOR_QA: "True"},
-                        )
-                    )
-                except Exception as e:
-                    if not self.continue_on_failure:
-                        raise e
+        # The http client of a discovery service is not thread safe, each worker fetching
+        # file contents gets its own
+        thread_local = threading.local()
+
+        def _get_thread_service() -> discovery.Resource:
+            if not hasattr(thread_local, "service"):
+                thread_local.service = discovery.build(
+                    "drive", "v3", credentials=self.creds
+                )
+            return thread_local.service
+
+        def _file_to_document(file: dict[str, Any]) -> Document | None:
+            if self.only_org_public:
+                if "permissions" not in file:
+                    return None
+                if not any(
+                    permission["type"] == "domain" for permission in file["permissions"]
+                ):
+                    return None
+
+            text_contents = extract_text(file, _get_thread_service()) or ""
+
+            return Document(
+                id=file["webViewLink"],
+                sections=[Section(link=file["webViewLink"], text=text_contents)],
+                source=DocumentSource.GOOGLE_DRIVE,
+                semantic_identifier=file["name"],
+                doc_updated_at=datetime.fromisoformat(file["modifiedTime"]).astimezone(
+                    timezone.utc
+                ),
+                metadata={} if text_contents else {IGNORE_FOR_QA: "True"},
+            )
 
-                    logger.exception(
-                        "Ran into exception when pulling a file from Google Drive"
-                    )
+        def _on_file_error(file: dict[str, Any], e: Exception) -> Document | None:
+            if not self.continue_on_failure:
+                raise e
 
-            yield doc_batch
+            logger.exception("Ran into exception when pulling a file from Google Drive")
+            return None
+
+        rate_limiter = get_token_bucket_rate_limiter(
+            DocumentSource.GOOGLE_DRIVE,
+            tenant=_get_rate_limit_tenant(self.creds),
+            max_calls=_FILE_FETCHES_PER_MINUTE,
+            period=60,
+        )
+        for files_batch in file_batches:
+            # Exporting / downloading is one request per file, bound by the API latency
+            documents = fetch_concurrently(
+                _file_to_document,
+                files_batch,
+                rate_limiter=rate_limiter,
+                retry_decorator=add_file_fetch_retries,
+                on_error=_on_file_error,
+            )
+            yield [document for document in documents if document is not None]
 
     def load_from_state(self) -> GenerateDocumentsOutput:
         yield from self._fetch_docs_from_drive()
@@ -9,6 +9,14 @@ SecondsSinceUnixEpoch = float
 
 GenerateDocumentsOutput = Iterator[list[Document]]
 
+# JSON serializable position in the source (cursor, page token, offset, last processed id...)
+# from which loading can be resumed
+ConnectorCheckpoint = dict[str, Any]
+
+GenerateDocumentsWithCheckpointOutput = Iterator[
+    tuple[list[Document], ConnectorCheckpoint]
+]
+
 
 class BaseConnector(abc.ABC):
     @abc.abstractmethod
@@ -41,6 +49,21 @@ class LoadConnector(BaseConnector):
         raise NotImplementedError
 
 
+# Large set reindex which can resume from where a previous attempt stopped
+class CheckpointedLoadConnector(LoadConnector):
+    @abc.abstractmethod
+    def load_from_checkpoint(
+        self, checkpoint: ConnectorCheckpoint | None
+    ) -> GenerateDocumentsWithCheckpointOutput:
+        """Yields each batch along with the checkpoint to resume from once that batch, and
+        all the ones before it, have been indexed. Starts from the beginning if None"""
+        raise NotImplementedError
+
+    def load_from_state(self) -> GenerateDocumentsOutput:
+        for doc_batch, _ in self.load_from_checkpoint(None):
+            yield doc_batch
+
+
 # Small set updates by time
 class PollConnector(BaseConnector):
     @abc.abstractmethod
@@ -37,7 +37,9 @@ MessageType = dict[str, Any]
 # list of messages in a thread
 ThreadType = list[MessageType]
 
-basic_retry_wrapper = retry_builder()
+# Slack API errors, rate limiting included, are handled by `make_slack_api_rate_limited`.
+# Retrying them wouldn't help, only connection errors are retried
+basic_retry_wrapper = retry_builder(exceptions=OSError)
 
 
 def _make_paginated_slack_api_call(
@@ -1,10 +1,15 @@
 import io
+import json
+from collections import deque
+from collections.abc import Mapping
+from dataclasses import dataclass
 from enum import Enum
 from typing import Any
 from typing import cast
 from typing import Tuple
 from urllib.parse import urljoin
 from urllib.parse import urlparse
+from urllib.parse import urlunparse
 
 import requests
 from bs4 import BeautifulSoup
@@ -15,6 +20,12 @@ from playwright.sync_api import sync_playwright
 from requests_oauthlib import OAuth2Session  # type:ignore
 
 from danswer.configs.app_configs import INDEX_BATCH_SIZE
+from danswer.configs.app_configs import WEB_CONNECTOR_CACHE_DIR
+from danswer.configs.app_configs import WEB_CONNECTOR_CACHE_MAX_PAGES
+from danswer.configs.app_configs import WEB_CONNECTOR_CONCURRENCY
+from danswer.configs.app_configs import WEB_CONNECTOR_HOST_DELAY_SECONDS
+from danswer.configs.app_configs import WEB_CONNECTOR_IGNORED_CLASSES
+from danswer.configs.app_configs import WEB_CONNECTOR_IGNORED_ELEMENTS
 from danswer.configs.app_configs import WEB_CONNECTOR_OAUTH_CLIENT_ID
 from danswer.configs.app_configs import WEB_CONNECTOR_OAUTH_CLIENT_SECRET
 from danswer.configs.app_configs import WEB_CONNECTOR_OAUTH_TOKEN_URL
@@ -25,10 +36,18 @@ from danswer.connectors.interfaces import GenerateDocumentsOutput
 from danswer.connectors.interfaces import LoadConnector
 from danswer.connectors.models import Document
 from danswer.connectors.models import Section
+from danswer.connectors.web.page_cache import CachedWebPage
+from danswer.connectors.web.page_cache import get_conditional_headers
+from danswer.connectors.web.page_cache import get_validators
+from danswer.connectors.web.page_cache import WebPageCache
+from danswer.connectors.web.page_pool import BrowserPagePool
+from danswer.connectors.web.page_pool import ContextGetter
 from danswer.utils.logger import setup_logger
 
 logger = setup_logger()
 
+_REQUEST_TIMEOUT_SECONDS = 60
+
 
 class WEB_CONNECTOR_VALID_SETTINGS(str, Enum):
     # Given a base site, index everything under that path
@@ -49,10 +68,32 @@ def is_valid_url(url: str) -> bool:
         return False
 
 
-def get_internal_links(
-    base_url: str, url: str, soup: BeautifulSoup, should_ignore_pound: bool = True
+def normalize_url(url: str) -> str:
+    """Drops the differences that don't change the page, so each page is only visited once"""
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (
+        scheme == "https" and netloc.endswith(":443")
+    ):
+        netloc = netloc.rsplit(":", 1)[0]
+    return urlunparse(
+        (
+            scheme,
+            netloc,
+            parsed.path or "/",
+            parsed.params,
+            parsed.query,
+            parsed.fragment,
+        )
+    )
+
+
+def get_same_host_links(
+    url: str, soup: BeautifulSoup, should_ignore_pound: bool = True
 ) -> set[str]:
-    internal_links = set()
+    host = urlparse(normalize_url(url)).netloc
+    same_host_links = set()
     for link in cast(list[dict[str, Any]], soup.find_all("a")):
         href = cast(str | None, link.get("href"))
         if not href:
@@ -65,32 +106,51 @@ def get_internal_links(
             # Relative path handling
             href = urljoin(url, href)
 
-        if urlparse(href).netloc == urlparse(url).netloc and base_url in href:
-            internal_links.add(href)
-    return internal_links
+        href = normalize_url(href)
+        if urlparse(href).netloc == host:
+            same_host_links.add(href)
+    return same_host_links
 
 
-def start_playwright() -> Tuple[Playwright, BrowserContext]:
-    playwright = sync_playwright().start()
-    browser = playwright.chromium.launch(headless=True)
+def get_internal_links(
+    base_url: str, url: str, soup: BeautifulSoup, should_ignore_pound: bool = True
+) -> set[str]:
+    base_url = normalize_url(base_url)
+    return {
+        link
+        for link in get_same_host_links(url, soup, should_ignore_pound)
+        if base_url in link
+    }
 
-    context = browser.new_context()
 
-    if (
+def get_oauth_headers() -> dict[str, str]:
+    if not (
         WEB_CONNECTOR_OAUTH_CLIENT_ID
         and WEB_CONNECTOR_OAUTH_CLIENT_SECRET
         and WEB_CONNECTOR_OAUTH_TOKEN_URL
     ):
-        client = BackendApplicationClient(client_id=WEB_CONNECTOR_OAUTH_CLIENT_ID)
-        oauth = OAuth2Session(client=client)
-        token = oauth.fetch_token(
-            token_url=WEB_CONNECTOR_OAUTH_TOKEN_URL,
-            client_id=WEB_CONNECTOR_OAUTH_CLIENT_ID,
-            client_secret=WEB_CONNECTOR_OAUTH_CLIENT_SECRET,
-        )
-        context.set_extra_http_headers(
-            {"Authorization": "Bearer {}".format(token["access_token"])}
-        )
+        return {}
+
+    client = BackendApplicationClient(client_id=WEB_CONNECTOR_OAUTH_CLIENT_ID)
+    oauth = OAuth2Session(client=client)
+    token = oauth.fetch_token(
+        token_url=WEB_CONNECTOR_OAUTH_TOKEN_URL,
+        client_id=WEB_CONNECTOR_OAUTH_CLIENT_ID,
+        client_secret=WEB_CONNECTOR_OAUTH_CLIENT_SECRET,
+    )
+    return {"Authorization": "Bearer {}".format(token["access_token"])}
+
+
+def start_playwright(
+    extra_headers: dict[str, str] | None = None
+) -> Tuple[Playwright, BrowserContext]:
+    playwright = sync_playwright().start()
+    browser = playwright.chromium.launch(headless=True)
+
+    context = browser.new_context()
+
+    if extra_headers:
+        context.set_extra_http_headers(extra_headers)
 
     return playwright, context
 
@@ -117,6 +177,16 @@ def _read_urls_file(location: str) -> list[str]:
     return urls
 
 
+@dataclass
+class _CrawledPage:
+    # URL after redirects, the ID of the document
+    final_url: str
+    document: Document
+    # Not yet filtered by the base URL of the crawl
+    links: list[str]
+    from_cache: bool
+
+
 class WebConnector(LoadConnector):
     def __init__(
         self,
@@ -128,6 +198,21 @@ class WebConnector(LoadConnector):
         self.mintlify_cleanup = mintlify_cleanup
         self.batch_size = batch_size
         self.recursive = False
+        # Connectors crawling the same site with other settings or as another identity
+        # don't share cached pages
+        self.page_cache = (
+            WebPageCache(
+                WEB_CONNECTOR_CACHE_DIR,
+                scope=json.dumps(
+                    [web_connector_type, base_url, WEB_CONNECTOR_OAUTH_CLIENT_ID]
+                ),
+                max_pages=WEB_CONNECTOR_CACHE_MAX_PAGES,
+            )
+            if WEB_CONNECTOR_CACHE_DIR
+            else None
+        )
+        # Auth headers for the crawled site, refreshed on every batch
+        self._headers: dict[str, str] = {}
 
         if web_connector_type == WEB_CONNECTOR_VALID_SETTINGS.RECURSIVE.value:
             self.recursive = True
@@ -153,96 +238,239 @@ class WebConnector(LoadConnector):
             logger.warning("Unexpected credentials provided for Web Connector")
         return None
 
+    @property
+    def _parse_options(self) -> dict[str, Any]:
+        # A page cached with other options has to be parsed again
+        return {
+            "mintlify_cleanup": self.mintlify_cleanup,
+            "ignored_classes": WEB_CONNECTOR_IGNORED_CLASSES,
+            "ignored_elements": WEB_CONNECTOR_IGNORED_ELEMENTS,
+        }
+
+    def _get_unmodified_cached_page(
+        self, url: str, cached_page: CachedWebPage | None
+    ) -> CachedWebPage | None:
+        """The cached page if the server confirms it hasn't changed, with a 304 to a
+        conditional HEAD request. The body of a JS rendered page can't tell whether the
+        rendered content changed, so pages are only skipped on the server's word"""
+        conditional_headers = get_conditional_headers(cached_page)
+        if cached_page is None or not conditional_headers:
+            return None
+
+        try:
+            response = requests.head(
+                url,
+                headers={**self._headers, **conditional_headers},
+                timeout=_REQUEST_TIMEOUT_SECONDS,
+                allow_redirects=True,
+            )
+        except requests.RequestException as e:
+            logger.debug(f"Conditional request for '{url}' failed: {e}")
+            return None
+
+        return cached_page if response.status_code == 304 else None
+
+    def _cache_page(
+        self,
+        url: str,
+        final_url: str,
+        response_headers: Mapping[str, str],
+        title: str | None,
+        text: str,
+        links: set[str],
+    ) -> None:
+        if self.page_cache is None:
+            return
+
+        etag, last_modified = get_validators(response_headers)
+        if not etag and not last_modified:
+            # Could never be confirmed as unchanged
+            return
+
+        self.page_cache.put(
+            CachedWebPage(
+                url=url,
+                final_url=final_url,
+                etag=etag,
+                last_modified=last_modified,
+                title=title,
+                text=text,
+                links=sorted(links),
+                parse_options=self._parse_options,
+            )
+        )
+
+    @staticmethod
+    def _page_from_cache(cached_page: CachedWebPage) -> _CrawledPage:
+        return _CrawledPage(
+            final_url=cached_page.final_url,
+            document=Document(
+                id=cached_page.final_url,
+                sections=[Section(link=cached_page.final_url, text=cached_page.text)],
+                source=DocumentSource.WEB,
+                semantic_identifier=cached_page.title or cached_page.final_url,
+                metadata={},
+            ),
+            links=cached_page.links,
+            from_cache=True,
+        )
+
+    def _crawl_page(self, url: str, get_context: ContextGetter) -> _CrawledPage:
+        """Builds the document of the page from the page cache if the page hasn't changed,
+        otherwise fetches it (PDFs) or renders it in the browser. Runs in the workers of
+        the page pool"""
+        cached_page = (
+            self.page_cache.get(url, self._parse_options) if self.page_cache else None
+        )
+
+        if url.split(".")[-1] == "pdf":
+            # PDF files are not checked for links. The download itself is conditional
+            response = requests.get(
+                url,
+                headers={**self._headers, **get_conditional_headers(cached_page)},
+                timeout=_REQUEST_TIMEOUT_SECONDS,
+            )
+            if cached_page is not None and response.status_code == 304:
+                return self._page_from_cache(cached_page)
+
+            page_text = read_pdf_file(file=io.BytesIO(response.content), file_name=url)
+            semantic_identifier = url.split(".")[-1]
+            if response.ok:
+                self._cache_page(
+                    url=url,
+                    final_url=url,
+                    response_headers=response.headers,
+                    title=semantic_identifier,
+                    text=page_text,
+                    links=set(),
+                )
+
+            return _CrawledPage(
+                final_url=url,
+                document=Document(
+                    id=url,
+                    sections=[Section(link=url, text=page_text)],
+                    source=DocumentSource.WEB,
+                    semantic_identifier=semantic_identifier,
+                    metadata={},
+                ),
+                links=[],
+                from_cache=False,
+            )
+
+        unmodified_page = self._get_unmodified_cached_page(url, cached_page)
+        if unmodified_page is not None:
+            return self._page_from_cache(unmodified_page)
+
+        page = get_context().new_page()
+        try:
+            # The validators come from the response the page was rendered from, the page
+            # isn't downloaded a second time for them
+            page_response = page.goto(url)
+            final_url = page.url
+            content = page.content()
+        finally:
+            page.close()
+
+        soup = BeautifulSoup(content, "html.parser")
+        # Links are cached unfiltered, crawls may start from other base URLs
+        same_host_links = get_same_host_links(final_url, soup)
+        parsed_html = web_html_cleanup(soup, self.mintlify_cleanup)
+        if page_response is not None and page_response.ok:
+            self._cache_page(
+                url=url,
+                final_url=final_url,
+                response_headers=page_response.headers,
+                title=parsed_html.title,
+                text=parsed_html.cleaned_text,
+                links=same_host_links,
+            )
+
+        return _CrawledPage(
+            final_url=final_url,
+            document=Document(
+                id=final_url,
+                sections=[Section(link=final_url, text=parsed_html.cleaned_text)],
+                source=DocumentSource.WEB,
+                semantic_identifier=parsed_html.title or final_url,
+                metadata={},
+            ),
+            links=sorted(same_host_links),
+            from_cache=False,
+        )
+
     def load_from_state(self) -> GenerateDocumentsOutput:
         """Traverses through all pages found on the website
-        and converts them into documents"""
-        visited_links: set[str] = set()
-        to_visit: list[str] = self.to_visit_list
-        base_url = to_visit[0]  # For the recursive case
-        doc_batch: list[Document] = []
-
-        playwright, context = start_playwright()
-        restart_playwright = False
-        while to_visit:
-            current_url = to_visit.pop()
-            if current_url in visited_links:
-                continue
-            visited_links.add(current_url)
-
-            logger.info(f"Visiting {current_url}")
-
-            try:
-                if restart_playwright:
-                    playwright, context = start_playwright()
-                    restart_playwright = False
-
-                if current_url.split(".")[-1] == "pdf":
-                    # PDF files are not checked for links
-                    response = requests.get(current_url)
-                    page_text = read_pdf_file(
-                        file=io.BytesIO(response.content), file_name=current_url
-                    )
+        and converts them into documents
+
+        Up to WEB_CONNECTOR_CONCURRENCY pages are crawled at the same time, batches are
+        yielded as the pages complete so documents aren't in crawl order. Pages that
+        haven't changed since the last run are rebuilt from the page cache without
+        rendering them. They are still returned, documents that are unchanged are
+        skipped at indexing time"""
+        base_url = normalize_url(self.to_visit_list[0])  # For the recursive case
+        # Pages are only queued once, seen by their normalized URL
+        seen_urls: set[str] = set()
+        frontier: deque[str] = deque()
+        for url in self.to_visit_list:
+            if normalize_url(url) not in seen_urls:
+                seen_urls.add(normalize_url(url))
+                frontier.append(url)
 
-                    doc_batch.append(
-                        Document(
-                            id=current_url,
-                            sections=[Section(link=current_url, text=page_text)],
-                            source=DocumentSource.WEB,
-                            semantic_identifier=current_url.split(".")[-1],
-                            metadata={},
-                        )
+        doc_batch: list[Document] = []
+        num_cached_pages = 0
+        self._headers = get_oauth_headers()
+        with BrowserPagePool(
+            process_page=self._crawl_page,
+            start_browser=lambda: start_playwright(self._headers),
+            num_workers=WEB_CONNECTOR_CONCURRENCY,
+            host_delay=WEB_CONNECTOR_HOST_DELAY_SECONDS,
+            pages_per_browser=self.batch_size,
+        ) as page_pool:
+            while frontier or page_pool.num_in_flight:
+                while frontier and page_pool.has_capacity:
+                    url = frontier.popleft()
+                    logger.info(f"Visiting {url}")
+                    page_pool.submit(url)
+
+                page_result = page_pool.get_result()
+                crawled_page = page_result.result
+                if crawled_page is None:
+                    logger.error(
+                        f"Failed to fetch '{page_result.url}': {page_result.error}"
                     )
                     continue
 
-                page = context.new_page()
-                page.goto(current_url)
-                final_page = page.url
-                if final_page != current_url:
-                    logger.info(f"Redirected to {final_page}")
-                    current_url = final_page
-                    if current_url in visited_links:
+                if normalize_url(crawled_page.final_url) != normalize_url(
+                    page_result.url
+                ):
+                    logger.info(
+                        f"{page_result.url} redirected to {crawled_page.final_url}"
+                    )
+                    if normalize_url(crawled_page.final_url) in seen_urls:
                         logger.info("Redirected page already indexed")
                         continue
-                    visited_links.add(current_url)
+                    seen_urls.add(normalize_url(crawled_page.final_url))
 
-                content = page.content()
-                soup = BeautifulSoup(content, "html.parser")
+                if crawled_page.from_cache:
+                    num_cached_pages += 1
 
                 if self.recursive:
-                    internal_links = get_internal_links(base_url, current_url, soup)
-                    for link in internal_links:
-                        if link not in visited_links:
-                            to_visit.append(link)
-
-                parsed_html = web_html_cleanup(soup, self.mintlify_cleanup)
-
-                doc_batch.append(
-                    Document(
-                        id=current_url,
-                        sections=[
-                            Section(link=current_url, text=parsed_html.cleaned_text)
-                        ],
-                        source=DocumentSource.WEB,
-                        semantic_identifier=parsed_html.title or current_url,
-                        metadata={},
-                    )
-                )
-
-                page.close()
-            except Exception as e:
-                logger.error(f"Failed to fetch '{current_url}': {e}")
-                playwright.stop()
-                restart_playwright = True
-                continue
-
-            if len(doc_batch) >= self.batch_size:
-                playwright.stop()
-                restart_playwright = True
-                yield doc_batch
-                doc_batch = []
-
+                    for link in crawled_page.links:
+                        link = normalize_url(link)
+                        if base_url in link and link not in seen_urls:
+                            seen_urls.add(link)
+                            frontier.append(link)
+
+                doc_batch.append(crawled_page.document)
+                if len(doc_batch) >= self.batch_size:
+                    # Long crawls may outlive the token
+                    self._headers = get_oauth_headers()
+                    yield doc_batch
+                    doc_batch = []
+
+        logger.info(f"Rebuilt {num_cached_pages} unchanged pages from the page cache")
         if doc_batch:
-            playwright.stop()
             yield doc_batch
 
 
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections.abc import Mapping
+from typing import Any
+
+from pydantic import BaseModel
+
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Bump when the cached fields or the way pages are parsed change, older entries are ignored
+_CACHE_VERSION = 2
+# Share of the entries kept when the cache is full, so it isn't pruned on every write
+_EVICTION_TARGET_RATIO = 0.9
+
+
+class CachedWebPage(BaseModel):
+    url: str
+    # URL after redirects
+    final_url: str
+    etag: str | None
+    last_modified: str | None
+    title: str | None
+    text: str
+    # Every link on the page to the same host, filtered by the crawl base URL on use
+    links: list[str]
+    # Parsing options the text was extracted with
+    parse_options: dict[str, Any]
+    version: int = _CACHE_VERSION
+
+
+def get_validators(headers: Mapping[str, str]) -> tuple[str | None, str | None]:
+    """ETag and Last-Modified of a response, works with the case insensitive headers of
+    `requests` and the lower cased ones of Playwright"""
+    lower_headers = {key.lower(): value for key, value in headers.items()}
+    return lower_headers.get("etag"), lower_headers.get("last-modified")
+
+
+def get_conditional_headers(cached_page: CachedWebPage | None) -> dict[str, str]:
+    if cached_page is None:
+        return {}
+
+    headers = {}
+    if cached_page.etag:
+        headers["If-None-Match"] = cached_page.etag
+    if cached_page.last_modified:
+        headers["If-Modified-Since"] = cached_page.last_modified
+    return headers
+
+
+def _get_mtime(entry: os.DirEntry) -> float:
+    try:
+        return entry.stat().st_mtime
+    except OSError:
+        # Deleted in the meantime
+        return 0.0
+
+
+class WebPageCache:
+    """On disk cache of the pages fetched by the web connector, one JSON file per URL.
+
+    Only used to skip rendering pages the server confirms haven't changed (a 304 to a
+    conditional request), a missing, unreadable or unwritable cache just means the pages
+    get rendered again. Each `scope` (connector config and the identity pages are fetched
+    with) gets its own directory, holding at most `max_pages` pages. The least recently
+    used pages are evicted first."""
+
+    def __init__(self, cache_dir: str, scope: str, max_pages: int) -> None:
+        self.cache_dir = os.path.join(
+            cache_dir, hashlib.sha256(scope.encode()).hexdigest()[:32]
+        )
+        self.max_pages = max(max_pages, 1)
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._num_pages = len(self._list_entries())
+            self.enabled = True
+        except OSError as e:
+            logger.warning(
+                f"Web page cache disabled, can't use '{self.cache_dir}': {e}"
+            )
+            self.enabled = False
+
+    def _get_path(self, url: str) -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + ".json"
+        )
+
+    def _list_entries(self) -> list[os.DirEntry]:
+        with os.scandir(self.cache_dir) as entries:
+            return [entry for entry in entries if entry.name.endswith(".json")]
+
+    def get(self, url: str, parse_options: dict[str, Any]) -> CachedWebPage | None:
+        if not self.enabled:
+            return None
+
+        path = self._get_path(url)
+        try:
+            with open(path) as f:
+                cached_page = CachedWebPage.parse_obj(json.load(f))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable web page cache entry for {url}: {e}")
+            return None
+
+        if (
+            cached_page.url != url
+            or cached_page.version != _CACHE_VERSION
+            or cached_page.parse_options != parse_options
+        ):
+            return None
+
+        try:
+            # The modification time orders the entries for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return cached_page
+
+    def put(self, cached_page: CachedWebPage) -> None:
+        if not self.enabled:
+            return
+
+        path = self._get_path(cached_page.url)
+        try:
+            is_new_page = not os.path.exists(path)
+            # Written to a temp file first so readers never see a partial entry
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.cache_dir, suffix=".tmp", delete=False
+            ) as f:
+                f.write(cached_page.json())
+            os.replace(f.name, path)
+        except OSError as e:
+            logger.warning(f"Failed to write web page cache entry for {path}: {e}")
+            return
+
+        if is_new_page:
+            with self._lock:
+                self._num_pages += 1
+                if self._num_pages > self.max_pages:
+                    self._evict()
+
+    def _evict(self) -> None:
+        """Deletes the least recently used pages. Other processes may be writing to the
+        same directory, so the entries are counted again rather than trusting the count
+        """
+        try:
+            entries = self._list_entries()
+            entries.sort(key=_get_mtime)
+        except OSError as e:
+            logger.warning(f"Failed to list the web page cache entries: {e}")
+            return
+
+        num_to_keep = int(self.max_pages * _EVICTION_TARGET_RATIO)
+        num_evicted = 0
+        for entry in entries[: max(len(entries) - num_to_keep, 0)]:
+            try:
+                os.remove(entry.path)
+                num_evicted += 1
+            except OSError:
+                pass
+        self._num_pages = len(entries) - num_evicted
+        logger.debug(f"Evicted {num_evicted} pages from the web page cache")
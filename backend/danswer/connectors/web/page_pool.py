@@ -0,0 +1,156 @@
+import queue
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Generic
+from typing import TypeVar
+from urllib.parse import urlparse
+
+from playwright.sync_api import BrowserContext
+from playwright.sync_api import Playwright
+
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+R = TypeVar("R")
+BrowserStarter = Callable[[], tuple[Playwright, BrowserContext]]
+# Starts the browser of the worker if needed, only called for pages that get rendered
+ContextGetter = Callable[[], BrowserContext]
+
+
+class HostThrottle:
+    """Spaces out the page visits to each host by at least `delay` seconds, shared by all
+    the workers of the pool"""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._next_visit_times: dict[str, float] = {}
+
+    def wait(self, url: str) -> None:
+        if self.delay <= 0:
+            return
+
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            visit_time = max(now, self._next_visit_times.get(host, now))
+            self._next_visit_times[host] = visit_time + self.delay
+
+        if visit_time > now:
+            time.sleep(visit_time - now)
+
+
+@dataclass
+class PageTaskResult(Generic[R]):
+    url: str
+    result: R | None
+    error: Exception | None
+
+
+class BrowserPagePool(Generic[R]):
+    """Runs `process_page` on the submitted URLs with `num_workers` threads, so at most
+    `num_workers` pages are fetched / rendered at a time. Results come back in the order
+    they complete.
+
+    Playwright's sync API is bound to the thread it was started in so every worker owns
+    its browser. It is only started once a page needs to be rendered and restarted after
+    a failed page and every `pages_per_browser` rendered pages, as long running browsers
+    keep growing in memory."""
+
+    def __init__(
+        self,
+        process_page: Callable[[str, ContextGetter], R],
+        start_browser: BrowserStarter,
+        num_workers: int,
+        host_delay: float,
+        pages_per_browser: int,
+    ) -> None:
+        self.num_workers = max(num_workers, 1)
+        self.num_in_flight = 0
+        self._process_page = process_page
+        self._start_browser = start_browser
+        self._host_throttle = HostThrottle(host_delay)
+        self._pages_per_browser = pages_per_browser
+        self._tasks: queue.Queue[str | None] = queue.Queue()
+        self._results: queue.Queue[PageTaskResult[R]] = queue.Queue()
+        self._stop_event = threading.Event()
+        self._workers = [
+            threading.Thread(
+                target=self._run_worker, name=f"web-crawl-{ind}", daemon=True
+            )
+            for ind in range(self.num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.num_in_flight < self.num_workers
+
+    def submit(self, url: str) -> None:
+        self.num_in_flight += 1
+        self._tasks.put(url)
+
+    def get_result(self) -> PageTaskResult[R]:
+        """Blocks until one of the submitted pages is done"""
+        result = self._results.get()
+        self.num_in_flight -= 1
+        return result
+
+    def close(self) -> None:
+        """Pages not yet started are dropped, the ones in progress are finished first"""
+        self._stop_event.set()
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self) -> "BrowserPagePool[R]":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def _run_worker(self) -> None:
+        playwright: Playwright | None = None
+        context: BrowserContext | None = None
+        num_renders = 0
+
+        def _get_context() -> BrowserContext:
+            nonlocal playwright, context, num_renders
+            if context is None:
+                playwright, context = self._start_browser()
+            num_renders += 1
+            return context
+
+        def _stop_browser() -> None:
+            nonlocal playwright, context, num_renders
+            if playwright is not None:
+                try:
+                    playwright.stop()
+                except Exception as e:
+                    logger.warning(f"Failed to stop browser: {e}")
+            playwright, context, num_renders = None, None, 0
+
+        try:
+            while True:
+                url = self._tasks.get()
+                if url is None or self._stop_event.is_set():
+                    break
+
+                self._host_throttle.wait(url)
+                try:
+                    result = self._process_page(url, _get_context)
+                except Exception as e:
+                    _stop_browser()
+                    self._results.put(PageTaskResult(url=url, result=None, error=e))
+                    continue
+
+                self._results.put(PageTaskResult(url=url, result=result, error=None))
+                if num_renders >= self._pages_per_browser:
+                    _stop_browser()
+        finally:
+            _stop_browser()
@@ -4,11 +4,17 @@ from datetime import datetime
 from uuid import UUID
 
 from sqlalchemy import and_
+from sqlalchemy import bindparam
+from sqlalchemy import cast
+from sqlalchemy import ColumnElement
 from sqlalchemy import delete
 from sqlalchemy import func
 from sqlalchemy import or_
 from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import InstrumentedAttribute
 from sqlalchemy.orm import Session
 
 from danswer.configs.constants import DEFAULT_BOOST
@@ -17,8 +23,11 @@ from danswer.db.models import ConnectorCredentialPair
 from danswer.db.models import Credential
 from danswer.db.models import Document as DbDocument
 from danswer.db.models import DocumentByConnectorCredentialPair
+from danswer.db.models import DocumentSet as DocumentSetDBModel
+from danswer.db.models import DocumentSet__ConnectorCredentialPair
 from danswer.db.tag import delete_document_tags_for_documents
 from danswer.db.utils import model_to_dict
+from danswer.document_index.interfaces import DocumentIndexInfo
 from danswer.document_index.interfaces import DocumentMetadata
 from danswer.server.documents.models import ConnectorCredentialPairIdentifier
 from danswer.utils.logger import setup_logger
@@ -146,6 +155,77 @@ def get_acccess_info_for_documents(
     return db_session.execute(stmt).all()  # type: ignore
 
 
+def get_index_info_for_documents(
+    db_session: Session,
+    document_ids: list[str],
+    cc_pair_to_delete: ConnectorCredentialPairIdentifier | None = None,
+) -> dict[str, DocumentIndexInfo]:
+    """Gets back, in a single query, the names of the current document sets of the cc
+    pairs of the given documents, their boost and their chunk counts per index. Access is
+    left to `get_access_for_documents`, which may be overridden.
+
+    `cc_pair_to_delete` works as in `get_acccess_info_for_documents`. Documents without
+    any cc pair are left out.
+    """
+    stmt = select(
+        DbDocument.id,
+        func.array_agg(DocumentSetDBModel.name.distinct()).label("document_sets"),
+        DbDocument.boost,
+        DbDocument.chunk_counts,
+    ).where(DbDocument.id.in_(document_ids))
+
+    # pretend that the specified cc pair doesn't exist
+    if cc_pair_to_delete:
+        stmt = stmt.where(
+            and_(
+                DocumentByConnectorCredentialPair.connector_id
+                != cc_pair_to_delete.connector_id,
+                DocumentByConnectorCredentialPair.credential_id
+                != cc_pair_to_delete.credential_id,
+            )
+        )
+
+    stmt = (
+        stmt.join(
+            DocumentByConnectorCredentialPair,
+            DocumentByConnectorCredentialPair.id == DbDocument.id,
+        )
+        .join(
+            ConnectorCredentialPair,
+            and_(
+                DocumentByConnectorCredentialPair.connector_id
+                == ConnectorCredentialPair.connector_id,
+                DocumentByConnectorCredentialPair.credential_id
+                == ConnectorCredentialPair.credential_id,
+            ),
+        )
+        # Outer joins so documents of cc pairs without document sets are kept
+        .outerjoin(
+            DocumentSet__ConnectorCredentialPair,
+            and_(
+                DocumentSet__ConnectorCredentialPair.connector_credential_pair_id
+                == ConnectorCredentialPair.id,
+                DocumentSet__ConnectorCredentialPair.is_current == True,  # noqa: E712
+            ),
+        )
+        .outerjoin(
+            DocumentSetDBModel,
+            DocumentSetDBModel.id
+            == DocumentSet__ConnectorCredentialPair.document_set_id,
+        )
+        .group_by(DbDocument.id)
+    )
+    return {
+        document_id: DocumentIndexInfo(
+            # None for the cc pairs that aren't in any document set
+            document_sets={name for name in document_sets if name},
+            boost=boost,
+            chunk_counts=chunk_counts or {},
+        )
+        for document_id, document_sets, boost, chunk_counts in db_session.execute(stmt)
+    }
+
+
 def upsert_documents(
     db_session: Session,
     document_metadata_batch: list[DocumentMetadata],
@@ -231,6 +311,77 @@ def update_docs_updated_at(
     db_session.commit()
 
 
+def clear_docs_content_hashes(
+    document_ids: list[str], index_name: str, db_session: Session
+) -> None:
+    """Must be called (and committed) before the documents are modified in the document index
+    so that the stored hashes and chunk counts never describe a partially indexed document
+    """
+    if not document_ids:
+        return
+
+    db_session.execute(
+        update(DbDocument)
+        .where(DbDocument.id.in_(document_ids))
+        .values(
+            chunk_hashes=DbDocument.chunk_hashes.op("-")(index_name),
+            metadata_hashes=DbDocument.metadata_hashes.op("-")(index_name),
+            chunk_counts=DbDocument.chunk_counts.op("-")(index_name),
+        )
+    )
+    db_session.commit()
+
+
+def _merge_into_jsonb_column(
+    column: InstrumentedAttribute, param_name: str
+) -> ColumnElement:
+    return func.coalesce(column, cast({}, postgresql.JSONB)).op("||")(
+        bindparam(param_name, type_=postgresql.JSONB)
+    )
+
+
+def update_docs_content_hashes(
+    ids_to_chunk_hashes: dict[str, list[str]],
+    ids_to_metadata_hash: dict[str, str],
+    index_name: str,
+    db_session: Session,
+) -> None:
+    """Only the entries of `index_name` are replaced, in the database itself, since the
+    primary and secondary index builds record the hashes of the same documents"""
+    if not ids_to_chunk_hashes:
+        return
+
+    stmt = (
+        update(DbDocument)
+        .where(DbDocument.id == bindparam("document_id"))
+        .values(
+            chunk_hashes=_merge_into_jsonb_column(
+                DbDocument.chunk_hashes, "new_chunk_hashes"
+            ),
+            metadata_hashes=_merge_into_jsonb_column(
+                DbDocument.metadata_hashes, "new_metadata_hashes"
+            ),
+            chunk_counts=_merge_into_jsonb_column(
+                DbDocument.chunk_counts, "new_chunk_counts"
+            ),
+        )
+    )
+    # Executed on the connection, so each document gets its own values in one executemany
+    db_session.connection().execute(
+        stmt,
+        [
+            {
+                "document_id": document_id,
+                "new_chunk_hashes": {index_name: chunk_hashes},
+                "new_metadata_hashes": {index_name: ids_to_metadata_hash[document_id]},
+                "new_chunk_counts": {index_name: len(chunk_hashes)},
+            }
+            for document_id, chunk_hashes in ids_to_chunk_hashes.items()
+        ],
+    )
+    db_session.commit()
+
+
 def upsert_documents_complete(
     db_session: Session,
     document_metadata_batch: list[DocumentMetadata],
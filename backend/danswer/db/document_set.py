@@ -340,6 +340,42 @@ def fetch_documents_for_document_set(
     return db_session.scalars(stmt).all()
 
 
+def fetch_documents_for_changed_cc_pairs(
+    document_set_id: int, db_session: Session
+) -> Sequence[Document]:
+    """Documents of the cc pairs of a document set that is not up to date, leaving out
+    the ones whose membership can't have changed. Updating a document set marks all of
+    its existing cc pairs as not current and adds the requested ones as current, so the cc
+    pairs kept by the update have both rows and are skipped. Added and removed cc pairs
+    have one of them (as do the untouched cc pairs when another one is deleted, those are
+    synced as well)"""
+    changed_cc_pair_ids = (
+        select(DocumentSet__ConnectorCredentialPair.connector_credential_pair_id)
+        .where(DocumentSet__ConnectorCredentialPair.document_set_id == document_set_id)
+        .group_by(DocumentSet__ConnectorCredentialPair.connector_credential_pair_id)
+        .having(func.count(DocumentSet__ConnectorCredentialPair.is_current) == 1)
+    )
+    stmt = (
+        select(Document)
+        .join(
+            DocumentByConnectorCredentialPair,
+            DocumentByConnectorCredentialPair.id == Document.id,
+        )
+        .join(
+            ConnectorCredentialPair,
+            and_(
+                ConnectorCredentialPair.connector_id
+                == DocumentByConnectorCredentialPair.connector_id,
+                ConnectorCredentialPair.credential_id
+                == DocumentByConnectorCredentialPair.credential_id,
+            ),
+        )
+        .where(ConnectorCredentialPair.id.in_(changed_cc_pair_ids))
+        .distinct()
+    )
+    return db_session.scalars(stmt).all()
+
+
 def fetch_document_sets_for_documents(
     document_ids: list[str], db_session: Session
 ) -> Sequence[tuple[str, list[str]]]:
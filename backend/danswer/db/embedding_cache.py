@@ -0,0 +1,97 @@
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from danswer.db.models import EmbeddingCacheEntry
+
+
+def fetch_cached_embeddings(
+    model_name: str,
+    normalize: bool,
+    prefix: str,
+    text_hashes: list[str],
+    db_session: Session,
+) -> dict[str, tuple[int, bytes]]:
+    """Returns the entry id and the cached embedding bytes by text hash. Hits are not marked
+    as recently used here, see `touch_cached_embeddings`"""
+    if not text_hashes:
+        return {}
+
+    rows = db_session.execute(
+        select(
+            EmbeddingCacheEntry.text_hash,
+            EmbeddingCacheEntry.id,
+            EmbeddingCacheEntry.embedding,
+        ).where(
+            EmbeddingCacheEntry.model_name == model_name,
+            EmbeddingCacheEntry.normalize == normalize,
+            EmbeddingCacheEntry.prefix == prefix,
+            EmbeddingCacheEntry.text_hash.in_(text_hashes),
+        )
+    ).all()
+
+    return {text_hash: (entry_id, embedding) for text_hash, entry_id, embedding in rows}
+
+
+def touch_cached_embeddings(entry_ids: list[int], db_session: Session) -> None:
+    """Marks the entries as recently used so they are evicted last"""
+    if not entry_ids:
+        return
+
+    db_session.execute(
+        update(EmbeddingCacheEntry)
+        .where(EmbeddingCacheEntry.id.in_(entry_ids))
+        .values(last_accessed=func.now())
+    )
+    db_session.commit()
+
+
+def upsert_cached_embeddings(
+    model_name: str,
+    normalize: bool,
+    prefix: str,
+    text_hash_to_embedding: dict[str, bytes],
+    db_session: Session,
+) -> None:
+    if not text_hash_to_embedding:
+        return
+
+    insert_stmt = insert(EmbeddingCacheEntry).values(
+        [
+            {
+                "model_name": model_name,
+                "normalize": normalize,
+                "prefix": prefix,
+                "text_hash": text_hash,
+                "embedding": embedding,
+            }
+            for text_hash, embedding in text_hash_to_embedding.items()
+        ]
+    )
+    db_session.execute(
+        insert_stmt.on_conflict_do_update(
+            constraint="_embedding_cache_key_uc",
+            set_={"last_accessed": func.now()},
+        )
+    )
+    db_session.commit()
+
+
+def evict_least_recently_used_embeddings(max_size: int, db_session: Session) -> int:
+    """Deletes all but the `max_size` most recently used entries, returns the number deleted"""
+    cutoff = (
+        select(EmbeddingCacheEntry.last_accessed)
+        .order_by(EmbeddingCacheEntry.last_accessed.desc())
+        .offset(max_size)
+        .limit(1)
+        .scalar_subquery()
+    )
+    # If there are fewer than `max_size` entries, the cutoff is NULL and nothing matches
+    result = db_session.execute(
+        delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.last_accessed <= cutoff)
+    )
+    db_session.commit()
+    return result.rowcount  # type: ignore
@@ -55,6 +55,7 @@ def update_document_boost(
     update = UpdateRequest(
         document_ids=[document_id],
         boost=boost,
+        chunk_counts={document_id: result.chunk_counts or {}},
     )
 
     document_index.update(update_requests=[update])
@@ -75,6 +76,7 @@ def update_document_hidden(
     update = UpdateRequest(
         document_ids=[document_id],
         hidden=hidden,
+        chunk_counts={document_id: result.chunk_counts or {}},
     )
 
     document_index.update(update_requests=[update])
@@ -120,7 +122,10 @@ def create_doc_retrieval_feedback(
         SearchFeedbackType.HIDE,
     ]:
         update = UpdateRequest(
-            document_ids=[document_id], boost=db_doc.boost, hidden=db_doc.hidden
+            document_ids=[document_id],
+            boost=db_doc.boost,
+            hidden=db_doc.hidden,
+            chunk_counts={document_id: db_doc.chunk_counts or {}},
         )
         # Updates are generally batched for efficiency, this case only 1 doc/value is updated
         document_index.update(update_requests=[update])
@@ -1,4 +1,7 @@
+import hashlib
+import json
 from collections.abc import Sequence
+from typing import Any
 
 from sqlalchemy import and_
 from sqlalchemy import ColumnElement
@@ -11,6 +14,7 @@ from sqlalchemy import update
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import Session
 
+from danswer.db.models import Connector
 from danswer.db.models import EmbeddingModel
 from danswer.db.models import IndexAttempt
 from danswer.db.models import IndexingStatus
@@ -123,6 +127,67 @@ def update_docs_indexed(
     db_session.commit()
 
 
+def get_connector_config_hash(connector: Connector) -> str:
+    """Fingerprint of what the connector loads, a checkpoint of one config can skip or
+    misplace documents when resumed with another"""
+    return hashlib.sha256(
+        json.dumps(
+            [
+                connector.source,
+                connector.input_type,
+                connector.connector_specific_config,
+            ],
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+
+def update_index_attempt_checkpoint(
+    db_session: Session,
+    index_attempt: IndexAttempt,
+    checkpoint: dict[str, Any],
+) -> None:
+    index_attempt.checkpoint = checkpoint
+    index_attempt.checkpoint_config_hash = get_connector_config_hash(
+        index_attempt.connector
+    )
+
+    db_session.add(index_attempt)
+    db_session.commit()
+
+
+def get_checkpoint_to_resume_from(
+    index_attempt: IndexAttempt, db_session: Session
+) -> dict[str, Any] | None:
+    """Checkpoint of the previous attempt of the same connector, credential and embedding
+    model, only if that attempt failed and the connector config hasn't changed since.
+    Anything else means it has nothing to resume"""
+    stmt = select(IndexAttempt).where(
+        IndexAttempt.connector_id == index_attempt.connector_id,
+        IndexAttempt.credential_id == index_attempt.credential_id,
+        IndexAttempt.embedding_model_id == index_attempt.embedding_model_id,
+        IndexAttempt.id != index_attempt.id,
+        IndexAttempt.time_created <= index_attempt.time_created,
+    )
+    stmt = stmt.order_by(desc(IndexAttempt.time_created)).limit(1)
+    previous_attempt = db_session.scalars(stmt).first()
+
+    if previous_attempt is None or previous_attempt.status != IndexingStatus.FAILED:
+        return None
+
+    if previous_attempt.checkpoint is not None and (
+        previous_attempt.checkpoint_config_hash
+        != get_connector_config_hash(index_attempt.connector)
+    ):
+        logger.info(
+            f"Not resuming from the checkpoint of index attempt {previous_attempt.id}, "
+            "the connector config changed since"
+        )
+        return None
+    return previous_attempt.checkpoint
+
+
 def get_last_attempt(
     connector_id: int,
     credential_id: int,
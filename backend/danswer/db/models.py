@@ -19,6 +19,7 @@ from sqlalchemy import ForeignKey
 from sqlalchemy import func
 from sqlalchemy import Index
 from sqlalchemy import Integer
+from sqlalchemy import LargeBinary
 from sqlalchemy import Sequence
 from sqlalchemy import String
 from sqlalchemy import Text
@@ -273,6 +274,21 @@ class Document(Base):
     secondary_owners: Mapped[list[str] | None] = mapped_column(
         postgresql.ARRAY(String), nullable=True
     )
+    # Hashes of the chunks (in chunk order) and of the document level fields last successfully
+    # indexed into each index (by index name). Used to skip re-embedding / re-indexing content
+    # that has not actually changed
+    chunk_hashes: Mapped[dict[str, list[str]] | None] = mapped_column(
+        postgresql.JSONB(), nullable=True
+    )
+    metadata_hashes: Mapped[dict[str, str] | None] = mapped_column(
+        postgresql.JSONB(), nullable=True
+    )
+    # Number of chunks of the document in each index (by index name) it was last successfully
+    # indexed into. Chunk ids are deterministic, so updates can address the chunks directly
+    # instead of searching for them. An index is left out while its chunks are being modified
+    chunk_counts: Mapped[dict[str, int] | None] = mapped_column(
+        postgresql.JSONB(), nullable=True
+    )
     # TODO if more sensitive data is added here for display, make sure to add user/group permission
 
     retrieval_feedbacks: Mapped[List["DocumentRetrievalFeedback"]] = relationship(
@@ -401,6 +417,47 @@ class EmbeddingModel(Base):
     )
 
 
+class RateLimitBucket(Base):
+    """Token bucket shared by all the processes calling the same external API, see
+    `danswer.connectors.cross_connector_utils.rate_limit_wrapper`"""
+
+    __tablename__ = "rate_limit_bucket"
+
+    # e.g. "<source>:<tenant>"
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float)
+    # Unix time the tokens were last computed at, in the future while the API asked to back off
+    updated_at: Mapped[float] = mapped_column(Float)
+
+
+class EmbeddingCacheEntry(Base):
+    """Previously computed passage embeddings, see `danswer.indexing.embedding_cache`"""
+
+    __tablename__ = "embedding_cache"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    model_name: Mapped[str] = mapped_column(String)
+    normalize: Mapped[bool] = mapped_column(Boolean)
+    prefix: Mapped[str] = mapped_column(String)
+    # sha256 of the (unprefixed) text
+    text_hash: Mapped[str] = mapped_column(String)
+    # float32 little-endian bytes
+    embedding: Mapped[bytes] = mapped_column(LargeBinary)
+    last_accessed: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), index=True
+    )
+
+    __table_args__ = (
+        UniqueConstraint(
+            "model_name",
+            "normalize",
+            "prefix",
+            "text_hash",
+            name="_embedding_cache_key_uc",
+        ),
+    )
+
+
 class IndexAttempt(Base):
     """
     Represents an attempt to index a group of 1 or more documents from a
@@ -431,6 +488,16 @@ class IndexAttempt(Base):
     error_msg: Mapped[str | None] = mapped_column(Text, default=None)
     # only filled if status = "failed" AND an unhandled exception caused the failure
     full_exception_trace: Mapped[str | None] = mapped_column(Text, default=None)
+    # Last connector checkpoint whose documents have all been indexed, a later attempt of a
+    # checkpointed connector resumes from it if this attempt failed
+    checkpoint: Mapped[dict[str, Any] | None] = mapped_column(
+        postgresql.JSONB(), nullable=True, default=None
+    )
+    # Hash of the connector config the checkpoint was made with, a checkpoint is only
+    # meaningful to the same config
+    checkpoint_config_hash: Mapped[str | None] = mapped_column(
+        String, nullable=True, default=None
+    )
     # Nullable because in the past, we didn't allow swapping out embedding models live
     embedding_model_id: Mapped[int] = mapped_column(
         ForeignKey("embedding_model.id"),
@@ -0,0 +1,20 @@
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from danswer.db.models import RateLimitBucket
+
+
+def lock_rate_limit_bucket(
+    db_session: Session, key: str, capacity: float, now: float
+) -> RateLimitBucket:
+    """Creates the bucket full if it doesn't exist yet and locks its row until the end of the
+    transaction, so that concurrent callers take tokens one after the other"""
+    db_session.execute(
+        insert(RateLimitBucket)
+        .values(key=key, tokens=capacity, updated_at=now)
+        .on_conflict_do_nothing(index_elements=[RateLimitBucket.key])
+    )
+    return db_session.scalars(
+        select(RateLimitBucket).where(RateLimitBucket.key == key).with_for_update()
+    ).one()
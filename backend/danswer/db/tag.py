@@ -1,78 +1,96 @@
 from sqlalchemy import delete
 from sqlalchemy import func
 from sqlalchemy import select
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from danswer.configs.constants import DocumentSource
-from danswer.db.models import Document
 from danswer.db.models import Document__Tag
 from danswer.db.models import Tag
 from danswer.utils.logger import setup_logger
 
 logger = setup_logger()
 
+# (tag_key, tag_value, source)
+TagTuple = tuple[str, str, DocumentSource]
 
-def create_or_add_document_tag(
-    tag_key: str,
-    tag_value: str,
-    source: DocumentSource,
-    document_id: str,
-    db_session: Session,
-) -> Tag:
-    document = db_session.get(Document, document_id)
-    if not document:
-        raise ValueError("Invalid Document, cannot attach Tags")
-
-    tag_stmt = select(Tag).where(
-        Tag.tag_key == tag_key,
-        Tag.tag_value == tag_value,
-        Tag.source == source,
-    )
-    tag = db_session.execute(tag_stmt).scalar_one_or_none()
-
-    if not tag:
-        tag = Tag(tag_key=tag_key, tag_value=tag_value, source=source)
-        db_session.add(tag)
-
-    if tag not in document.tags:
-        document.tags.append(tag)
-
-    db_session.commit()
-    return tag
 
+# Attempts at getting the IDs of the tags, tags can be deleted concurrently as orphans
+_MAX_TAG_UPSERT_ATTEMPTS = 3
 
-def create_or_add_document_tag_list(
-    tag_key: str,
-    tag_values: list[str],
-    source: DocumentSource,
-    document_id: str,
-    db_session: Session,
-) -> list[Tag]:
-    document = db_session.get(Document, document_id)
-    if not document:
-        raise ValueError("Invalid Document, cannot attach Tags")
 
-    existing_tags_stmt = select(Tag).where(
-        Tag.tag_key == tag_key, Tag.tag_value.in_(tag_values), Tag.source == source
+def _insert_tags(tags: list[TagTuple], db_session: Session) -> dict[TagTuple, int]:
+    """Inserts the tags that don't exist yet, only those are returned"""
+    insert_tags_stmt = (
+        insert(Tag)
+        .values(
+            [
+                {"tag_key": tag_key, "tag_value": tag_value, "source": source}
+                for tag_key, tag_value, source in tags
+            ]
+        )
+        .on_conflict_do_nothing(constraint="_tag_key_value_source_uc")
+        .returning(Tag.id, Tag.tag_key, Tag.tag_value, Tag.source)
     )
-    existing_tags = list(db_session.execute(existing_tags_stmt).scalars().all())
-    existing_tag_values = {tag.tag_value for tag in existing_tags}
-
-    new_tags = []
-    for tag_value in tag_values:
-        if tag_value not in existing_tag_values:
-            new_tag = Tag(tag_key=tag_key, tag_value=tag_value, source=source)
-            db_session.add(new_tag)
-            new_tags.append(new_tag)
-
-    all_tags = existing_tags + new_tags
+    return {
+        (tag_key, tag_value, source): tag_id
+        for tag_id, tag_key, tag_value, source in db_session.execute(insert_tags_stmt)
+    }
+
+
+def _select_tag_ids(tags: list[TagTuple], db_session: Session) -> dict[TagTuple, int]:
+    """IDs of the tags that exist. The rows are locked so they can't be deleted before
+    the documents are attached to them"""
+    select_tags_stmt = (
+        select(Tag.id, Tag.tag_key, Tag.tag_value, Tag.source)
+        .where(tuple_(Tag.tag_key, Tag.tag_value, Tag.source).in_(tags))
+        .with_for_update(key_share=True)
+    )
+    return {
+        (tag_key, tag_value, source): tag_id
+        for tag_id, tag_key, tag_value, source in db_session.execute(select_tags_stmt)
+    }
 
-    for tag in all_tags:
-        if tag not in document.tags:
-            document.tags.append(tag)
 
+def upsert_document_tags(
+    document_tags: dict[str, set[TagTuple]], db_session: Session
+) -> None:
+    """Creates the missing tags and attaches them to the documents for a whole batch of
+    documents, with one commit. The documents must already exist. Tags already attached
+    to a document are kept"""
+    # Sorted so concurrent batches insert shared tags in the same order
+    all_tags = sorted(set().union(*document_tags.values()))
+    if not all_tags:
+        return
+
+    tag_ids: dict[TagTuple, int] = {}
+    missing_tags = all_tags
+    for _ in range(_MAX_TAG_UPSERT_ATTEMPTS):
+        tag_ids.update(_insert_tags(missing_tags, db_session))
+        # Tags that already existed are not returned by the insert
+        missing_tags = [tag for tag in missing_tags if tag not in tag_ids]
+        if missing_tags:
+            tag_ids.update(_select_tag_ids(missing_tags, db_session))
+            # Deleted between the insert and the select, inserted again on the next try
+            missing_tags = [tag for tag in missing_tags if tag not in tag_ids]
+        if not missing_tags:
+            break
+    else:
+        raise RuntimeError(
+            f"Failed to upsert {len(missing_tags)} tags, they kept being deleted"
+        )
+
+    document_tag_rows = [
+        {"document_id": document_id, "tag_id": tag_ids[tag]}
+        for document_id, tags in document_tags.items()
+        for tag in tags
+    ]
+    if document_tag_rows:
+        db_session.execute(
+            insert(Document__Tag).values(document_tag_rows).on_conflict_do_nothing()
+        )
     db_session.commit()
-    return all_tags
 
 
 def get_tags_by_value_prefix_for_source_types(
@@ -36,6 +36,17 @@ def translate_boost_count_to_multiplier(boost: int) -> float:
     return 2 / (1 + math.exp(-1 * boost / 3))
 
 
+def get_uuid_from_chunk_info(
+    document_id: str, chunk_id: int, mini_chunk_ind: int = 0
+) -> uuid.UUID:
+    doc_str = document_id
+    # Web parsing URL duplicate catching
+    if doc_str and doc_str[-1] == "/":
+        doc_str = doc_str[:-1]
+    unique_identifier_string = "_".join([doc_str, str(chunk_id), str(mini_chunk_ind)])
+    return uuid.uuid5(uuid.NAMESPACE_X500, unique_identifier_string)
+
+
 def get_uuid_from_chunk(
     chunk: IndexChunk | InferenceChunk, mini_chunk_ind: int = 0
 ) -> uuid.UUID:
@@ -44,10 +55,6 @@ def get_uuid_from_chunk(
         if isinstance(chunk, InferenceChunk)
         else chunk.source_document.id
     )
-    # Web parsing URL duplicate catching
-    if doc_str and doc_str[-1] == "/":
-        doc_str = doc_str[:-1]
-    unique_identifier_string = "_".join(
-        [doc_str, str(chunk.chunk_id), str(mini_chunk_ind)]
+    return get_uuid_from_chunk_info(
+        document_id=doc_str, chunk_id=chunk.chunk_id, mini_chunk_ind=mini_chunk_ind
     )
-    return uuid.uuid5(uuid.NAMESPACE_X500, unique_identifier_string)
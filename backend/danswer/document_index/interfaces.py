@@ -1,9 +1,12 @@
 import abc
+from collections.abc import Callable
 from dataclasses import dataclass
+from dataclasses import field
 from datetime import datetime
 from typing import Any
 
 from danswer.access.models import DocumentAccess
+from danswer.connectors.models import Document
 from danswer.indexing.models import DocMetadataAwareIndexChunk
 from danswer.indexing.models import InferenceChunk
 from danswer.search.models import IndexFilters
@@ -13,6 +16,8 @@ from danswer.search.models import IndexFilters
 class DocumentInsertionRecord:
     document_id: str
     already_existed: bool
+    # Some chunks of the document could not be written, it has to be indexed again
+    failed: bool = False
 
 
 @dataclass
@@ -30,6 +35,17 @@ class DocumentMetadata:
     from_ingestion_api: bool = False
 
 
+@dataclass(frozen=True)
+class DocumentIndexInfo:
+    """What the document index stores about a document besides its content and access,
+    resolved from Postgres (the source of truth)"""
+
+    document_sets: set[str]
+    boost: int
+    # Number of chunks of the document in each index it was last indexed into, by index name
+    chunk_counts: dict[str, int]
+
+
 @dataclass
 class UpdateRequest:
     """For all document_ids, update the allowed_users and the boost to the new value
@@ -41,6 +57,53 @@ class UpdateRequest:
     document_sets: set[str] | None = None
     boost: float | None = None
     hidden: bool | None = None
+    # Number of chunks of each document (by ID) in each index (by name), as far as known.
+    # Documents / indices missing here have their chunks looked up in the document index
+    chunk_counts: dict[str, dict[str, int]] | None = None
+
+
+@dataclass
+class ChunkSelection:
+    """Selects all the chunks in the index matching every given condition"""
+
+    # Chunks whose document sets include this one
+    document_set: str | None = None
+
+
+@dataclass
+class SelectionUpdateRequest:
+    """For all chunks matching the selection, update the given fields, ignore if None.
+    Unlike `UpdateRequest` the chunks are not looked up first, the index applies the
+    update to everything matching the selection in bulk"""
+
+    selection: ChunkSelection
+    add_document_sets: set[str] | None = None
+    remove_document_sets: set[str] | None = None
+    access: DocumentAccess | None = None
+    boost: float | None = None
+    hidden: bool | None = None
+
+
+@dataclass
+class SelectionUpdateProgress:
+    """How far a selection update got, pass it back to resume an interrupted update"""
+
+    # Index names mapped to the index specific token to continue from, None once done
+    continuations: dict[str, str | None] = field(default_factory=dict)
+    num_chunks_updated: int = 0
+
+
+@dataclass
+class MetadataRefreshRequest:
+    """For the given chunks of an already indexed document whose contents did not change,
+    update all of the document level fields (everything besides the chunk contents and
+    embeddings) to match the new version of the document"""
+
+    document: Document
+    chunk_ids: list[int]
+    access: DocumentAccess
+    document_sets: set[str]
+    boost: int
 
 
 class Verifiable(abc.ABC):
@@ -71,7 +134,14 @@ class Indexable(abc.ABC):
         self,
         chunks: list[DocMetadataAwareIndexChunk],
     ) -> set[DocumentInsertionRecord]:
-        """Indexes document chunks into the Document Index and return the IDs of all the documents indexed"""
+        """Indexes document chunks into the Document Index and return the IDs of all the documents indexed.
+        Documents that were only partially written are returned as failed"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def refresh_metadata(self, refresh_requests: list[MetadataRefreshRequest]) -> None:
+        """Updates the document level fields of already indexed chunks without touching
+        their contents or embeddings"""
         raise NotImplementedError
 
 
@@ -88,6 +158,18 @@ class Updatable(abc.ABC):
         """Updates metadata for the specified documents sets in the Index"""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def update_by_selection(
+        self,
+        selection_update: SelectionUpdateRequest,
+        progress: SelectionUpdateProgress | None = None,
+        progress_callback: Callable[[SelectionUpdateProgress], None] | None = None,
+    ) -> SelectionUpdateProgress:
+        """Updates all chunks matching the selection, for changes that apply to many documents
+        at once (e.g. removing a deleted document set). `progress_callback` is called as the
+        update advances, with a progress that can be passed back to resume from there"""
+        raise NotImplementedError
+
 
 class IdRetrievalCapable(abc.ABC):
     @abc.abstractmethod
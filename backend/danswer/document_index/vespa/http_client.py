@@ -0,0 +1,82 @@
+import os
+import threading
+from dataclasses import dataclass
+from dataclasses import replace
+from typing import Any
+from typing import cast
+
+import httpx
+
+from danswer.configs.app_configs import VESPA_HTTP_MAX_CONNECTIONS
+from danswer.configs.app_configs import VESPA_HTTP_MAX_KEEPALIVE_CONNECTIONS
+from danswer.configs.app_configs import VESPA_HTTP_TIMEOUT_SECONDS
+
+
+@dataclass
+class VespaHttpClientStats:
+    num_requests: int = 0
+    num_new_connections: int = 0
+
+    @property
+    def num_reused_connections(self) -> int:
+        return max(self.num_requests - self.num_new_connections, 0)
+
+    def summary(self) -> str:
+        return (
+            f"{self.num_requests} requests, {self.num_new_connections} new connections, "
+            f"{self.num_reused_connections} over reused connections"
+        )
+
+
+_lock = threading.Lock()
+_client: httpx.Client | None = None
+_client_pid: int | None = None
+_stats = VespaHttpClientStats()
+
+
+def _trace(event_name: str, info: dict[str, Any]) -> None:
+    if event_name == "connection.connect_tcp.complete":
+        with _lock:
+            _stats.num_new_connections += 1
+
+
+def _on_request(request: httpx.Request) -> None:
+    with _lock:
+        _stats.num_requests += 1
+    # Lets the connection pool report when it has to open a new connection
+    cast(dict[str, Any], request.extensions)["trace"] = _trace
+
+
+def get_vespa_http_client() -> httpx.Client:
+    """Process wide client for all requests to the Vespa container, so connections are kept
+    alive and reused instead of being set up again for every query / batch. Must not be
+    closed by the callers.
+
+    NOTE: using `httpx` since `requests` doesn't support HTTP2. Connections can't be shared
+    with forked processes, a new client is created in each process."""
+    global _client, _client_pid, _stats
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=VESPA_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=VESPA_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+                timeout=VESPA_HTTP_TIMEOUT_SECONDS,
+                event_hooks={"request": [_on_request]},
+            )
+            _client_pid = pid
+            _stats = VespaHttpClientStats()
+    return _client
+
+
+def get_vespa_http_client_stats() -> VespaHttpClientStats:
+    """Connection reuse of the client of this process since it was created"""
+    with _lock:
+        return replace(_stats)
@@ -3,9 +3,12 @@ import io
 import json
 import os
 import string
+import threading
 import time
 import zipfile
 from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
 from collections.abc import Mapping
 from dataclasses import dataclass
 from datetime import datetime
@@ -19,7 +22,10 @@ import httpx
 import requests
 from retry import retry
 
+from danswer.access.models import DocumentAccess
 from danswer.configs.app_configs import LOG_VESPA_TIMING_INFORMATION
+from danswer.configs.app_configs import VESPA_FEED_ENABLED
+from danswer.configs.app_configs import VESPA_FEED_MAX_IN_FLIGHT
 from danswer.configs.app_configs import VESPA_HOST
 from danswer.configs.app_configs import VESPA_PORT
 from danswer.configs.app_configs import VESPA_TENANT_PORT
@@ -33,6 +39,7 @@ from danswer.configs.constants import BLURB
 from danswer.configs.constants import BOOST
 from danswer.configs.constants import CHUNK_ID
 from danswer.configs.constants import CONTENT
+from danswer.configs.constants import CONTENT_HASH
 from danswer.configs.constants import DOC_UPDATED_AT
 from danswer.configs.constants import DOCUMENT_ID
 from danswer.configs.constants import DOCUMENT_SETS
@@ -56,10 +63,18 @@ from danswer.configs.model_configs import SEARCH_DISTANCE_CUTOFF
 from danswer.connectors.cross_connector_utils.miscellaneous_utils import (
     get_experts_stores_representations,
 )
+from danswer.connectors.models import Document
 from danswer.document_index.document_index_utils import get_uuid_from_chunk
+from danswer.document_index.document_index_utils import get_uuid_from_chunk_info
+from danswer.document_index.interfaces import ChunkSelection
 from danswer.document_index.interfaces import DocumentIndex
 from danswer.document_index.interfaces import DocumentInsertionRecord
+from danswer.document_index.interfaces import MetadataRefreshRequest
+from danswer.document_index.interfaces import SelectionUpdateProgress
+from danswer.document_index.interfaces import SelectionUpdateRequest
 from danswer.document_index.interfaces import UpdateRequest
+from danswer.document_index.vespa.http_client import get_vespa_http_client
+from danswer.document_index.vespa.http_client import get_vespa_http_client_stats
 from danswer.document_index.vespa.utils import remove_invalid_unicode_chars
 from danswer.indexing.models import DocMetadataAwareIndexChunk
 from danswer.indexing.models import InferenceChunk
@@ -94,6 +109,12 @@ _NUM_THREADS = (
 _VESPA_TIMEOUT = "3s"
 # Specific to Vespa, needed for highlighting matching keywords / section
 CONTENT_SUMMARY = "content_summary"
+# Id of the content cluster in services.xml, needed for selection based (visiting) operations
+_VESPA_CONTENT_CLUSTER = "danswer_index"
+# How long Vespa spends on each request of a selection update before handing back a
+# continuation, the client timeout has to be longer
+_SELECTION_UPDATE_TIME_CHUNK = "30s"
+_SELECTION_UPDATE_CLIENT_TIMEOUT = 60.0
 
 
 @dataclass
@@ -103,27 +124,11 @@ class _VespaUpdateRequest:
     update_request: dict[str, dict]
 
 
-@retry(tries=3, delay=1, backoff=2)
-def _does_document_exist(
-    doc_chunk_id: str,
-    index_name: str,
-    http_client: httpx.Client,
-) -> bool:
-    """Returns whether the document already exists and the users/group whitelists
-    Specifically in this case, document refers to a vespa document which is equivalent to a Danswer
-    chunk. This checks for whether the chunk exists already in the index"""
-    doc_fetch_response = http_client.get(
-        f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{doc_chunk_id}"
-    )
-    if doc_fetch_response.status_code == 404:
-        return False
-
-    if doc_fetch_response.status_code != 200:
-        raise RuntimeError(
-            f"Unexpected fetch document by ID value from Vespa "
-            f"with error {doc_fetch_response.status_code}"
-        )
-    return True
+@dataclass
+class _VespaFeedResult:
+    document_id: str
+    chunk_id: int
+    error: Exception | None = None
 
 
 def _vespa_get_updated_at_attribute(t: datetime | None) -> int | None:
@@ -157,7 +162,9 @@ def _get_vespa_chunk_ids_by_document_id(
         "hits": hits_per_page,
     }
     while True:
-        results = requests.post(SEARCH_ENDPOINT, json=params).json()
+        res = get_vespa_http_client().post(SEARCH_ENDPOINT, json=params)
+        res.raise_for_status()
+        results = res.json()
         hits = results["root"].get("children", [])
 
         doc_chunk_ids.extend(
@@ -213,63 +220,118 @@ def _delete_vespa_docs(
             executor.shutdown(wait=True)
 
 
-def _get_existing_documents_from_chunks(
-    chunks: list[DocMetadataAwareIndexChunk],
+@retry(tries=3, delay=1, backoff=2)
+def _get_existing_docs_and_stale_chunk_ids(
+    new_chunk_counts: dict[str, int],
     index_name: str,
     http_client: httpx.Client,
-    executor: concurrent.futures.ThreadPoolExecutor | None = None,
-) -> set[str]:
-    external_executor = True
-
-    if not executor:
-        external_executor = False
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS)
+    chunks_per_visit: int = _BATCH_SIZE,
+) -> tuple[set[str], list[str]]:
+    """For a batch of documents mapped to the number of chunks they are about to be indexed with,
+    finds which documents already exist in the index and the Vespa ids of their chunks beyond the
+    new chunk count. The selection only matches the first chunk (existence) and the stale chunks.
+    Visiting pages with continuations rather than an offset, so there is no limit on how many
+    stale chunks a batch can have"""
+    doc_selections = [
+        f'({index_name}.{DOCUMENT_ID} == "{_escape_selection_string(document_id)}" and '
+        f"({index_name}.{CHUNK_ID} == 0 or {index_name}.{CHUNK_ID} >= {chunk_count}))"
+        for document_id, chunk_count in new_chunk_counts.items()
+    ]
+    params: dict[str, int | str] = {
+        "selection": " or ".join(doc_selections),
+        "cluster": _VESPA_CONTENT_CLUSTER,
+        "fieldSet": f"{index_name}:{DOCUMENT_ID},{CHUNK_ID}",
+        "wantedDocumentCount": chunks_per_visit,
+        # Has to stay under the timeout of the shared client
+        "timeChunk": "10s",
+    }
 
-    document_ids: set[str] = set()
-    try:
-        chunk_existence_future = {
-            executor.submit(
-                _does_document_exist,
-                str(get_uuid_from_chunk(chunk)),
-                index_name,
-                http_client,
-            ): chunk
-            for chunk in chunks
-        }
-        for future in concurrent.futures.as_completed(chunk_existence_future):
-            chunk = chunk_existence_future[future]
-            chunk_already_existed = future.result()
-            if chunk_already_existed:
-                document_ids.add(chunk.source_document.id)
+    existing_docs: set[str] = set()
+    stale_chunk_ids: list[str] = []
+    while True:
+        res = http_client.get(
+            DOCUMENT_ID_ENDPOINT.format(index_name=index_name), params=params
+        )
+        res.raise_for_status()
+        body = res.json()
+
+        for document in body.get("documents", []):
+            fields = document["fields"]
+            if fields[CHUNK_ID] == 0:
+                existing_docs.add(fields[DOCUMENT_ID])
+            else:
+                stale_chunk_ids.append(document["id"].split("::", 1)[-1])
+
+        # Visiting may hand back fewer chunks than wanted, it is done once there is no
+        # continuation
+        if "continuation" not in body:
+            break
+        params["continuation"] = body["continuation"]
+    return existing_docs, stale_chunk_ids
 
-    finally:
-        if not external_executor:
-            executor.shutdown(wait=True)
 
-    return document_ids
+@retry(tries=3, delay=1, backoff=2)
+def _delete_vespa_chunk(
+    chunk_id: str, index_name: str, http_client: httpx.Client
+) -> None:
+    res = http_client.delete(
+        f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{chunk_id}"
+    )
+    res.raise_for_status()
 
 
-@retry(tries=3, delay=1, backoff=2)
-def _index_vespa_chunk(
-    chunk: DocMetadataAwareIndexChunk, index_name: str, http_client: httpx.Client
+def _delete_vespa_chunks(
+    chunk_ids: list[str],
+    index_name: str,
+    http_client: httpx.Client,
+    executor: concurrent.futures.ThreadPoolExecutor,
 ) -> None:
-    json_header = {
-        "Content-Type": "application/json",
+    chunk_deletion_futures = [
+        executor.submit(_delete_vespa_chunk, chunk_id, index_name, http_client)
+        for chunk_id in chunk_ids
+    ]
+    for future in concurrent.futures.as_completed(chunk_deletion_futures):
+        # Will raise exception if the deletion raised an exception
+        future.result()
+
+
+def _build_vespa_document_level_fields(
+    document: Document,
+    access: DocumentAccess,
+    document_sets: set[str],
+    boost: int,
+) -> dict[str, Any]:
+    """Fields which are identical for every chunk of a document"""
+    return {
+        DOCUMENT_ID: document.id,
+        SOURCE_TYPE: str(document.source.value),
+        SEMANTIC_IDENTIFIER: remove_invalid_unicode_chars(document.semantic_identifier),
+        METADATA: json.dumps(document.metadata),
+        # Save as a list for efficient extraction as an Attribute
+        METADATA_LIST: document.get_metadata_str_attributes(),
+        BOOST: boost,
+        DOC_UPDATED_AT: _vespa_get_updated_at_attribute(document.doc_updated_at),
+        PRIMARY_OWNERS: get_experts_stores_representations(document.primary_owners),
+        SECONDARY_OWNERS: get_experts_stores_representations(document.secondary_owners),
+        # the only `set` vespa has is `weightedset`, so we have to give each
+        # element an arbitrary weight
+        ACCESS_CONTROL_LIST: {acl_entry: 1 for acl_entry in access.to_acl()},
+        DOCUMENT_SETS: {document_set: 1 for document_set in document_sets},
     }
+
+
+def _build_vespa_chunk_fields(chunk: DocMetadataAwareIndexChunk) -> dict[str, Any]:
     document = chunk.source_document
-    # No minichunk documents in vespa, minichunk vectors are stored in the chunk itself
-    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
 
+    # Embeddings are float32 arrays up to here, Vespa takes JSON lists
     embeddings = chunk.embeddings
-    embeddings_name_vector_map = {"full_chunk": embeddings.full_embedding}
-    if embeddings.mini_chunk_embeddings:
-        for ind, m_c_embed in enumerate(embeddings.mini_chunk_embeddings):
-            embeddings_name_vector_map[f"mini_chunk_{ind}"] = m_c_embed
+    embeddings_name_vector_map = {"full_chunk": embeddings.full_embedding.tolist()}
+    for ind, m_c_embed in enumerate(embeddings.mini_chunk_embeddings.tolist()):
+        embeddings_name_vector_map[f"mini_chunk_{ind}"] = m_c_embed
 
     title = document.get_title_for_document_index()
 
     vespa_document_fields = {
-        DOCUMENT_ID: document.id,
         CHUNK_ID: chunk.chunk_id,
         BLURB: remove_invalid_unicode_chars(chunk.blurb),
         TITLE: remove_invalid_unicode_chars(title) if title else None,
@@ -277,24 +339,34 @@ def _index_vespa_chunk(
         CONTENT: remove_invalid_unicode_chars(chunk.content),
         # This duplication of `content` is needed for keyword highlighting :(
         CONTENT_SUMMARY: remove_invalid_unicode_chars(chunk.content),
-        SOURCE_TYPE: str(document.source.value),
+        CONTENT_HASH: chunk.content_hash,
         SOURCE_LINKS: json.dumps(chunk.source_links),
-        SEMANTIC_IDENTIFIER: remove_invalid_unicode_chars(document.semantic_identifier),
         SECTION_CONTINUATION: chunk.section_continuation,
-        METADATA: json.dumps(document.metadata),
-        # Save as a list for efficient extraction as an Attribute
-        METADATA_LIST: chunk.source_document.get_metadata_str_attributes(),
         EMBEDDINGS: embeddings_name_vector_map,
-        TITLE_EMBEDDING: chunk.title_embedding,
-        BOOST: chunk.boost,
-        DOC_UPDATED_AT: _vespa_get_updated_at_attribute(document.doc_updated_at),
-        PRIMARY_OWNERS: get_experts_stores_representations(document.primary_owners),
-        SECONDARY_OWNERS: get_experts_stores_representations(document.secondary_owners),
-        # the only `set` vespa has is `weightedset`, so we have to give each
-        # element an arbitrary weight
-        ACCESS_CONTROL_LIST: {acl_entry: 1 for acl_entry in chunk.access.to_acl()},
-        DOCUMENT_SETS: {document_set: 1 for document_set in chunk.document_sets},
+        TITLE_EMBEDDING: chunk.title_embedding.tolist()
+        if chunk.title_embedding is not None
+        else None,
+        **_build_vespa_document_level_fields(
+            document=document,
+            access=chunk.access,
+            document_sets=chunk.document_sets,
+            boost=chunk.boost,
+        ),
     }
+    return vespa_document_fields
+
+
+@retry(tries=3, delay=1, backoff=2)
+def _index_vespa_chunk(
+    chunk: DocMetadataAwareIndexChunk, index_name: str, http_client: httpx.Client
+) -> None:
+    json_header = {
+        "Content-Type": "application/json",
+    }
+    document = chunk.source_document
+    # No minichunk documents in vespa, minichunk vectors are stored in the chunk itself
+    vespa_chunk_id = str(get_uuid_from_chunk(chunk))
+    vespa_document_fields = _build_vespa_chunk_fields(chunk)
 
     vespa_url = f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{vespa_chunk_id}"
     logger.debug(f'Indexing to URL "{vespa_url}"')
@@ -336,62 +408,217 @@ def _batch_index_vespa_chunks(
             executor.shutdown(wait=True)
 
 
+def _feed_vespa_chunks(
+    chunks: Iterable[DocMetadataAwareIndexChunk],
+    index_name: str,
+    http_client: httpx.Client,
+    max_in_flight: int = VESPA_FEED_MAX_IN_FLIGHT,
+) -> list[_VespaFeedResult]:
+    """Streams chunks into Vespa via the document/v1 API. Unlike `_batch_index_vespa_chunks`,
+    there is no waiting for a whole batch to finish before the next one starts, instead at most
+    `max_in_flight` requests are outstanding at any point and the producer blocks until one
+    completes (back-pressure). Failures are reported per chunk rather than raised."""
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    results: list[_VespaFeedResult] = []
+
+    def _feed_chunk(chunk: DocMetadataAwareIndexChunk) -> None:
+        result = _VespaFeedResult(
+            document_id=chunk.source_document.id, chunk_id=chunk.chunk_id
+        )
+        try:
+            _index_vespa_chunk(chunk, index_name, http_client)
+        except Exception as e:
+            result.error = e
+        finally:
+            results.append(result)
+            in_flight.release()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for chunk in chunks:
+            in_flight.acquire()
+            executor.submit(_feed_chunk, chunk)
+
+    return results
+
+
 def _clear_and_index_vespa_chunks(
     chunks: list[DocMetadataAwareIndexChunk],
     index_name: str,
+    use_feed: bool = False,
 ) -> set[DocumentInsertionRecord]:
     """Receive a list of chunks from a batch of documents and index the chunks into Vespa along
     with updating the associated permissions. Assumes that a document will not be split into
     multiple chunk batches calling this function multiple times, otherwise only the last set of
-    chunks will be kept"""
-    existing_docs: set[str] = set()
+    chunks will be kept. Chunk ids are deterministic, so chunks of existing documents are
+    overwritten in place and only the chunks beyond the new chunk count are deleted.
 
-    # NOTE: using `httpx` here since `requests` doesn't support HTTP2. This is beneficial for
-    # indexing / updates / deletes since we have to make a large volume of requests.
-    with (
-        concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS) as executor,
-        httpx.Client(http2=True) as http_client,
-    ):
-        # Check for existing documents, existing documents need to have all of their chunks deleted
-        # prior to indexing as the document size (num chunks) may have shrunk
-        first_chunks = [chunk for chunk in chunks if chunk.chunk_id == 0]
-        for chunk_batch in batch_generator(first_chunks, _BATCH_SIZE):
-            existing_docs.update(
-                _get_existing_documents_from_chunks(
-                    chunks=chunk_batch,
-                    index_name=index_name,
-                    http_client=http_client,
-                    executor=executor,
-                )
+    If `use_feed` is set, documents which failed to be fully fed are returned as failed instead
+    of failing the whole batch. Their chunks are removed so the index never serves a document
+    which is half the old and half the new version"""
+    existing_docs: set[str] = set()
+    failed_docs: set[str] = set()
+
+    http_client = get_vespa_http_client()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS) as executor:
+        # Check for existing documents, existing documents may have shrunk (fewer chunks) so the
+        # chunks past the new end of the document need to be deleted
+        new_chunk_counts: dict[str, int] = {}
+        for chunk in chunks:
+            document_id = chunk.source_document.id
+            new_chunk_counts[document_id] = max(
+                new_chunk_counts.get(document_id, 0), chunk.chunk_id + 1
             )
 
-        for doc_id_batch in batch_generator(existing_docs, _BATCH_SIZE):
-            _delete_vespa_docs(
-                document_ids=doc_id_batch,
+        stale_chunk_ids: list[str] = []
+        for doc_id_batch in batch_generator(new_chunk_counts, _BATCH_SIZE):
+            (
+                batch_existing_docs,
+                batch_stale_chunk_ids,
+            ) = _get_existing_docs_and_stale_chunk_ids(
+                new_chunk_counts={
+                    document_id: new_chunk_counts[document_id]
+                    for document_id in doc_id_batch
+                },
                 index_name=index_name,
                 http_client=http_client,
-                executor=executor,
             )
+            existing_docs.update(batch_existing_docs)
+            stale_chunk_ids.extend(batch_stale_chunk_ids)
+
+        _delete_vespa_chunks(
+            chunk_ids=stale_chunk_ids,
+            index_name=index_name,
+            http_client=http_client,
+            executor=executor,
+        )
 
-        for chunk_batch in batch_generator(chunks, _BATCH_SIZE):
-            _batch_index_vespa_chunks(
-                chunks=chunk_batch,
-                index_name=index_name,
-                http_client=http_client,
-                executor=executor,
+        if use_feed:
+            feed_results = _feed_vespa_chunks(
+                chunks=chunks, index_name=index_name, http_client=http_client
             )
+            failed_docs = {
+                result.document_id for result in feed_results if result.error
+            }
+            if failed_docs:
+                logger.error(f"Failed to feed documents into Vespa: {failed_docs}")
+                try:
+                    _delete_vespa_docs(
+                        document_ids=list(failed_docs),
+                        index_name=index_name,
+                        http_client=http_client,
+                        executor=executor,
+                    )
+                except Exception:
+                    logger.exception(
+                        "Failed to remove the partially fed documents from Vespa"
+                    )
+        else:
+            for chunk_batch in batch_generator(chunks, _BATCH_SIZE):
+                _batch_index_vespa_chunks(
+                    chunks=chunk_batch,
+                    index_name=index_name,
+                    http_client=http_client,
+                    executor=executor,
+                )
 
+    logger.debug(f"Vespa HTTP client: {get_vespa_http_client_stats().summary()}")
     all_doc_ids = {chunk.source_document.id for chunk in chunks}
+    if failed_docs and not all_doc_ids - failed_docs:
+        raise RuntimeError(
+            f"Failed to feed all {len(failed_docs)} documents into Vespa"
+        )
 
     return {
         DocumentInsertionRecord(
             document_id=doc_id,
             already_existed=doc_id in existing_docs,
+            failed=doc_id in failed_docs,
         )
         for doc_id in all_doc_ids
     }
 
 
+def _escape_selection_string(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _build_vespa_selection(selection: ChunkSelection, index_name: str) -> str:
+    conditions: list[str] = []
+    if selection.document_set is not None:
+        # A comparison with a weighted set field matches if any of its keys matches
+        conditions.append(
+            f'{index_name}.{DOCUMENT_SETS} == "'
+            f'{_escape_selection_string(selection.document_set)}"'
+        )
+
+    if not conditions:
+        raise ValueError("Empty chunk selection, refusing to update the whole index")
+    return " and ".join(conditions)
+
+
+def _build_selection_update_fields(
+    selection_update: SelectionUpdateRequest,
+) -> dict[str, dict]:
+    if selection_update.add_document_sets and selection_update.remove_document_sets:
+        raise ValueError(
+            "Document sets can't be added and removed in the same selection update"
+        )
+
+    fields: dict[str, dict] = {}
+    if selection_update.add_document_sets:
+        fields[DOCUMENT_SETS] = {
+            "add": {
+                document_set: 1 for document_set in selection_update.add_document_sets
+            }
+        }
+    if selection_update.remove_document_sets:
+        fields[DOCUMENT_SETS] = {
+            "remove": {
+                document_set: 0
+                for document_set in selection_update.remove_document_sets
+            }
+        }
+    if selection_update.access is not None:
+        fields[ACCESS_CONTROL_LIST] = {
+            "assign": {acl_entry: 1 for acl_entry in selection_update.access.to_acl()}
+        }
+    if selection_update.boost is not None:
+        fields[BOOST] = {"assign": selection_update.boost}
+    if selection_update.hidden is not None:
+        fields[HIDDEN] = {"assign": selection_update.hidden}
+    return fields
+
+
+@retry(tries=3, delay=1, backoff=2)
+def _put_vespa_selection_update(
+    index_name: str,
+    selection: str,
+    fields: dict[str, dict],
+    continuation: str | None,
+    http_client: httpx.Client,
+) -> tuple[int, str | None]:
+    """Applies the update to the next part of the chunks matching the selection, returns
+    the number of chunks updated and the continuation for the rest, None once done. The
+    updates are idempotent so a retried request is harmless"""
+    params = {
+        "selection": selection,
+        "cluster": _VESPA_CONTENT_CLUSTER,
+        "timeChunk": _SELECTION_UPDATE_TIME_CHUNK,
+    }
+    if continuation:
+        params["continuation"] = continuation
+
+    res = http_client.put(
+        DOCUMENT_ID_ENDPOINT.format(index_name=index_name),
+        params=params,
+        json={"fields": fields},
+        timeout=_SELECTION_UPDATE_CLIENT_TIMEOUT,
+    )
+    res.raise_for_status()
+    body = res.json()
+    return body.get("documentCount", 0), body.get("continuation")
+
+
 def _build_vespa_filters(filters: IndexFilters, include_hidden: bool = False) -> str:
     def _build_or_filters(key: str, vals: list[str] | None) -> str:
         if vals is None:
@@ -559,7 +786,7 @@ def _query_vespa(query_params: Mapping[str, str | int | float]) -> list[Inferenc
     if "query" in query_params and not cast(str, query_params["query"]).strip():
         raise ValueError("No/empty query received")
 
-    response = requests.post(
+    response = get_vespa_http_client().post(
         SEARCH_ENDPOINT,
         json=dict(
             **query_params,
@@ -595,7 +822,7 @@ def _query_vespa(query_params: Mapping[str, str | int | float]) -> list[Inferenc
 
 @retry(tries=3, delay=1, backoff=2)
 def _inference_chunk_by_vespa_id(vespa_id: str, index_name: str) -> InferenceChunk:
-    res = requests.get(
+    res = get_vespa_http_client().get(
         f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{vespa_id}"
     )
     res.raise_for_status()
@@ -643,9 +870,15 @@ class VespaIndex(DocumentIndex):
         f"from {{index_name}} where "
     )
 
-    def __init__(self, index_name: str, secondary_index_name: str | None) -> None:
+    def __init__(
+        self,
+        index_name: str,
+        secondary_index_name: str | None,
+        use_feed: bool = VESPA_FEED_ENABLED,
+    ) -> None:
         self.index_name = index_name
         self.secondary_index_name = secondary_index_name
+        self.use_feed = use_feed
 
     def ensure_indices_exist(
         self,
@@ -714,114 +947,229 @@ class VespaIndex(DocumentIndex):
         chunks: list[DocMetadataAwareIndexChunk],
     ) -> set[DocumentInsertionRecord]:
         # IMPORTANT: This must be done one index at a time, do not use secondary index here
-        return _clear_and_index_vespa_chunks(chunks=chunks, index_name=self.index_name)
+        return _clear_and_index_vespa_chunks(
+            chunks=chunks, index_name=self.index_name, use_feed=self.use_feed
+        )
 
     @staticmethod
-    def _apply_updates_batched(
-        updates: list[_VespaUpdateRequest],
-        batch_size: int = _BATCH_SIZE,
+    def _apply_updates(
+        updates: Iterable[_VespaUpdateRequest],
+        max_in_flight: int = VESPA_FEED_MAX_IN_FLIGHT,
     ) -> None:
-        """Runs a batch of updates in parallel via the ThreadPoolExecutor."""
-
-        def _update_chunk(
-            update: _VespaUpdateRequest, http_client: httpx.Client
-        ) -> httpx.Response:
-            logger.debug(
-                f"Updating with request to {update.url} with body {update.update_request}"
-            )
-            return http_client.put(
-                update.url,
-                headers={"Content-Type": "application/json"},
-                json=update.update_request,
+        """Sends the partial updates, one PUT per chunk as document/v1 has no multi document
+        operation. Like `_feed_vespa_chunks`, there is no waiting for a whole batch to
+        finish, at most `max_in_flight` requests are outstanding over the shared client and
+        `updates` is only consumed as they complete. No new updates are sent after a
+        failure, the first one is raised once the outstanding requests are done."""
+        http_client = get_vespa_http_client()
+        in_flight = threading.BoundedSemaphore(max_in_flight)
+        failures: list[tuple[str, Exception]] = []
+
+        def _update_chunk(update: _VespaUpdateRequest) -> None:
+            try:
+                logger.debug(
+                    f"Updating with request to {update.url} with body {update.update_request}"
+                )
+                res = http_client.put(
+                    update.url,
+                    headers={"Content-Type": "application/json"},
+                    json=update.update_request,
+                )
+                res.raise_for_status()
+            except Exception as e:
+                failures.append((update.document_id, e))
+            finally:
+                in_flight.release()
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_in_flight
+        ) as executor:
+            for update in updates:
+                if failures:
+                    break
+                in_flight.acquire()
+                executor.submit(_update_chunk, update)
+
+        if failures:
+            document_id, error = failures[0]
+            if isinstance(error, httpx.HTTPStatusError):
+                raise requests.HTTPError(
+                    f"Failed to update document: {document_id}"
+                ) from error
+            raise error
+
+    def refresh_metadata(self, refresh_requests: list[MetadataRefreshRequest]) -> None:
+        # Same as indexing, this only applies to the primary index
+        processed_updates_requests: list[_VespaUpdateRequest] = []
+        for refresh_request in refresh_requests:
+            document_fields = _build_vespa_document_level_fields(
+                document=refresh_request.document,
+                access=refresh_request.access,
+                document_sets=refresh_request.document_sets,
+                boost=refresh_request.boost,
             )
-
-        # NOTE: using `httpx` here since `requests` doesn't support HTTP2. This is beneficient for
-        # indexing / updates / deletes since we have to make a large volume of requests.
-        with (
-            concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS) as executor,
-            httpx.Client(http2=True) as http_client,
-        ):
-            for update_batch in batch_generator(updates, batch_size):
-                future_to_document_id = {
-                    executor.submit(
-                        _update_chunk,
-                        update,
-                        http_client,
-                    ): update.document_id
-                    for update in update_batch
+            update_dict: dict[str, dict] = {
+                "fields": {
+                    field: {"assign": value}
+                    for field, value in document_fields.items()
+                    if field != DOCUMENT_ID and value is not None
                 }
-                for future in concurrent.futures.as_completed(future_to_document_id):
-                    res = future.result()
-                    try:
-                        res.raise_for_status()
-                    except requests.HTTPError as e:
-                        failure_msg = f"Failed to update document: {future_to_document_id[future]}"
-                        raise requests.HTTPError(failure_msg) from e
+            }
+            # Cleared lists are stored as None on a put but must be explicitly emptied here
+            for list_field in [METADATA_LIST, PRIMARY_OWNERS, SECONDARY_OWNERS]:
+                if document_fields[list_field] is None:
+                    update_dict["fields"][list_field] = {"assign": []}
+
+            for chunk_id in refresh_request.chunk_ids:
+                vespa_chunk_id = get_uuid_from_chunk_info(
+                    document_id=refresh_request.document.id, chunk_id=chunk_id
+                )
+                processed_updates_requests.append(
+                    _VespaUpdateRequest(
+                        document_id=refresh_request.document.id,
+                        url=f"{DOCUMENT_ID_ENDPOINT.format(index_name=self.index_name)}/{vespa_chunk_id}",
+                        update_request=update_dict,
+                    )
+                )
+
+        self._apply_updates(processed_updates_requests)
 
     def update(self, update_requests: list[UpdateRequest]) -> None:
         logger.info(f"Updating {len(update_requests)} documents in Vespa")
         start = time.time()
 
-        processed_updates_requests: list[_VespaUpdateRequest] = []
-        for update_request in update_requests:
-            update_dict: dict[str, dict] = {"fields": {}}
-            if update_request.boost is not None:
-                update_dict["fields"][BOOST] = {"assign": update_request.boost}
-            if update_request.document_sets is not None:
-                update_dict["fields"][DOCUMENT_SETS] = {
-                    "assign": {
-                        document_set: 1 for document_set in update_request.document_sets
+        index_names = [self.index_name]
+        if self.secondary_index_name:
+            index_names.append(self.secondary_index_name)
+        num_chunk_lookups = 0
+
+        def _get_chunk_updates() -> Iterator[_VespaUpdateRequest]:
+            """Generated as the updates are sent, so the chunks of documents without a
+            known chunk count are looked up while the earlier updates are in flight"""
+            nonlocal num_chunk_lookups
+            for update_request in update_requests:
+                update_dict: dict[str, dict] = {"fields": {}}
+                if update_request.boost is not None:
+                    update_dict["fields"][BOOST] = {"assign": update_request.boost}
+                if update_request.document_sets is not None:
+                    update_dict["fields"][DOCUMENT_SETS] = {
+                        "assign": {
+                            document_set: 1
+                            for document_set in update_request.document_sets
+                        }
                     }
-                }
-            if update_request.access is not None:
-                update_dict["fields"][ACCESS_CONTROL_LIST] = {
-                    "assign": {
-                        acl_entry: 1 for acl_entry in update_request.access.to_acl()
+                if update_request.access is not None:
+                    update_dict["fields"][ACCESS_CONTROL_LIST] = {
+                        "assign": {
+                            acl_entry: 1 for acl_entry in update_request.access.to_acl()
+                        }
                     }
-                }
-            if update_request.hidden is not None:
-                update_dict["fields"][HIDDEN] = {"assign": update_request.hidden}
-
-            if not update_dict["fields"]:
-                logger.error("Update request received but nothing to update")
-                continue
+                if update_request.hidden is not None:
+                    update_dict["fields"][HIDDEN] = {"assign": update_request.hidden}
+
+                if not update_dict["fields"]:
+                    logger.error("Update request received but nothing to update")
+                    continue
+
+                chunk_counts = update_request.chunk_counts or {}
+                for index_name in index_names:
+                    for document_id in update_request.document_ids:
+                        # Chunk ids are derived from the document id and chunk index,
+                        # only documents without a known chunk count are looked up
+                        chunk_count = chunk_counts.get(document_id, {}).get(index_name)
+                        if chunk_count is not None:
+                            doc_chunk_ids = [
+                                str(
+                                    get_uuid_from_chunk_info(
+                                        document_id=document_id, chunk_id=chunk_id
+                                    )
+                                )
+                                for chunk_id in range(chunk_count)
+                            ]
+                        else:
+                            num_chunk_lookups += 1
+                            doc_chunk_ids = _get_vespa_chunk_ids_by_document_id(
+                                document_id=document_id, index_name=index_name
+                            )
 
-            index_names = [self.index_name]
-            if self.secondary_index_name:
-                index_names.append(self.secondary_index_name)
-
-            for index_name in index_names:
-                for document_id in update_request.document_ids:
-                    for doc_chunk_id in _get_vespa_chunk_ids_by_document_id(
-                        document_id=document_id, index_name=index_name
-                    ):
-                        processed_updates_requests.append(
-                            _VespaUpdateRequest(
+                        for doc_chunk_id in doc_chunk_ids:
+                            yield _VespaUpdateRequest(
                                 document_id=document_id,
                                 url=f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{doc_chunk_id}",
                                 update_request=update_dict,
                             )
-                        )
 
-        self._apply_updates_batched(processed_updates_requests)
+        self._apply_updates(_get_chunk_updates())
         logger.info(
-            "Finished updating Vespa documents in %s seconds", time.time() - start
+            "Finished updating Vespa documents in %s seconds, "
+            "%s documents had their chunks looked up",
+            time.time() - start,
+            num_chunk_lookups,
         )
+        logger.debug(f"Vespa HTTP client: {get_vespa_http_client_stats().summary()}")
+
+    def update_by_selection(
+        self,
+        selection_update: SelectionUpdateRequest,
+        progress: SelectionUpdateProgress | None = None,
+        progress_callback: Callable[[SelectionUpdateProgress], None] | None = None,
+    ) -> SelectionUpdateProgress:
+        """Uses Vespa's selection based updates, Vespa visits the chunks and applies the
+        update itself. Each request covers part of the chunks and returns a continuation
+        for the rest, which is what the progress records"""
+        fields = _build_selection_update_fields(selection_update)
+        if not fields:
+            raise ValueError("Selection update received but nothing to update")
+
+        progress = progress or SelectionUpdateProgress()
+        index_names = [self.index_name]
+        if self.secondary_index_name:
+            index_names.append(self.secondary_index_name)
+
+        http_client = get_vespa_http_client()
+        for index_name in index_names:
+            if (
+                index_name in progress.continuations
+                and progress.continuations[index_name] is None
+            ):
+                continue
+
+            selection = _build_vespa_selection(selection_update.selection, index_name)
+            logger.info(f"Updating chunks of {index_name} where {selection}")
+            while True:
+                num_updated, continuation = _put_vespa_selection_update(
+                    index_name=index_name,
+                    selection=selection,
+                    fields=fields,
+                    continuation=progress.continuations.get(index_name),
+                    http_client=http_client,
+                )
+                progress.num_chunks_updated += num_updated
+                progress.continuations[index_name] = continuation
+                logger.info(
+                    f"Updated {progress.num_chunks_updated} chunks matching the "
+                    "selection so far"
+                )
+                if progress_callback:
+                    progress_callback(progress)
+                if continuation is None:
+                    break
+
+        return progress
 
     def delete(self, doc_ids: list[str]) -> None:
         logger.info(f"Deleting {len(doc_ids)} documents from Vespa")
 
-        # NOTE: using `httpx` here since `requests` doesn't support HTTP2. This is beneficient for
-        # indexing / updates / deletes since we have to make a large volume of requests.
-        with httpx.Client(http2=True) as http_client:
-            index_names = [self.index_name]
-            if self.secondary_index_name:
-                index_names.append(self.secondary_index_name)
+        http_client = get_vespa_http_client()
+        index_names = [self.index_name]
+        if self.secondary_index_name:
+            index_names.append(self.secondary_index_name)
 
-            for index_name in index_names:
-                _delete_vespa_docs(
-                    document_ids=doc_ids, index_name=index_name, http_client=http_client
-                )
+        for index_name in index_names:
+            _delete_vespa_docs(
+                document_ids=doc_ids, index_name=index_name, http_client=http_client
+            )
+        logger.debug(f"Vespa HTTP client: {get_vespa_http_client_stats().summary()}")
 
     def id_based_retrieval(
         self,
@@ -1,31 +1,44 @@
 import abc
+import multiprocessing
+import threading
 from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
 
-from llama_index.text_splitter import SentenceSplitter
 from transformers import AutoTokenizer  # type:ignore
 
 from danswer.configs.app_configs import BLURB_SIZE
 from danswer.configs.app_configs import CHUNK_OVERLAP
 from danswer.configs.app_configs import MINI_CHUNK_SIZE
+from danswer.configs.app_configs import NUM_CHUNKING_WORKERS
 from danswer.configs.constants import SECTION_SEPARATOR
 from danswer.configs.constants import TITLE_SEPARATOR
 from danswer.configs.model_configs import CHUNK_SIZE
 from danswer.connectors.models import Document
 from danswer.indexing.models import DocAwareChunk
+from danswer.indexing.text_splitter import get_text_splitter
 from danswer.search.search_nlp_models import get_default_tokenizer
+from danswer.utils.logger import setup_logger
 from danswer.utils.text_processing import shared_precompare_cleanup
 
+logger = setup_logger()
+
 
 ChunkFunc = Callable[[Document], list[DocAwareChunk]]
 
 
-def extract_blurb(text: str, blurb_size: int) -> str:
-    token_count_func = get_default_tokenizer().tokenize
-    blurb_splitter = SentenceSplitter(
-        tokenizer=token_count_func, chunk_size=blurb_size, chunk_overlap=0
+def extract_blurb(
+    text: str, blurb_size: int, text_tok_length: int | None = None
+) -> str:
+    # Text that fits entirely in the blurb would come back from the splitter as is
+    if text_tok_length is not None and text_tok_length <= blurb_size and text.strip():
+        return text.strip()
+
+    blurb_splitter = get_text_splitter(
+        get_default_tokenizer(), chunk_size=blurb_size, chunk_overlap=0
     )
 
-    return blurb_splitter.split_text(text)[0]
+    split_texts = blurb_splitter.split_text(text)
+    return split_texts[0] if split_texts else ""
 
 
 def chunk_large_section(
@@ -40,8 +53,8 @@ def chunk_large_section(
 ) -> list[DocAwareChunk]:
     blurb = extract_blurb(section_text, blurb_size)
 
-    sentence_aware_splitter = SentenceSplitter(
-        tokenizer=tokenizer.tokenize, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    sentence_aware_splitter = get_text_splitter(
+        tokenizer, chunk_size=chunk_size, chunk_overlap=chunk_overlap
     )
 
     split_texts = sentence_aware_splitter.split_text(section_text)
@@ -69,34 +82,42 @@ def chunk_document(
     title = document.get_title_for_document_index()
     title_prefix = title.replace("\n", " ") + TITLE_SEPARATOR if title else ""
     tokenizer = get_default_tokenizer()
+    separator_tok_length = len(tokenizer.tokenize(SECTION_SEPARATOR))
 
     chunks: list[DocAwareChunk] = []
     link_offsets: dict[int, str] = {}
     chunk_text = ""
+    # Each section is tokenized once, the token count and cleaned up length of the chunk
+    # being built are tracked as sections are added rather than recomputed. The tokenizers
+    # used split on whitespace first so the count of the joined text is the sum of the parts
+    current_tok_length = 0
+    curr_offset_len = 0
+
+    def _finalize_chunk() -> DocAwareChunk:
+        return DocAwareChunk(
+            source_document=document,
+            chunk_id=len(chunks),
+            blurb=extract_blurb(chunk_text, blurb_size, current_tok_length),
+            content=chunk_text,
+            source_links=link_offsets,
+            section_continuation=False,
+        )
+
     for ind, section in enumerate(document.sections):
         section_text = title_prefix + section.text if ind == 0 else section.text
         section_link_text = section.link or ""
 
         section_tok_length = len(tokenizer.tokenize(section_text))
-        current_tok_length = len(tokenizer.tokenize(chunk_text))
-        curr_offset_len = len(shared_precompare_cleanup(chunk_text))
 
         # Large sections are considered self-contained/unique therefore they start a new chunk and are not concatenated
         # at the end by other sections
         if section_tok_length > chunk_tok_size:
             if chunk_text:
-                chunks.append(
-                    DocAwareChunk(
-                        source_document=document,
-                        chunk_id=len(chunks),
-                        blurb=extract_blurb(chunk_text, blurb_size),
-                        content=chunk_text,
-                        source_links=link_offsets,
-                        section_continuation=False,
-                    )
-                )
+                chunks.append(_finalize_chunk())
                 link_offsets = {}
                 chunk_text = ""
+                current_tok_length = 0
+                curr_offset_len = 0
 
             large_section_chunks = chunk_large_section(
                 section_text=section_text,
@@ -111,53 +132,40 @@ def chunk_document(
             chunks.extend(large_section_chunks)
             continue
 
+        section_offset_len = len(shared_precompare_cleanup(section_text))
+
         # In the case where the whole section is shorter than a chunk, either adding to chunk or start a new one
         if (
-            current_tok_length
-            + len(tokenizer.tokenize(SECTION_SEPARATOR))
-            + section_tok_length
+            current_tok_length + separator_tok_length + section_tok_length
             <= chunk_tok_size
         ):
-            chunk_text += (
-                SECTION_SEPARATOR + section_text if chunk_text else section_text
-            )
             link_offsets[curr_offset_len] = section_link_text
+            if chunk_text:
+                chunk_text += SECTION_SEPARATOR + section_text
+                current_tok_length += separator_tok_length + section_tok_length
+            else:
+                chunk_text = section_text
+                current_tok_length = section_tok_length
+            curr_offset_len += section_offset_len
         else:
-            chunks.append(
-                DocAwareChunk(
-                    source_document=document,
-                    chunk_id=len(chunks),
-                    blurb=extract_blurb(chunk_text, blurb_size),
-                    content=chunk_text,
-                    source_links=link_offsets,
-                    section_continuation=False,
-                )
-            )
+            chunks.append(_finalize_chunk())
             link_offsets = {0: section_link_text}
             chunk_text = section_text
+            current_tok_length = section_tok_length
+            curr_offset_len = section_offset_len
 
     # Once we hit the end, if we're still in the process of building a chunk, add what we have
     # NOTE: if it's just whitespace, ignore it.
     if chunk_text.strip():
-        chunks.append(
-            DocAwareChunk(
-                source_document=document,
-                chunk_id=len(chunks),
-                blurb=extract_blurb(chunk_text, blurb_size),
-                content=chunk_text,
-                source_links=link_offsets,
-                section_continuation=False,
-            )
-        )
+        chunks.append(_finalize_chunk())
     return chunks
 
 
 def split_chunk_text_into_mini_chunks(
     chunk_text: str, mini_chunk_size: int = MINI_CHUNK_SIZE
 ) -> list[str]:
-    token_count_func = get_default_tokenizer().tokenize
-    sentence_aware_splitter = SentenceSplitter(
-        tokenizer=token_count_func, chunk_size=mini_chunk_size, chunk_overlap=0
+    sentence_aware_splitter = get_text_splitter(
+        get_default_tokenizer(), chunk_size=mini_chunk_size, chunk_overlap=0
     )
 
     return sentence_aware_splitter.split_text(chunk_text)
@@ -168,7 +176,87 @@ class Chunker:
     def chunk(self, document: Document) -> list[DocAwareChunk]:
         raise NotImplementedError
 
+    def chunk_batch(self, documents: list[Document]) -> list[list[DocAwareChunk]]:
+        """Chunks of each document, in the order of the documents"""
+        return [self.chunk(document=document) for document in documents]
+
 
 class DefaultChunker(Chunker):
     def chunk(self, document: Document) -> list[DocAwareChunk]:
         return chunk_document(document)
+
+
+def _init_chunking_worker() -> None:
+    # Load the tokenizer once when the worker starts rather than with the first document
+    get_default_tokenizer()
+
+
+def _chunk_document_in_worker(document: Document) -> list[DocAwareChunk]:
+    return chunk_document(document)
+
+
+_CHUNKING_POOLS: dict[int, ProcessPoolExecutor] = {}
+_CHUNKING_POOLS_LOCK = threading.Lock()
+
+
+def _get_chunking_pool(num_workers: int) -> ProcessPoolExecutor:
+    with _CHUNKING_POOLS_LOCK:
+        if num_workers not in _CHUNKING_POOLS:
+            _CHUNKING_POOLS[num_workers] = ProcessPoolExecutor(
+                max_workers=num_workers,
+                # Not forked, the parent may hold model / DB / thread state
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_chunking_worker,
+            )
+        return _CHUNKING_POOLS[num_workers]
+
+
+def shutdown_chunking_pools() -> None:
+    """Stops the chunking worker processes of this process. Must be called before the
+    process exits, the workers of a non-daemonic process are not cleaned up otherwise"""
+    with _CHUNKING_POOLS_LOCK:
+        pools = list(_CHUNKING_POOLS.values())
+        _CHUNKING_POOLS.clear()
+    for pool in pools:
+        # Documents not picked up yet are dropped, the ones being chunked are finished
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class ProcessPoolChunker(DefaultChunker):
+    """Chunks the documents of a batch in parallel on a pool of worker processes which is
+    shared until `shutdown_chunking_pools` is called. Falls back to chunking in the current process
+    where child processes can't be started (daemonic processes, e.g. Dask workers)"""
+
+    def __init__(self, num_workers: int = NUM_CHUNKING_WORKERS) -> None:
+        self.num_workers = num_workers
+
+    def chunk_batch(self, documents: list[Document]) -> list[list[DocAwareChunk]]:
+        if len(documents) <= 1 or multiprocessing.current_process().daemon:
+            return super().chunk_batch(documents)
+
+        pool = _get_chunking_pool(self.num_workers)
+        doc_chunks = list(
+            pool.map(
+                _chunk_document_in_worker,
+                documents,
+                chunksize=max(1, len(documents) // (self.num_workers * 4)),
+            )
+        )
+
+        # The chunks come back with a copy of the document, point them back to the original
+        for document, chunks in zip(documents, doc_chunks):
+            for chunk in chunks:
+                chunk.source_document = document
+        return doc_chunks
+
+
+def get_indexing_chunker() -> Chunker:
+    if NUM_CHUNKING_WORKERS > 1:
+        if multiprocessing.current_process().daemon:
+            logger.warning(
+                "NUM_CHUNKING_WORKERS is set but the indexing job runs in a daemonic "
+                "process which can't start workers, chunking in process instead"
+            )
+            return DefaultChunker()
+        return ProcessPoolChunker(num_workers=NUM_CHUNKING_WORKERS)
+    return DefaultChunker()
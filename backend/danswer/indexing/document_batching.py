@@ -0,0 +1,118 @@
+from collections.abc import Iterable
+from collections.abc import Iterator
+from dataclasses import dataclass
+from dataclasses import field
+
+from danswer.configs.app_configs import INDEX_BATCH_MAX_DOCS
+from danswer.configs.app_configs import INDEX_BATCH_TOKEN_BUDGET
+from danswer.connectors.models import Document
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Rough average for English text with the default embedding models, only used to size
+# batches so it doesn't need to be exact
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_document_tokens(document: Document) -> int:
+    """Cheap estimate of the number of tokens of the document, without tokenizing it"""
+    num_chars = sum(len(section.text) for section in document.sections)
+    num_chars += len(document.get_title_for_document_index() or "")
+    return max(num_chars // _CHARS_PER_TOKEN, 1)
+
+
+@dataclass
+class DocBatchStats:
+    """Sizes of the batches produced by `rebatch_documents`, logged once per run"""
+
+    num_batches: int = 0
+    num_docs: int = 0
+    num_tokens: int = 0
+    max_batch_docs: int = 0
+    max_batch_tokens: int = 0
+    # Batches over the budget, only possible when a single document exceeds it
+    num_oversized_batches: int = 0
+    batch_token_counts: list[int] = field(default_factory=list)
+
+    def record_batch(self, num_docs: int, num_tokens: int, token_budget: int) -> None:
+        self.num_batches += 1
+        self.num_docs += num_docs
+        self.num_tokens += num_tokens
+        self.max_batch_docs = max(self.max_batch_docs, num_docs)
+        self.max_batch_tokens = max(self.max_batch_tokens, num_tokens)
+        if 0 < token_budget < num_tokens:
+            self.num_oversized_batches += 1
+        self.batch_token_counts.append(num_tokens)
+
+    def summary(self) -> str:
+        if not self.num_batches:
+            return "No document batches"
+
+        sorted_counts = sorted(self.batch_token_counts)
+        median_tokens = sorted_counts[len(sorted_counts) // 2]
+        return (
+            f"{self.num_batches} batches of {self.num_docs} documents, "
+            f"avg {self.num_docs / self.num_batches:.1f} docs / "
+            f"{self.num_tokens // self.num_batches} est. tokens per batch, "
+            f"median {median_tokens} est. tokens, "
+            f"max {self.max_batch_docs} docs / {self.max_batch_tokens} est. tokens, "
+            f"{self.num_oversized_batches} single documents over the budget"
+        )
+
+
+def rebatch_documents(
+    doc_batches: Iterable[list[Document]],
+    token_budget: int = INDEX_BATCH_TOKEN_BUDGET,
+    max_docs: int = INDEX_BATCH_MAX_DOCS,
+    stats: DocBatchStats | None = None,
+) -> Iterator[list[Document]]:
+    """Re-groups the connector batches into batches of at most `token_budget` estimated
+    tokens and `max_docs` documents, merging small batches and splitting large ones. A
+    document is never split, one larger than the budget goes in a batch of its own.
+
+    A document that shows up again before its batch is emitted starts a new batch, so the
+    different versions of a document are still indexed in order, in separate batches."""
+    if token_budget <= 0:
+        for doc_batch in doc_batches:
+            if stats is not None:
+                stats.record_batch(
+                    len(doc_batch),
+                    sum(estimate_document_tokens(document) for document in doc_batch),
+                    token_budget,
+                )
+            yield doc_batch
+        return
+
+    current_batch: list[Document] = []
+    current_doc_ids: set[str] = set()
+    current_tokens = 0
+
+    def _emit() -> list[Document]:
+        nonlocal current_batch, current_doc_ids, current_tokens
+        batch = current_batch
+        if stats is not None:
+            stats.record_batch(len(batch), current_tokens, token_budget)
+        logger.debug(
+            f"Emitting document batch of {len(batch)} docs, "
+            f"~{current_tokens} tokens"
+        )
+        current_batch, current_doc_ids, current_tokens = [], set(), 0
+        return batch
+
+    for doc_batch in doc_batches:
+        for document in doc_batch:
+            doc_tokens = estimate_document_tokens(document)
+            if current_batch and (
+                current_tokens + doc_tokens > token_budget
+                or len(current_batch) >= max_docs
+                or document.id in current_doc_ids
+            ):
+                yield _emit()
+
+            current_batch.append(document)
+            current_doc_ids.add(document.id)
+            current_tokens += doc_tokens
+
+    if current_batch:
+        yield _emit()
@@ -1,6 +1,7 @@
 from abc import ABC
 from abc import abstractmethod
 
+import numpy as np
 from sqlalchemy.orm import Session
 
 from danswer.configs.app_configs import ENABLE_MINI_CHUNK
@@ -13,8 +14,10 @@ from danswer.db.embedding_model import get_secondary_db_embedding_model
 from danswer.db.models import EmbeddingModel as DbEmbeddingModel
 from danswer.db.models import IndexModelStatus
 from danswer.indexing.chunker import split_chunk_text_into_mini_chunks
+from danswer.indexing.embedding_cache import get_embedding_cache
 from danswer.indexing.models import ChunkEmbedding
 from danswer.indexing.models import DocAwareChunk
+from danswer.indexing.models import EmbeddingArray
 from danswer.indexing.models import IndexChunk
 from danswer.search.search_nlp_models import EmbeddingModel
 from danswer.search.search_nlp_models import EmbedTextType
@@ -61,16 +64,54 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             # The below are globally set, this flow always uses the indexing one
             server_host=INDEXING_MODEL_SERVER_HOST,
             server_port=MODEL_SERVER_PORT,
+            embedding_cache=get_embedding_cache(),
         )
 
+    def _embed_texts_packed(
+        self, texts: list[str], batch_size: int = BATCH_SIZE_ENCODE_CHUNKS
+    ) -> EmbeddingArray:
+        """Embeds the unique texts in full batches of similar lengths to minimize padding,
+        returns a float32 matrix with the embeddings in the order of the input texts"""
+        text_to_inds: dict[str, list[int]] = {}
+        for ind, text in enumerate(texts):
+            text_to_inds.setdefault(text, []).append(ind)
+
+        # Length in characters is a cheap stand-in for the token count of the text
+        sorted_texts = sorted(text_to_inds, key=len, reverse=True)
+        text_batches = [
+            sorted_texts[i : i + batch_size]
+            for i in range(0, len(sorted_texts), batch_size)
+        ]
+
+        all_embeddings: EmbeddingArray | None = None
+        len_text_batches = len(text_batches)
+        for idx, text_batch in enumerate(text_batches, start=1):
+            logger.debug(f"Embedding text batch {idx} of {len_text_batches}")
+            # Normalize embeddings is only configured via model_configs.py, be sure to use right value for the set loss
+            embeddings = self.embedding_model.encode(
+                text_batch, text_type=EmbedTextType.PASSAGE
+            )
+
+            # Replace line above with the line below for easy debugging of indexing flow, skipping the actual model
+            # embeddings = np.zeros((len(text_batch), 384), dtype=np.float32)
+
+            if all_embeddings is None:
+                all_embeddings = np.empty(
+                    (len(texts), embeddings.shape[1]), dtype=np.float32
+                )
+            for text, embedding in zip(text_batch, embeddings):
+                all_embeddings[text_to_inds[text]] = embedding
+
+        if all_embeddings is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return all_embeddings
+
     def embed_chunks(
         self,
         chunks: list[DocAwareChunk],
         batch_size: int = BATCH_SIZE_ENCODE_CHUNKS,
         enable_mini_chunk: bool = ENABLE_MINI_CHUNK,
     ) -> list[IndexChunk]:
-        # Cache the Title embeddings to only have to do it once
-        title_embed_dict: dict[str, list[float]] = {}
         embedded_chunks: list[IndexChunk] = []
 
         chunk_texts = []
@@ -85,22 +126,19 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             chunk_texts.extend(mini_chunk_texts)
             chunk_mini_chunks_count[chunk_ind] = 1 + len(mini_chunk_texts)
 
-        text_batches = [
-            chunk_texts[i : i + batch_size]
-            for i in range(0, len(chunk_texts), batch_size)
-        ]
-
-        embeddings: list[list[float]] = []
-        len_text_batches = len(text_batches)
-        for idx, text_batch in enumerate(text_batches, start=1):
-            logger.debug(f"Embedding text batch {idx} of {len_text_batches}")
-            # Normalize embeddings is only configured via model_configs.py, be sure to use right value for the set loss
-            embeddings.extend(
-                self.embedding_model.encode(text_batch, text_type=EmbedTextType.PASSAGE)
-            )
+        # Titles are embedded once per document, packed into the same batches as the chunks
+        titles = list(
+            {
+                title: None
+                for chunk in chunks
+                if (title := chunk.source_document.get_title_for_document_index())
+            }
+        )
 
-            # Replace line above with the line below for easy debugging of indexing flow, skipping the actual model
-            # embeddings.extend([[0.0] * 384 for _ in range(len(text_batch))])
+        embeddings = self._embed_texts_packed(
+            chunk_texts + titles, batch_size=batch_size
+        )
+        title_embed_dict = dict(zip(titles, embeddings[len(chunk_texts) :]))
 
         embedding_ind_start = 0
         for chunk_ind, chunk in enumerate(chunks):
@@ -110,20 +148,11 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             ]
 
             title = chunk.source_document.get_title_for_document_index()
+            title_embedding = title_embed_dict[title] if title else None
 
-            title_embedding = None
-            if title:
-                if title in title_embed_dict:
-                    # Using cached value for speedup
-                    title_embedding = title_embed_dict[title]
-                else:
-                    title_embedding = self.embedding_model.encode(
-                        [title], text_type=EmbedTextType.PASSAGE
-                    )[0]
-                    title_embed_dict[title] = title_embedding
-
-            new_embedded_chunk = IndexChunk(
-                **{k: getattr(chunk, k) for k in chunk.__dataclass_fields__},
+            # Row views into the batch matrix, no embedding is copied per chunk
+            new_embedded_chunk = IndexChunk.from_doc_aware_chunk(
+                chunk=chunk,
                 embeddings=ChunkEmbedding(
                     full_embedding=chunk_embeddings[0],
                     mini_chunk_embeddings=chunk_embeddings[1:],
@@ -133,6 +162,13 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             embedded_chunks.append(new_embedded_chunk)
             embedding_ind_start += num_embeddings
 
+        embedding_cache = self.embedding_model.embedding_cache
+        if embedding_cache:
+            logger.info(
+                f"Embedding cache hit rate: {embedding_cache.hit_rate:.2%} "
+                f"({embedding_cache.hits} hits, {embedding_cache.misses} misses)"
+            )
+
         return embedded_chunks
 
 
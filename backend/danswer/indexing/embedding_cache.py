@@ -0,0 +1,195 @@
+import abc
+import hashlib
+import threading
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from danswer.configs.app_configs import EMBEDDING_CACHE_MAX_SIZE
+from danswer.configs.app_configs import EMBEDDING_CACHE_TYPE
+from danswer.db.embedding_cache import evict_least_recently_used_embeddings
+from danswer.db.embedding_cache import fetch_cached_embeddings
+from danswer.db.embedding_cache import touch_cached_embeddings
+from danswer.db.embedding_cache import upsert_cached_embeddings
+from danswer.db.engine import get_sqlalchemy_engine
+from danswer.indexing.models import EmbeddingArray
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Eviction requires a scan over the recency index, so it's only done every so many writes
+_EVICTION_CHECK_INTERVAL = 10_000
+# Hits are marked as recently used in bulk, once this many are pending or before an eviction
+_TOUCH_FLUSH_INTERVAL = 1_000
+
+
+def get_text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _embedding_to_bytes(embedding: EmbeddingArray) -> bytes:
+    return np.asarray(embedding, dtype="<f4").tobytes()
+
+
+def _bytes_to_embedding(embedding_bytes: bytes) -> EmbeddingArray:
+    # Read-only view over the stored bytes
+    return np.frombuffer(embedding_bytes, dtype="<f4")
+
+
+class EmbeddingCache(abc.ABC):
+    """Cache of embeddings keyed by (model_name, normalize, prefix, hash of the text). The
+    cache is purely an optimization, any failure to read or write it is logged and treated
+    as a miss rather than failing the embedding."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_embeddings(
+        self, model_name: str, normalize: bool, prefix: str, texts: list[str]
+    ) -> list[EmbeddingArray | None]:
+        try:
+            embeddings = self._get_embeddings(model_name, normalize, prefix, texts)
+        except Exception as e:
+            logger.exception(f"Failed to read from embedding cache: {e}")
+            embeddings = [None] * len(texts)
+
+        num_hits = sum(1 for embedding in embeddings if embedding is not None)
+        self.hits += num_hits
+        self.misses += len(texts) - num_hits
+        return embeddings
+
+    def store_embeddings(
+        self,
+        model_name: str,
+        normalize: bool,
+        prefix: str,
+        texts: list[str],
+        embeddings: list[EmbeddingArray],
+    ) -> None:
+        try:
+            self._store_embeddings(model_name, normalize, prefix, texts, embeddings)
+        except Exception as e:
+            logger.exception(f"Failed to write to embedding cache: {e}")
+
+    @abc.abstractmethod
+    def _get_embeddings(
+        self, model_name: str, normalize: bool, prefix: str, texts: list[str]
+    ) -> list[EmbeddingArray | None]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _store_embeddings(
+        self,
+        model_name: str,
+        normalize: bool,
+        prefix: str,
+        texts: list[str],
+        embeddings: list[EmbeddingArray],
+    ) -> None:
+        raise NotImplementedError
+
+
+class PostgresEmbeddingCache(EmbeddingCache):
+    """Hits only refresh the recency of their entries in batches, eviction is approximate
+    LRU anyway and this saves a write per lookup"""
+
+    def __init__(
+        self,
+        max_size: int = EMBEDDING_CACHE_MAX_SIZE,
+        eviction_check_interval: int = _EVICTION_CHECK_INTERVAL,
+        touch_flush_interval: int = _TOUCH_FLUSH_INTERVAL,
+    ) -> None:
+        super().__init__()
+        self.max_size = max_size
+        self.eviction_check_interval = eviction_check_interval
+        self.touch_flush_interval = touch_flush_interval
+        self._writes_since_eviction = 0
+        self._eviction_lock = threading.Lock()
+        self._pending_touch_ids: set[int] = set()
+        self._touch_lock = threading.Lock()
+
+    def _flush_touches(self, db_session: Session, force: bool = False) -> None:
+        with self._touch_lock:
+            if not self._pending_touch_ids or (
+                not force and len(self._pending_touch_ids) < self.touch_flush_interval
+            ):
+                return
+            entry_ids = list(self._pending_touch_ids)
+            self._pending_touch_ids.clear()
+
+        touch_cached_embeddings(entry_ids=entry_ids, db_session=db_session)
+
+    def _get_embeddings(
+        self, model_name: str, normalize: bool, prefix: str, texts: list[str]
+    ) -> list[EmbeddingArray | None]:
+        text_hashes = [get_text_hash(text) for text in texts]
+        with Session(get_sqlalchemy_engine()) as db_session:
+            cached = fetch_cached_embeddings(
+                model_name=model_name,
+                normalize=normalize,
+                prefix=prefix,
+                text_hashes=list(set(text_hashes)),
+                db_session=db_session,
+            )
+
+            with self._touch_lock:
+                self._pending_touch_ids.update(
+                    entry_id for entry_id, _ in cached.values()
+                )
+            self._flush_touches(db_session)
+
+        return [
+            _bytes_to_embedding(cached[text_hash][1]) if text_hash in cached else None
+            for text_hash in text_hashes
+        ]
+
+    def _store_embeddings(
+        self,
+        model_name: str,
+        normalize: bool,
+        prefix: str,
+        texts: list[str],
+        embeddings: list[EmbeddingArray],
+    ) -> None:
+        text_hash_to_embedding = {
+            get_text_hash(text): _embedding_to_bytes(embedding)
+            for text, embedding in zip(texts, embeddings)
+        }
+        with Session(get_sqlalchemy_engine()) as db_session:
+            upsert_cached_embeddings(
+                model_name=model_name,
+                normalize=normalize,
+                prefix=prefix,
+                text_hash_to_embedding=text_hash_to_embedding,
+                db_session=db_session,
+            )
+
+            with self._eviction_lock:
+                self._writes_since_eviction += len(text_hash_to_embedding)
+                if self._writes_since_eviction < self.eviction_check_interval:
+                    return
+                self._writes_since_eviction = 0
+
+            # Recent hits must be recorded before picking what to evict
+            self._flush_touches(db_session, force=True)
+            num_evicted = evict_least_recently_used_embeddings(
+                max_size=self.max_size, db_session=db_session
+            )
+            if num_evicted:
+                logger.info(f"Evicted {num_evicted} entries from the embedding cache")
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    if not EMBEDDING_CACHE_TYPE:
+        return None
+
+    if EMBEDDING_CACHE_TYPE == PostgresEmbeddingCache.__name__:
+        return PostgresEmbeddingCache()
+
+    raise ValueError(f"Unknown embedding cache type: {EMBEDDING_CACHE_TYPE}")
@@ -1,3 +1,6 @@
+import hashlib
+import json
+from dataclasses import dataclass
 from functools import partial
 from itertools import chain
 from typing import Protocol
@@ -5,27 +8,32 @@ from typing import Protocol
 from sqlalchemy.orm import Session
 
 from danswer.access.access import get_access_for_documents
+from danswer.access.models import DocumentAccess
 from danswer.configs.constants import DEFAULT_BOOST
 from danswer.connectors.cross_connector_utils.miscellaneous_utils import (
     get_experts_stores_representations,
 )
 from danswer.connectors.models import Document
 from danswer.connectors.models import IndexAttemptMetadata
+from danswer.db.document import clear_docs_content_hashes
 from danswer.db.document import get_documents_by_ids
+from danswer.db.document import get_index_info_for_documents
 from danswer.db.document import prepare_to_modify_documents
+from danswer.db.document import update_docs_content_hashes
 from danswer.db.document import update_docs_updated_at
 from danswer.db.document import upsert_documents_complete
-from danswer.db.document_set import fetch_document_sets_for_documents
 from danswer.db.engine import get_sqlalchemy_engine
-from danswer.db.tag import create_or_add_document_tag
-from danswer.db.tag import create_or_add_document_tag_list
+from danswer.db.tag import TagTuple
+from danswer.db.tag import upsert_document_tags
 from danswer.document_index.interfaces import DocumentIndex
 from danswer.document_index.interfaces import DocumentMetadata
+from danswer.document_index.interfaces import MetadataRefreshRequest
 from danswer.indexing.chunker import Chunker
 from danswer.indexing.chunker import DefaultChunker
 from danswer.indexing.embedder import IndexingEmbedder
 from danswer.indexing.models import DocAwareChunk
 from danswer.indexing.models import DocMetadataAwareIndexChunk
+from danswer.indexing.models import IndexChunk
 from danswer.utils.logger import setup_logger
 from danswer.utils.timing import log_function_time
 
@@ -39,6 +47,54 @@ class IndexingPipelineProtocol(Protocol):
         ...
 
 
+def _hash_json(value: object) -> str:
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def get_chunk_hash(chunk: DocAwareChunk, index_name: str) -> str:
+    """Hash of everything that determines the chunk specific fields and embeddings of an
+    indexed chunk. Salted with the index name since a stored hash only describes the
+    index it was last written to"""
+    return _hash_json(
+        [
+            index_name,
+            chunk.source_document.get_title_for_document_index(),
+            chunk.content,
+            chunk.blurb,
+            chunk.source_links,
+            chunk.section_continuation,
+        ]
+    )
+
+
+def get_document_metadata_hash(
+    document: Document,
+    access: DocumentAccess,
+    document_sets: set[str],
+    boost: int,
+    index_name: str,
+) -> str:
+    """Hash of the fields shared by all chunks of a document. Includes `doc_updated_at` as
+    it drives recency bias and time filters, a bumped timestamp alone only needs a partial
+    update of the document's chunks"""
+    return _hash_json(
+        [
+            index_name,
+            document.source,
+            document.doc_updated_at,
+            document.semantic_identifier,
+            document.metadata,
+            get_experts_stores_representations(document.primary_owners),
+            get_experts_stores_representations(document.secondary_owners),
+            sorted(access.to_acl()),
+            sorted(document_sets),
+            boost,
+        ]
+    )
+
+
 def upsert_documents_in_db(
     documents: list[Document],
     index_attempt_metadata: IndexAttemptMetadata,
@@ -67,147 +123,354 @@ def upsert_documents_in_db(
         document_metadata_batch=doc_m_batch,
     )
 
-    # Insert document content metadata
+    # Insert document content metadata, as tags for the whole batch at once
+    document_tags: dict[str, set[TagTuple]] = {}
     for doc in documents:
+        doc_tags = document_tags.setdefault(doc.id, set())
         for k, v in doc.metadata.items():
-            if isinstance(v, list):
-                create_or_add_document_tag_list(
-                    tag_key=k,
-                    tag_values=v,
-                    source=doc.source,
-                    document_id=doc.id,
-                    db_session=db_session,
-                )
-            else:
-                create_or_add_document_tag(
-                    tag_key=k,
-                    tag_value=v,
-                    source=doc.source,
-                    document_id=doc.id,
-                    db_session=db_session,
-                )
+            for tag_value in v if isinstance(v, list) else [v]:
+                doc_tags.add((k, tag_value, doc.source))
+    upsert_document_tags(document_tags=document_tags, db_session=db_session)
+
+
+@dataclass
+class PreparedDocBatch:
+    """State of a batch of documents between the stages of the indexing pipeline"""
+
+    updatable_docs: list[Document]
+    num_chunks: int
+    # Only the chunks that need to be embedded and (re)written to the document index
+    changed_chunks: list[DocAwareChunk]
+    changed_doc_ids: set[str]
+    # Chunks already in the index as is, they only need a partial update if the document
+    # level fields changed
+    doc_id_to_unchanged_chunk_ids: dict[str, list[int]]
+    chunk_key_to_hash: dict[tuple[str, int], str]
+    doc_id_to_chunk_hashes: dict[str, list[str]]
+    doc_id_to_previous_metadata_hash: dict[str, str | None]
 
 
 @log_function_time()
-def index_doc_batch(
+def prepare_doc_batch(
     *,
     chunker: Chunker,
-    embedder: IndexingEmbedder,
     document_index: DocumentIndex,
     documents: list[Document],
     index_attempt_metadata: IndexAttemptMetadata,
+    db_session: Session,
     ignore_time_skip: bool = False,
-) -> tuple[int, int]:
-    """Takes different pieces of the indexing pipeline and applies it to a batch of documents
-    Note that the documents should already be batched at this point so that it does not inflate the
-    memory requirements"""
-    with Session(get_sqlalchemy_engine()) as db_session:
-        document_ids = [document.id for document in documents]
+) -> PreparedDocBatch:
+    """Records the documents in Postgres, chunks them and works out which chunks changed
+    since the last time the documents were indexed"""
+    document_ids = [document.id for document in documents]
 
-        # Skip indexing docs that don't have a newer updated at
-        # Shortcuts the time-consuming flow on connector index retries
-        db_docs = get_documents_by_ids(
-            document_ids=document_ids,
-            db_session=db_session,
+    # Skip indexing docs that don't have a newer updated at
+    # Shortcuts the time-consuming flow on connector index retries
+    db_docs = get_documents_by_ids(
+        document_ids=document_ids,
+        db_session=db_session,
+    )
+    id_to_db_doc_map = {doc.id: doc for doc in db_docs}
+    id_update_time_map = {
+        doc.id: doc.doc_updated_at for doc in db_docs if doc.doc_updated_at
+    }
+
+    updatable_docs: list[Document] = []
+    if ignore_time_skip:
+        updatable_docs = documents
+    else:
+        for doc in documents:
+            if (
+                doc.id in id_update_time_map
+                and doc.doc_updated_at
+                and doc.doc_updated_at <= id_update_time_map[doc.id]
+            ):
+                continue
+            updatable_docs.append(doc)
+
+    updatable_ids = [doc.id for doc in updatable_docs]
+
+    # Acquires a lock on the documents so that no other process can modify them
+    prepare_to_modify_documents(db_session=db_session, document_ids=updatable_ids)
+
+    # Create records in the source of truth about these documents,
+    # does not include doc_updated_at which is also used to indicate a successful update
+    upsert_documents_in_db(
+        documents=updatable_docs,
+        index_attempt_metadata=index_attempt_metadata,
+        db_session=db_session,
+    )
+
+    logger.debug("Starting chunking")
+
+    # The first chunk additionally contains the Title of the Document
+    chunks: list[DocAwareChunk] = list(
+        chain(*chunker.chunk_batch(documents=updatable_docs))
+    )
+
+    index_name = document_index.index_name
+    chunk_hashes = [get_chunk_hash(chunk, index_name) for chunk in chunks]
+    doc_id_to_chunk_hashes: dict[str, list[str]] = {
+        doc.id: [] for doc in updatable_docs
+    }
+    for chunk, chunk_hash in zip(chunks, chunk_hashes):
+        doc_id_to_chunk_hashes[chunk.source_document.id].append(chunk_hash)
+
+    # Chunks whose hash matches the one stored from the last successful indexing of the
+    # document are already in the index, they don't need to be embedded or indexed again.
+    # Skipping is disabled when reindexing everything (e.g. from the beginning)
+    changed_doc_ids: set[str] = set()
+    chunk_is_changed: list[bool] = []
+    for chunk, chunk_hash in zip(chunks, chunk_hashes):
+        document_id = chunk.source_document.id
+        db_doc = id_to_db_doc_map.get(document_id)
+        previous_hashes = (
+            (db_doc.chunk_hashes or {}).get(index_name) if db_doc else None
         )
-        id_to_db_doc_map = {doc.id: doc for doc in db_docs}
-        id_update_time_map = {
-            doc.id: doc.doc_updated_at for doc in db_docs if doc.doc_updated_at
-        }
-
-        updatable_docs: list[Document] = []
-        if ignore_time_skip:
-            updatable_docs = documents
-        else:
-            for doc in documents:
-                if (
-                    doc.id in id_update_time_map
-                    and doc.doc_updated_at
-                    and doc.doc_updated_at <= id_update_time_map[doc.id]
-                ):
-                    continue
-                updatable_docs.append(doc)
-
-        updatable_ids = [doc.id for doc in updatable_docs]
-
-        # Acquires a lock on the documents so that no other process can modify them
-        prepare_to_modify_documents(db_session=db_session, document_ids=updatable_ids)
-
-        # Create records in the source of truth about these documents,
-        # does not include doc_updated_at which is also used to indicate a successful update
-        upsert_documents_in_db(
-            documents=updatable_docs,
-            index_attempt_metadata=index_attempt_metadata,
-            db_session=db_session,
+        is_changed = (
+            ignore_time_skip
+            or not previous_hashes
+            or len(previous_hashes) != len(doc_id_to_chunk_hashes[document_id])
+            or previous_hashes[chunk.chunk_id] != chunk_hash
         )
+        chunk_is_changed.append(is_changed)
+        if is_changed:
+            changed_doc_ids.add(document_id)
 
-        logger.debug("Starting chunking")
-
-        # The first chunk additionally contains the Title of the Document
-        chunks: list[DocAwareChunk] = list(
-            chain(*[chunker.chunk(document=document) for document in updatable_docs])
+    # The document index uses the last chunk to determine the new length of a document
+    # (and remove chunks past it) so it is always sent for documents with any change
+    doc_id_to_last_chunk_id = {
+        chunk.source_document.id: chunk.chunk_id for chunk in chunks
+    }
+    changed_chunks = [
+        chunk
+        for chunk, is_changed in zip(chunks, chunk_is_changed)
+        if is_changed
+        or (
+            chunk.source_document.id in changed_doc_ids
+            and chunk.chunk_id == doc_id_to_last_chunk_id[chunk.source_document.id]
         )
+    ]
+    changed_chunk_keys = {
+        (chunk.source_document.id, chunk.chunk_id) for chunk in changed_chunks
+    }
 
-        logger.debug("Starting embedding")
-        chunks_with_embeddings = embedder.embed_chunks(chunks=chunks)
+    logger.debug(f"Skipping {len(chunks) - len(changed_chunks)} unchanged chunks")
 
-        # Attach the latest status from Postgres (source of truth for access) to each
-        # chunk. This access status will be attached to each chunk in the document index
-        # TODO: attach document sets to the chunk based on the status of Postgres as well
-        document_id_to_access_info = get_access_for_documents(
-            document_ids=updatable_ids, db_session=db_session
-        )
-        document_id_to_document_set = {
-            document_id: document_sets
-            for document_id, document_sets in fetch_document_sets_for_documents(
-                document_ids=updatable_ids, db_session=db_session
-            )
-        }
-        access_aware_chunks = [
-            DocMetadataAwareIndexChunk.from_index_chunk(
-                index_chunk=chunk,
-                access=document_id_to_access_info[chunk.source_document.id],
-                document_sets=set(
-                    document_id_to_document_set.get(chunk.source_document.id, [])
-                ),
-                boost=(
-                    id_to_db_doc_map[chunk.source_document.id].boost
-                    if chunk.source_document.id in id_to_db_doc_map
-                    else DEFAULT_BOOST
-                ),
-            )
-            for chunk in chunks_with_embeddings
-        ]
+    return PreparedDocBatch(
+        updatable_docs=updatable_docs,
+        num_chunks=len(chunks),
+        changed_chunks=changed_chunks,
+        changed_doc_ids=changed_doc_ids,
+        doc_id_to_unchanged_chunk_ids={
+            doc.id: [
+                chunk_id
+                for chunk_id in range(len(doc_id_to_chunk_hashes[doc.id]))
+                if (doc.id, chunk_id) not in changed_chunk_keys
+            ]
+            for doc in updatable_docs
+        },
+        chunk_key_to_hash={
+            (chunk.source_document.id, chunk.chunk_id): chunk_hash
+            for chunk, chunk_hash in zip(chunks, chunk_hashes)
+        },
+        doc_id_to_chunk_hashes=doc_id_to_chunk_hashes,
+        doc_id_to_previous_metadata_hash={
+            doc.id: (id_to_db_doc_map[doc.id].metadata_hashes or {}).get(index_name)
+            if doc.id in id_to_db_doc_map
+            else None
+            for doc in updatable_docs
+        },
+    )
+
+
+@log_function_time()
+def embed_doc_batch(
+    *, embedder: IndexingEmbedder, prepared_batch: PreparedDocBatch
+) -> list[IndexChunk]:
+    """Embeds the changed chunks of the batch, does not touch Postgres or the document index
+    so it can run concurrently with the other stages"""
+    logger.debug("Starting embedding")
+    return embedder.embed_chunks(chunks=prepared_batch.changed_chunks)
 
-        logger.debug(
-            f"Indexing the following chunks: {[chunk.to_short_descriptor() for chunk in chunks]}"
+
+@log_function_time()
+def write_doc_batch(
+    *,
+    document_index: DocumentIndex,
+    prepared_batch: PreparedDocBatch,
+    index_chunks: list[IndexChunk],
+    db_session: Session,
+) -> tuple[int, int]:
+    """Writes the embedded chunks to the document index and records the successfully indexed
+    documents in Postgres, returns the number of new documents and the number of chunks
+    """
+    updatable_docs = prepared_batch.updatable_docs
+    updatable_ids = [doc.id for doc in updatable_docs]
+    changed_doc_ids = prepared_batch.changed_doc_ids
+    index_name = document_index.index_name
+
+    # Stored hashes must never describe a partially updated document. Which documents only
+    # get their metadata refreshed is known once the lock is held, so all of them are cleared
+    clear_docs_content_hashes(
+        document_ids=updatable_ids, index_name=index_name, db_session=db_session
+    )
+
+    # Attach the latest status from Postgres (source of truth for access and document
+    # sets) to each chunk. This status will be attached to each chunk in the document index.
+    # Resolved under the document locks, which document set syncs take as well, and held
+    # until the documents are recorded so the index never gets values older than Postgres
+    prepare_to_modify_documents(db_session=db_session, document_ids=updatable_ids)
+    document_id_to_access_info = get_access_for_documents(
+        document_ids=updatable_ids, db_session=db_session
+    )
+    document_id_to_index_info = get_index_info_for_documents(
+        document_ids=updatable_ids, db_session=db_session
+    )
+    document_id_to_document_set = {
+        document_id: index_info.document_sets
+        for document_id, index_info in document_id_to_index_info.items()
+    }
+    document_id_to_boost = {
+        doc.id: document_id_to_index_info[doc.id].boost
+        if doc.id in document_id_to_index_info
+        else DEFAULT_BOOST
+        for doc in updatable_docs
+    }
+    doc_id_to_metadata_hash = {
+        doc.id: get_document_metadata_hash(
+            document=doc,
+            access=document_id_to_access_info[doc.id],
+            document_sets=document_id_to_document_set.get(doc.id, set()),
+            boost=document_id_to_boost[doc.id],
+            index_name=index_name,
         )
-        # A document will not be spread across different batches, so all the
-        # documents with chunks in this set, are fully represented by the chunks
-        # in this set
-        insertion_records = document_index.index(chunks=access_aware_chunks)
-
-        successful_doc_ids = [record.document_id for record in insertion_records]
-        successful_docs = [
-            doc for doc in updatable_docs if doc.id in successful_doc_ids
-        ]
+        for doc in updatable_docs
+    }
 
-        # Update the time of latest version of the doc successfully indexed
-        ids_to_new_updated_at = {}
-        for doc in successful_docs:
-            if doc.doc_updated_at is None:
-                continue
-            ids_to_new_updated_at[doc.id] = doc.doc_updated_at
+    access_aware_chunks = [
+        DocMetadataAwareIndexChunk.from_index_chunk(
+            index_chunk=chunk,
+            access=document_id_to_access_info[chunk.source_document.id],
+            document_sets=document_id_to_document_set.get(
+                chunk.source_document.id, set()
+            ),
+            boost=document_id_to_boost[chunk.source_document.id],
+            content_hash=prepared_batch.chunk_key_to_hash[
+                (chunk.source_document.id, chunk.chunk_id)
+            ],
+        )
+        for chunk in index_chunks
+    ]
 
-        update_docs_updated_at(
-            ids_to_new_updated_at=ids_to_new_updated_at, db_session=db_session
+    # Unchanged chunks of documents whose shared fields changed only need a partial update
+    refresh_requests = [
+        MetadataRefreshRequest(
+            document=doc,
+            chunk_ids=prepared_batch.doc_id_to_unchanged_chunk_ids[doc.id],
+            access=document_id_to_access_info[doc.id],
+            document_sets=document_id_to_document_set.get(doc.id, set()),
+            boost=document_id_to_boost[doc.id],
         )
+        for doc in updatable_docs
+        if prepared_batch.doc_id_to_unchanged_chunk_ids[doc.id]
+        and prepared_batch.doc_id_to_previous_metadata_hash[doc.id]
+        != doc_id_to_metadata_hash[doc.id]
+    ]
+
+    logger.debug(
+        f"Indexing the following chunks: {[chunk.to_short_descriptor() for chunk in access_aware_chunks]}, "
+        f"refreshing metadata for {len(refresh_requests)} documents"
+    )
+    # A document will not be spread across different batches, so all the
+    # documents with chunks in this set, are fully represented by the chunks
+    # in this set together with the unchanged chunks already in the index
+    insertion_records = document_index.index(chunks=access_aware_chunks)
+    # Partially written documents keep their hashes, chunk counts and updated at cleared
+    # so they are fully indexed again on the next run
+    failed_doc_ids = {
+        record.document_id for record in insertion_records if record.failed
+    }
+    if failed_doc_ids:
+        logger.error(f"Failed to index documents: {failed_doc_ids}")
+    insertion_records = {record for record in insertion_records if not record.failed}
+
+    refresh_requests = [
+        request
+        for request in refresh_requests
+        if request.document.id not in failed_doc_ids
+    ]
+    if refresh_requests:
+        document_index.refresh_metadata(refresh_requests=refresh_requests)
+
+    # Documents without any changed chunks were already in the index
+    successful_doc_ids = {record.document_id for record in insertion_records} | {
+        doc.id
+        for doc in updatable_docs
+        if doc.id not in changed_doc_ids
+        and prepared_batch.doc_id_to_chunk_hashes[doc.id]
+    }
+    successful_docs = [doc for doc in updatable_docs if doc.id in successful_doc_ids]
+
+    # Update the time of latest version of the doc successfully indexed
+    ids_to_new_updated_at = {}
+    for doc in successful_docs:
+        if doc.doc_updated_at is None:
+            continue
+        ids_to_new_updated_at[doc.id] = doc.doc_updated_at
+
+    update_docs_updated_at(
+        ids_to_new_updated_at=ids_to_new_updated_at, db_session=db_session
+    )
+    update_docs_content_hashes(
+        ids_to_chunk_hashes={
+            doc.id: prepared_batch.doc_id_to_chunk_hashes[doc.id]
+            for doc in successful_docs
+        },
+        ids_to_metadata_hash={
+            doc.id: doc_id_to_metadata_hash[doc.id] for doc in successful_docs
+        },
+        index_name=document_index.index_name,
+        db_session=db_session,
+    )
 
-    return len([r for r in insertion_records if r.already_existed is False]), len(
-        chunks
+    return (
+        len([r for r in insertion_records if r.already_existed is False]),
+        prepared_batch.num_chunks,
     )
 
 
+@log_function_time()
+def index_doc_batch(
+    *,
+    chunker: Chunker,
+    embedder: IndexingEmbedder,
+    document_index: DocumentIndex,
+    documents: list[Document],
+    index_attempt_metadata: IndexAttemptMetadata,
+    ignore_time_skip: bool = False,
+) -> tuple[int, int]:
+    """Takes different pieces of the indexing pipeline and applies it to a batch of documents
+    Note that the documents should already be batched at this point so that it does not inflate the
+    memory requirements"""
+    with Session(get_sqlalchemy_engine()) as db_session:
+        prepared_batch = prepare_doc_batch(
+            chunker=chunker,
+            document_index=document_index,
+            documents=documents,
+            index_attempt_metadata=index_attempt_metadata,
+            db_session=db_session,
+            ignore_time_skip=ignore_time_skip,
+        )
+        index_chunks = embed_doc_batch(embedder=embedder, prepared_batch=prepared_batch)
+        return write_doc_batch(
+            document_index=document_index,
+            prepared_batch=prepared_batch,
+            index_chunks=index_chunks,
+            db_session=db_session,
+        )
+
+
 def build_indexing_pipeline(
     *,
     embedder: IndexingEmbedder,
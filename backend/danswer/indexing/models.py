@@ -1,7 +1,10 @@
 from dataclasses import dataclass
 from dataclasses import fields
 from datetime import datetime
+from typing import Any
 
+import numpy as np
+import numpy.typing as npt
 from pydantic import BaseModel
 
 from danswer.access.models import DocumentAccess
@@ -14,15 +17,25 @@ logger = setup_logger()
 
 
 Embedding = list[float]
+# Embeddings held by the chunks during indexing, float32 arrays take ~4 bytes per dimension
+# instead of ~32 for a list of Python floats. Converted to lists only when fed to the index
+EmbeddingArray = npt.NDArray[np.float32]
 
 
-@dataclass
+def _shallow_field_values(chunk: "BaseChunk") -> dict[str, Any]:
+    """Field values of the chunk for building the chunk of the next indexing stage, the
+    values themselves (Document, embeddings, texts) are shared rather than copied"""
+    return {field.name: getattr(chunk, field.name) for field in fields(chunk)}
+
+
+@dataclass(slots=True)
 class ChunkEmbedding:
-    full_embedding: Embedding
-    mini_chunk_embeddings: list[Embedding]
+    full_embedding: EmbeddingArray
+    # One row per mini chunk, shape (0, dim) if mini chunks are disabled
+    mini_chunk_embeddings: EmbeddingArray
 
 
-@dataclass
+@dataclass(slots=True)
 class BaseChunk:
     chunk_id: int
     blurb: str  # The first sentence(s) of the first Section of the chunk
@@ -33,7 +46,7 @@ class BaseChunk:
     section_continuation: bool  # True if this Chunk's start is not at the start of a Section
 
 
-@dataclass
+@dataclass(slots=True)
 class DocAwareChunk(BaseChunk):
     # During indexing flow, we have access to a complete "Document"
     # During inference we only have access to the document id and do not reconstruct the Document
@@ -46,13 +59,26 @@ class DocAwareChunk(BaseChunk):
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class IndexChunk(DocAwareChunk):
     embeddings: ChunkEmbedding
-    title_embedding: Embedding | None
+    title_embedding: EmbeddingArray | None
 
+    @classmethod
+    def from_doc_aware_chunk(
+        cls,
+        chunk: DocAwareChunk,
+        embeddings: ChunkEmbedding,
+        title_embedding: EmbeddingArray | None,
+    ) -> "IndexChunk":
+        return cls(
+            **_shallow_field_values(chunk),
+            embeddings=embeddings,
+            title_embedding=title_embedding,
+        )
 
-@dataclass
+
+@dataclass(slots=True)
 class DocMetadataAwareIndexChunk(IndexChunk):
     """An `IndexChunk` that contains all necessary metadata to be indexed. This includes
     the following:
@@ -68,6 +94,8 @@ class DocMetadataAwareIndexChunk(IndexChunk):
     access: "DocumentAccess"
     document_sets: set[str]
     boost: int
+    # Hash of the chunk contents, see `indexing_pipeline.get_chunk_hash`
+    content_hash: str | None = None
 
     @classmethod
     def from_index_chunk(
@@ -76,15 +104,14 @@ class DocMetadataAwareIndexChunk(IndexChunk):
         access: "DocumentAccess",
         document_sets: set[str],
         boost: int,
+        content_hash: str | None = None,
     ) -> "DocMetadataAwareIndexChunk":
         return cls(
-            **{
-                field.name: getattr(index_chunk, field.name)
-                for field in fields(index_chunk)
-            },
+            **_shallow_field_values(index_chunk),
             access=access,
             document_sets=document_sets,
             boost=boost,
+            content_hash=content_hash,
         )
 
 
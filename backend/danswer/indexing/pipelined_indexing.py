@@ -0,0 +1,201 @@
+import queue
+import threading
+from collections import deque
+from collections.abc import Callable
+from collections.abc import Generator
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from sqlalchemy.orm import Session
+
+from danswer.configs.app_configs import INDEXING_PIPELINE_MAX_IN_FLIGHT_BATCHES
+from danswer.configs.app_configs import INDEXING_PIPELINE_PREFETCH_BATCHES
+from danswer.connectors.models import Document
+from danswer.connectors.models import IndexAttemptMetadata
+from danswer.db.engine import get_sqlalchemy_engine
+from danswer.document_index.interfaces import DocumentIndex
+from danswer.indexing.chunker import Chunker
+from danswer.indexing.chunker import get_indexing_chunker
+from danswer.indexing.embedder import IndexingEmbedder
+from danswer.indexing.indexing_pipeline import embed_doc_batch
+from danswer.indexing.indexing_pipeline import prepare_doc_batch
+from danswer.indexing.indexing_pipeline import PreparedDocBatch
+from danswer.indexing.indexing_pipeline import write_doc_batch
+from danswer.indexing.models import IndexChunk
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+T = TypeVar("T")
+
+_PREFETCH_POLL_INTERVAL = 1.0
+
+
+class _PrefetchDone:
+    pass
+
+
+def prefetch(items: Iterable[T], max_prefetched: int) -> Generator[T, None, None]:
+    """Pulls items from `items` in a background thread, at most `max_prefetched` ahead of
+    the consumer. Exceptions raised while producing are re-raised to the consumer"""
+    prefetched: queue.Queue[T | _PrefetchDone | BaseException] = queue.Queue(
+        maxsize=max(max_prefetched, 1)
+    )
+    stop_event = threading.Event()
+
+    def _put(item: T | _PrefetchDone | BaseException) -> bool:
+        while not stop_event.is_set():
+            try:
+                prefetched.put(item, timeout=_PREFETCH_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in items:
+                if not _put(item):
+                    return
+            _put(_PrefetchDone())
+        except BaseException as e:
+            _put(e)
+
+    producer = threading.Thread(target=_produce, name="indexing-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = prefetched.get()
+            if isinstance(item, _PrefetchDone):
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop_event.set()
+
+
+class PipelinedIndexingRunner:
+    """Runs the stages of the indexing pipeline concurrently on consecutive batches:
+    connector fetching (prefetch), Postgres upserts + chunking, embedding and writing to the
+    document index each get their own thread with bounded hand-offs between them.
+
+    Batches are never merged or split so a document is never spread across batches, and
+    results are yielded in the order of the batches. A batch that shares documents with a
+    batch still in the pipeline waits for that batch to be fully written first, otherwise
+    it would be compared against stale content hashes."""
+
+    def __init__(
+        self,
+        embedder: IndexingEmbedder,
+        document_index: DocumentIndex,
+        chunker: Chunker | None = None,
+        ignore_time_skip: bool = False,
+        max_prefetched_batches: int = INDEXING_PIPELINE_PREFETCH_BATCHES,
+        max_in_flight_batches: int = INDEXING_PIPELINE_MAX_IN_FLIGHT_BATCHES,
+    ) -> None:
+        self.embedder = embedder
+        self.document_index = document_index
+        self.chunker = chunker or get_indexing_chunker()
+        self.ignore_time_skip = ignore_time_skip
+        self.max_prefetched_batches = max_prefetched_batches
+        self.max_in_flight_batches = max(max_in_flight_batches, 1)
+
+    def _prepare(
+        self, documents: list[Document], index_attempt_metadata: IndexAttemptMetadata
+    ) -> PreparedDocBatch:
+        with Session(get_sqlalchemy_engine()) as db_session:
+            return prepare_doc_batch(
+                chunker=self.chunker,
+                document_index=self.document_index,
+                documents=documents,
+                index_attempt_metadata=index_attempt_metadata,
+                db_session=db_session,
+                ignore_time_skip=self.ignore_time_skip,
+            )
+
+    def _embed(
+        self, prepared_future: "Future[PreparedDocBatch]"
+    ) -> tuple[PreparedDocBatch, list[IndexChunk]]:
+        prepared_batch = prepared_future.result()
+        return prepared_batch, embed_doc_batch(
+            embedder=self.embedder, prepared_batch=prepared_batch
+        )
+
+    def _write(
+        self, embedded_future: "Future[tuple[PreparedDocBatch, list[IndexChunk]]]"
+    ) -> tuple[int, int]:
+        prepared_batch, index_chunks = embedded_future.result()
+        with Session(get_sqlalchemy_engine()) as db_session:
+            return write_doc_batch(
+                document_index=self.document_index,
+                prepared_batch=prepared_batch,
+                index_chunks=index_chunks,
+                db_session=db_session,
+            )
+
+    def run(
+        self,
+        doc_batches: Iterable[list[Document]],
+        index_attempt_metadata: IndexAttemptMetadata,
+        raise_if_stopped: Callable[[], None] | None = None,
+    ) -> Iterator[tuple[list[Document], int, int]]:
+        """Yields (batch, number of new documents, number of chunks) for each batch once it
+        has been fully written. Stops the pipeline if the consumer stops iterating.
+
+        `raise_if_stopped` is called before each batch enters the pipeline, whatever it
+        raises stops the pipeline (e.g. the connector got disabled) after the batches
+        already in it are done and is raised to the consumer"""
+        prepare_executor = ThreadPoolExecutor(1, thread_name_prefix="indexing-prepare")
+        embed_executor = ThreadPoolExecutor(1, thread_name_prefix="indexing-embed")
+        write_executor = ThreadPoolExecutor(1, thread_name_prefix="indexing-write")
+
+        in_flight: deque[
+            tuple[list[Document], set[str], Future[tuple[int, int]]]
+        ] = deque()
+
+        def _complete_oldest() -> tuple[list[Document], int, int]:
+            doc_batch, _, write_future = in_flight.popleft()
+            new_docs, num_chunks = write_future.result()
+            return doc_batch, new_docs, num_chunks
+
+        prefetched_batches = prefetch(doc_batches, self.max_prefetched_batches)
+        try:
+            for doc_batch in prefetched_batches:
+                doc_ids = {doc.id for doc in doc_batch}
+                while in_flight and any(
+                    not doc_ids.isdisjoint(in_flight_ids)
+                    for _, in_flight_ids, _ in in_flight
+                ):
+                    yield _complete_oldest()
+
+                if raise_if_stopped:
+                    raise_if_stopped()
+
+                prepared_future = prepare_executor.submit(
+                    self._prepare, doc_batch, index_attempt_metadata
+                )
+                embedded_future = embed_executor.submit(self._embed, prepared_future)
+                write_future = write_executor.submit(self._write, embedded_future)
+                in_flight.append((doc_batch, doc_ids, write_future))
+
+                while len(in_flight) >= self.max_in_flight_batches:
+                    yield _complete_oldest()
+
+            while in_flight:
+                yield _complete_oldest()
+        finally:
+            prefetched_batches.close()
+            # Batches that haven't started are dropped, the ones in progress are allowed to
+            # finish so that no document is left partially written
+            for executor in (prepare_executor, embed_executor, write_executor):
+                executor.shutdown(wait=False, cancel_futures=True)
+            for _, _, write_future in in_flight:
+                if not write_future.cancelled():
+                    try:
+                        write_future.result()
+                    except Exception:
+                        pass
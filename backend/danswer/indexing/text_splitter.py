@@ -0,0 +1,138 @@
+import re
+from bisect import bisect_left
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Protocol
+
+from llama_index.text_splitter import SentenceSplitter
+from transformers import AutoTokenizer  # type:ignore
+
+# A new split may start after a blank line, the end of a sentence or a line break
+_PARAGRAPH_BOUNDARY_PAT = re.compile(r"\n\s*\n")
+_SENTENCE_BOUNDARY_PAT = re.compile(r"[.!?。！？][\"'”’)\]]*\s+|\n")
+
+
+class TextSplitter(Protocol):
+    def split_text(self, text: str) -> list[str]:
+        ...
+
+
+class OffsetTextSplitter:
+    """Splits text into chunks of at most `chunk_size` tokens by tokenizing the text once
+    with a fast tokenizer and slicing the text at the character offsets of the tokens.
+
+    Chunks end at the last paragraph or sentence boundary that fits, falling back to the last
+    word boundary and then to any token for text without usable boundaries. Consecutive
+    chunks share up to `chunk_overlap` tokens, starting on a word boundary."""
+
+    def __init__(
+        self, tokenizer: AutoTokenizer, chunk_size: int, chunk_overlap: int = 0
+    ) -> None:
+        if chunk_overlap >= chunk_size:
+            raise ValueError(
+                f"Chunk overlap ({chunk_overlap}) must be smaller than the chunk size "
+                f"({chunk_size})"
+            )
+        self.tokenizer = tokenizer
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def _get_token_offsets(self, text: str) -> list[tuple[int, int]]:
+        return self.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            # Texts longer than the model max length are expected here
+            verbose=False,
+        )["offset_mapping"]
+
+    @staticmethod
+    def _boundary_token_inds(
+        pattern: re.Pattern, text: str, token_starts: list[int]
+    ) -> list[int]:
+        """Indices of the tokens that start right after a match of the pattern"""
+        num_tokens = len(token_starts)
+        token_inds = {
+            bisect_left(token_starts, match.end()) for match in pattern.finditer(text)
+        }
+        return sorted(ind for ind in token_inds if 0 < ind < num_tokens)
+
+    def split_text(self, text: str) -> list[str]:
+        if not text.strip():
+            return []
+
+        offsets = self._get_token_offsets(text)
+        num_tokens = len(offsets)
+        if num_tokens <= self.chunk_size:
+            return [text.strip()]
+
+        token_starts = [start for start, _ in offsets]
+        sentence_boundaries = sorted(
+            set(
+                self._boundary_token_inds(_PARAGRAPH_BOUNDARY_PAT, text, token_starts)
+                + self._boundary_token_inds(_SENTENCE_BOUNDARY_PAT, text, token_starts)
+            )
+        )
+        # Tokens separated from the previous one by whitespace start a new word
+        word_boundaries = [
+            ind for ind in range(1, num_tokens) if offsets[ind][0] > offsets[ind - 1][1]
+        ]
+
+        def _last_boundary(boundaries: list[int], after: int, limit: int) -> int | None:
+            ind = bisect_right(boundaries, limit) - 1
+            if ind >= 0 and boundaries[ind] > after:
+                return boundaries[ind]
+            return None
+
+        chunks: list[str] = []
+        start = 0
+        prev_end = 0
+        while start < num_tokens:
+            limit = start + self.chunk_size
+            if limit >= num_tokens:
+                end = num_tokens
+            else:
+                # A chunk must extend past the previous one, not only repeat its overlap
+                end = (
+                    _last_boundary(sentence_boundaries, prev_end, limit)
+                    or _last_boundary(word_boundaries, prev_end, limit)
+                    or limit
+                )
+
+            # Slices run up to the start of the next token so no text is dropped in between
+            start_char = token_starts[start] if start > 0 else 0
+            end_char = token_starts[end] if end < num_tokens else len(text)
+            chunk = text[start_char:end_char].strip()
+            if chunk:
+                chunks.append(chunk)
+
+            if end >= num_tokens:
+                break
+
+            prev_end = next_start = end
+            if self.chunk_overlap:
+                overlap_ind = bisect_left(word_boundaries, end - self.chunk_overlap)
+                if (
+                    overlap_ind < len(word_boundaries)
+                    and start < word_boundaries[overlap_ind] < end
+                ):
+                    next_start = word_boundaries[overlap_ind]
+            start = next_start
+
+        return chunks
+
+
+@lru_cache(maxsize=16)
+def get_text_splitter(
+    tokenizer: AutoTokenizer, chunk_size: int, chunk_overlap: int = 0
+) -> TextSplitter:
+    """Splitters are reused per tokenizer and size. Only fast (Rust based) tokenizers
+    provide offsets, the sentence splitter of llama_index is used for any other tokenizer
+    """
+    if getattr(tokenizer, "is_fast", False):
+        return OffsetTextSplitter(
+            tokenizer=tokenizer, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+    return SentenceSplitter(
+        tokenizer=tokenizer.tokenize, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
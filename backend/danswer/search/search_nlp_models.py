@@ -8,6 +8,7 @@ from typing import TYPE_CHECKING
 import numpy as np
 import requests
 
+from danswer.configs.app_configs import MODEL_SERVER_EMBEDDING_FORMAT
 from danswer.configs.app_configs import MODEL_SERVER_HOST
 from danswer.configs.app_configs import MODEL_SERVER_PORT
 from danswer.configs.model_configs import CROSS_EMBED_CONTEXT_SIZE
@@ -16,7 +17,11 @@ from danswer.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
 from danswer.configs.model_configs import DOCUMENT_ENCODER_MODEL
 from danswer.configs.model_configs import INTENT_MODEL_VERSION
 from danswer.configs.model_configs import QUERY_MAX_CONTEXT_SIZE
+from danswer.indexing.models import EmbeddingArray
 from danswer.utils.logger import setup_logger
+from shared_models.embedding_serialization import build_binary_accept_header
+from shared_models.embedding_serialization import deserialize_embeddings
+from shared_models.embedding_serialization import EMBEDDINGS_BINARY_CONTENT_TYPE
 from shared_models.model_server_models import EmbedRequest
 from shared_models.model_server_models import EmbedResponse
 from shared_models.model_server_models import IntentRequest
@@ -33,6 +38,7 @@ logging.getLogger("transformers").setLevel(logging.ERROR)
 
 
 if TYPE_CHECKING:
+    from danswer.indexing.embedding_cache import EmbeddingCache
     from sentence_transformers import CrossEncoder  # type: ignore
     from sentence_transformers import SentenceTransformer  # type: ignore
     from transformers import AutoTokenizer  # type: ignore
@@ -183,12 +189,14 @@ class EmbeddingModel:
         server_port: int | None,
         # The following are globals are currently not configurable
         max_seq_length: int = DOC_EMBEDDING_CONTEXT_SIZE,
+        embedding_cache: Optional["EmbeddingCache"] = None,
     ) -> None:
         self.model_name = model_name
         self.max_seq_length = max_seq_length
         self.query_prefix = query_prefix
         self.passage_prefix = passage_prefix
         self.normalize = normalize
+        self.embedding_cache = embedding_cache
 
         model_server_url = build_model_server_url(server_host, server_port)
         self.embed_server_endpoint = (
@@ -203,14 +211,56 @@ class EmbeddingModel:
             model_name=self.model_name, max_context_length=self.max_seq_length
         )
 
-    def encode(self, texts: list[str], text_type: EmbedTextType) -> list[list[float]]:
+    def encode(self, texts: list[str], text_type: EmbedTextType) -> EmbeddingArray:
+        """Returns a float32 matrix with one row per text. Indexing keeps working on the
+        arrays, callers that need plain lists (e.g. for a query) convert on their side
+        """
         if text_type == EmbedTextType.QUERY and self.query_prefix:
-            prefixed_texts = [self.query_prefix + text for text in texts]
+            prefix = self.query_prefix
         elif text_type == EmbedTextType.PASSAGE and self.passage_prefix:
-            prefixed_texts = [self.passage_prefix + text for text in texts]
+            prefix = self.passage_prefix
         else:
-            prefixed_texts = texts
+            prefix = ""
 
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        prefixed_texts = [prefix + text for text in texts] if prefix else texts
+
+        if self.embedding_cache is None:
+            return self._encode_prefixed_texts(prefixed_texts)
+
+        cached_embeddings = self.embedding_cache.get_embeddings(
+            model_name=self.model_name,
+            normalize=self.normalize,
+            prefix=prefix,
+            texts=texts,
+        )
+        missing_inds = [
+            ind for ind, embedding in enumerate(cached_embeddings) if embedding is None
+        ]
+        if not missing_inds:
+            return np.array(cached_embeddings, dtype=np.float32)
+
+        new_embeddings = self._encode_prefixed_texts(
+            [prefixed_texts[ind] for ind in missing_inds]
+        )
+        self.embedding_cache.store_embeddings(
+            model_name=self.model_name,
+            normalize=self.normalize,
+            prefix=prefix,
+            texts=[texts[ind] for ind in missing_inds],
+            embeddings=list(new_embeddings),
+        )
+
+        embeddings = np.empty((len(texts), new_embeddings.shape[1]), dtype=np.float32)
+        embeddings[missing_inds] = new_embeddings
+        for ind, embedding in enumerate(cached_embeddings):
+            if embedding is not None:
+                embeddings[ind] = embedding
+        return embeddings
+
+    def _encode_prefixed_texts(self, prefixed_texts: list[str]) -> EmbeddingArray:
         if self.embed_server_endpoint:
             embed_request = EmbedRequest(
                 texts=prefixed_texts,
@@ -218,13 +268,30 @@ class EmbeddingModel:
                 normalize_embeddings=self.normalize,
             )
 
+            headers = (
+                {"Accept": build_binary_accept_header(MODEL_SERVER_EMBEDDING_FORMAT)}
+                if MODEL_SERVER_EMBEDDING_FORMAT != "json"
+                else None
+            )
             try:
                 response = requests.post(
-                    self.embed_server_endpoint, json=embed_request.dict()
+                    self.embed_server_endpoint,
+                    json=embed_request.dict(),
+                    headers=headers,
                 )
                 response.raise_for_status()
 
-                return EmbedResponse(**response.json()).embeddings
+                # Model servers without binary support always respond with JSON
+                if response.headers.get("Content-Type", "").startswith(
+                    EMBEDDINGS_BINARY_CONTENT_TYPE
+                ):
+                    # No copy for float32 payloads, float16 ones are upcast
+                    return np.asarray(
+                        deserialize_embeddings(response.content), dtype=np.float32
+                    )
+                return np.array(
+                    EmbedResponse(**response.json()).embeddings, dtype=np.float32
+                )
             except requests.RequestException as e:
                 logger.exception(f"Failed to get Embedding: {e}")
                 raise
@@ -234,9 +301,10 @@ class EmbeddingModel:
         if local_model is None:
             raise RuntimeError("Failed to load local Embedding Model")
 
-        return local_model.encode(
-            prefixed_texts, normalize_embeddings=self.normalize
-        ).tolist()
+        return np.asarray(
+            local_model.encode(prefixed_texts, normalize_embeddings=self.normalize),
+            dtype=np.float32,
+        )
 
 
 class CrossEncoderEnsembleModel:
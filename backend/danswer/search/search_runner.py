@@ -15,11 +15,14 @@ from danswer.configs.app_configs import MODEL_SERVER_PORT
 from danswer.configs.chat_configs import HYBRID_ALPHA
 from danswer.configs.chat_configs import MULTILINGUAL_QUERY_EXPANSION
 from danswer.configs.chat_configs import NUM_RERANKED_RESULTS
+from danswer.configs.chat_configs import QUERY_EMBEDDING_CACHE_SIZE
+from danswer.configs.chat_configs import QUERY_EMBEDDING_CACHE_TTL_SECONDS
 from danswer.configs.model_configs import CROSS_ENCODER_RANGE_MAX
 from danswer.configs.model_configs import CROSS_ENCODER_RANGE_MIN
 from danswer.configs.model_configs import SIM_SCORE_RANGE_HIGH
 from danswer.configs.model_configs import SIM_SCORE_RANGE_LOW
 from danswer.db.embedding_model import get_current_db_embedding_model
+from danswer.db.models import EmbeddingModel as DbEmbeddingModel
 from danswer.document_index.document_index_utils import (
     translate_boost_count_to_multiplier,
 )
@@ -39,6 +42,7 @@ from danswer.search.search_nlp_models import EmbedTextType
 from danswer.secondary_llm_flows.chunk_usefulness import llm_batch_eval_chunks
 from danswer.secondary_llm_flows.query_expansion import multilingual_query_expansion
 from danswer.utils.logger import setup_logger
+from danswer.utils.lru_cache import TTLLRUCache
 from danswer.utils.threadpool_concurrency import FunctionCall
 from danswer.utils.threadpool_concurrency import run_functions_in_parallel
 from danswer.utils.threadpool_concurrency import run_functions_tuples_in_parallel
@@ -47,6 +51,14 @@ from danswer.utils.timing import log_function_time
 
 logger = setup_logger()
 
+# Keyed by (embedding model id, model name, normalize, query prefix, normalized query)
+_QUERY_EMBEDDING_CACHE: TTLLRUCache[
+    tuple[int, str, bool, str, str], list[float]
+] = TTLLRUCache(
+    max_size=QUERY_EMBEDDING_CACHE_SIZE, ttl_seconds=QUERY_EMBEDDING_CACHE_TTL_SECONDS
+)
+_QUERY_EMBEDDING_CACHE_MODEL_ID: int | None = None
+
 
 def _log_top_chunk_links(search_flow: str, chunks: list[InferenceChunk]) -> None:
     top_links = [
@@ -131,6 +143,44 @@ def combine_retrieval_results(
     return sorted_chunks
 
 
+def embed_query(query: str, db_embedding_model: DbEmbeddingModel) -> list[float]:
+    """Embeds the query with the current embedding model, repeated queries are served from
+    an in-process cache which is reset whenever the current embedding model changes"""
+    global _QUERY_EMBEDDING_CACHE_MODEL_ID
+    if _QUERY_EMBEDDING_CACHE_MODEL_ID != db_embedding_model.id:
+        _QUERY_EMBEDDING_CACHE.clear()
+        _QUERY_EMBEDDING_CACHE_MODEL_ID = db_embedding_model.id
+
+    # Queries differing only in whitespace share an entry, so they must get the same embedding
+    normalized_query = " ".join(query.split())
+    cache_key = (
+        db_embedding_model.id,
+        db_embedding_model.model_name,
+        db_embedding_model.normalize,
+        db_embedding_model.query_prefix or "",
+        normalized_query,
+    )
+    cached_embedding = _QUERY_EMBEDDING_CACHE.get(cache_key)
+    if cached_embedding is not None:
+        return cached_embedding
+
+    model = EmbeddingModel(
+        model_name=db_embedding_model.model_name,
+        query_prefix=db_embedding_model.query_prefix,
+        passage_prefix=db_embedding_model.passage_prefix,
+        normalize=db_embedding_model.normalize,
+        # The below are globally set, this flow always uses the indexing one
+        server_host=MODEL_SERVER_HOST,
+        server_port=MODEL_SERVER_PORT,
+    )
+
+    query_embedding = model.encode([normalized_query], text_type=EmbedTextType.QUERY)[
+        0
+    ].tolist()
+    _QUERY_EMBEDDING_CACHE.set(cache_key, query_embedding)
+    return query_embedding
+
+
 @log_function_time(print_only=True)
 def doc_index_retrieval(
     query: SearchQuery,
@@ -147,19 +197,10 @@ def doc_index_retrieval(
         )
     else:
         db_embedding_model = get_current_db_embedding_model(db_session)
-
-        model = EmbeddingModel(
-            model_name=db_embedding_model.model_name,
-            query_prefix=db_embedding_model.query_prefix,
-            passage_prefix=db_embedding_model.passage_prefix,
-            normalize=db_embedding_model.normalize,
-            # The below are globally set, this flow always uses the indexing one
-            server_host=MODEL_SERVER_HOST,
-            server_port=MODEL_SERVER_PORT,
+        query_embedding = embed_query(
+            query=query.query, db_embedding_model=db_embedding_model
         )
 
-        query_embedding = model.encode([query.query], text_type=EmbedTextType.QUERY)[0]
-
         if query.search_type == SearchType.SEMANTIC:
             top_chunks = document_index.semantic_retrieval(
                 query=query.query,
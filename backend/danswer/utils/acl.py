@@ -49,10 +49,14 @@ def set_acl_for_vespa(should_check_if_already_done: bool = False) -> None:
         if not isinstance(vespa_index, VespaIndex):
             raise ValueError("This script is only for Vespa indexes")
 
+        document_chunk_counts = {
+            document.id: document.chunk_counts or {} for document in documents
+        }
         update_requests = [
             UpdateRequest(
                 document_ids=[document_id],
                 access=DocumentAccess.build(user_ids, is_public),
+                chunk_counts={document_id: document_chunk_counts.get(document_id, {})},
             )
             for document_id, user_ids, is_public in document_access_info
         ]
@@ -0,0 +1,148 @@
+import queue
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Hashable
+from concurrent.futures import Future
+from typing import Generic
+from typing import TypeVar
+
+from danswer.configs.model_configs import MODEL_SERVER_BATCH_WAIT_MS
+from danswer.configs.model_configs import MODEL_SERVER_MAX_BATCH_SIZE
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _BatchRequest(Generic[T, R]):
+    def __init__(self, items: list[T]) -> None:
+        self.items = items
+        self.future: Future[list[R]] = Future()
+
+
+class DynamicBatcher(Generic[T, R]):
+    """Coalesces the items of concurrent requests into a single call of `process_batch`.
+
+    A worker thread waits up to `max_wait_ms` after the first pending request for more
+    requests to arrive (or until `max_batch_size` items are collected), runs one forward
+    pass over all of the items and scatters the results back to the callers. If the batch
+    fails, its requests are run again one by one so only the failing ones get the error.
+    Requests that are already at least `max_batch_size` items are run directly in the
+    calling thread as there is nothing to gain from batching them."""
+
+    def __init__(
+        self,
+        name: str,
+        process_batch: Callable[[list[T]], list[R]],
+        max_batch_size: int = MODEL_SERVER_MAX_BATCH_SIZE,
+        max_wait_ms: float = MODEL_SERVER_BATCH_WAIT_MS,
+    ) -> None:
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+
+        self._queue: queue.Queue[_BatchRequest[T, R]] = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._worker_lock = threading.Lock()
+
+    def submit(self, items: list[T]) -> list[R]:
+        if not items or self.max_wait_seconds <= 0 or len(items) >= self.max_batch_size:
+            return self.process_batch(items)
+
+        self._ensure_worker()
+        request: _BatchRequest[T, R] = _BatchRequest(items)
+        self._queue.put(request)
+        return request.future.result()
+
+    def _ensure_worker(self) -> None:
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"dynamic-batcher-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def _collect_batch(
+        self, carry_over: _BatchRequest[T, R] | None
+    ) -> tuple[list[_BatchRequest[T, R]], _BatchRequest[T, R] | None]:
+        """Returns the requests for the next batch along with a request that did not fit
+        in it, which is then used to start the following batch"""
+        first_request = carry_over or self._queue.get()
+        batch = [first_request]
+        num_items = len(first_request.items)
+
+        deadline = time.monotonic() + self.max_wait_seconds
+        while num_items < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            if num_items + len(request.items) > self.max_batch_size:
+                return batch, request
+
+            batch.append(request)
+            num_items += len(request.items)
+
+        return batch, None
+
+    def _run_requests_separately(self, requests: list[_BatchRequest[T, R]]) -> None:
+        for request in requests:
+            try:
+                request.future.set_result(self.process_batch(request.items))
+            except Exception as e:
+                request.future.set_exception(e)
+
+    def _run(self) -> None:
+        carry_over: _BatchRequest[T, R] | None = None
+        while True:
+            batch, carry_over = self._collect_batch(carry_over)
+            all_items = [item for request in batch for item in request.items]
+
+            try:
+                results = self.process_batch(all_items)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].future.set_exception(e)
+                else:
+                    # One bad input must not fail the other requests it was batched with
+                    logger.warning(
+                        f"Batch of {len(batch)} requests failed for {self.name}, "
+                        f"retrying them one by one: {e}"
+                    )
+                    self._run_requests_separately(batch)
+                continue
+
+            if len(batch) > 1:
+                logger.debug(
+                    f"Batched {len(batch)} requests with {len(all_items)} items "
+                    f"for {self.name}"
+                )
+
+            start_ind = 0
+            for request in batch:
+                end_ind = start_ind + len(request.items)
+                request.future.set_result(results[start_ind:end_ind])
+                start_ind = end_ind
+
+
+_BATCHERS: dict[Hashable, DynamicBatcher] = {}
+_BATCHERS_LOCK = threading.Lock()
+
+
+def get_dynamic_batcher(
+    key: Hashable, process_batch: Callable[[list[T]], list[R]]
+) -> DynamicBatcher[T, R]:
+    """One batcher (and so one worker thread) per key, e.g. per model, `process_batch` is
+    only used the first time the batcher for the key is requested"""
+    with _BATCHERS_LOCK:
+        if key not in _BATCHERS:
+            _BATCHERS[key] = DynamicBatcher(name=str(key), process_batch=process_batch)
+        return _BATCHERS[key]
@@ -1,19 +1,33 @@
+from functools import partial
 from typing import TYPE_CHECKING
 
+import numpy as np
 from fastapi import APIRouter
+from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Response
 
 from danswer.configs.model_configs import CROSS_ENCODER_MODEL_ENSEMBLE
 from danswer.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
+from danswer.configs.model_configs import ONNX_MODEL_NAMES
 from danswer.search.search_nlp_models import get_local_reranking_model_ensemble
 from danswer.utils.logger import setup_logger
 from danswer.utils.timing import log_function_time
+from model_server.dynamic_batching import get_dynamic_batcher
+from model_server.onnx_models import load_onnx_embedding_model
+from model_server.onnx_models import load_onnx_reranking_model
+from model_server.onnx_models import OnnxCrossEncoder
+from model_server.onnx_models import OnnxSentenceEncoder
+from shared_models.embedding_serialization import EMBEDDINGS_BINARY_CONTENT_TYPE
+from shared_models.embedding_serialization import get_requested_binary_dtype
+from shared_models.embedding_serialization import serialize_embeddings
 from shared_models.model_server_models import EmbedRequest
 from shared_models.model_server_models import EmbedResponse
 from shared_models.model_server_models import RerankRequest
 from shared_models.model_server_models import RerankResponse
 
 if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder  # type: ignore
     from sentence_transformers import SentenceTransformer  # type: ignore
 
 
@@ -23,13 +37,14 @@ WARM_UP_STRING = "Danswer is amazing"
 
 router = APIRouter(prefix="/encoder")
 
-_GLOBAL_MODELS_DICT: dict[str, "SentenceTransformer"] = {}
+_GLOBAL_MODELS_DICT: dict[str, "SentenceTransformer | OnnxSentenceEncoder"] = {}
+_ONNX_RERANK_MODELS: dict[str, "CrossEncoder | OnnxCrossEncoder"] = {}
 
 
 def get_embedding_model(
     model_name: str,
     max_context_length: int = DOC_EMBEDDING_CONTEXT_SIZE,
-) -> "SentenceTransformer":
+) -> "SentenceTransformer | OnnxSentenceEncoder":
     from sentence_transformers import SentenceTransformer  # type: ignore
 
     global _GLOBAL_MODELS_DICT  # A dictionary to store models
@@ -41,6 +56,8 @@ def get_embedding_model(
         logger.info(f"Loading {model_name}")
         model = SentenceTransformer(model_name)
         model.max_seq_length = max_context_length
+        if model_name in ONNX_MODEL_NAMES:
+            model = load_onnx_embedding_model(model, model_name)
         _GLOBAL_MODELS_DICT[model_name] = model
     elif max_context_length != _GLOBAL_MODELS_DICT[model_name].max_seq_length:
         _GLOBAL_MODELS_DICT[model_name].max_seq_length = max_context_length
@@ -48,40 +65,99 @@ def get_embedding_model(
     return _GLOBAL_MODELS_DICT[model_name]
 
 
-@log_function_time(print_only=True)
-def embed_text(
+def _embed_text_batch(
     texts: list[str], model_name: str, normalize_embeddings: bool
-) -> list[list[float]]:
+) -> list[np.ndarray]:
     model = get_embedding_model(model_name=model_name)
     embeddings = model.encode(texts, normalize_embeddings=normalize_embeddings)
 
-    if not isinstance(embeddings, list):
-        embeddings = embeddings.tolist()
+    # Rows are views into the one matrix, scattering them back to the requests is free
+    return list(np.asarray(embeddings, dtype=np.float32))
 
-    return embeddings
+
+@log_function_time(print_only=True)
+def embed_text(
+    texts: list[str], model_name: str, normalize_embeddings: bool
+) -> np.ndarray:
+    batcher = get_dynamic_batcher(
+        key=("bi-encoder", model_name, normalize_embeddings),
+        process_batch=partial(
+            _embed_text_batch,
+            model_name=model_name,
+            normalize_embeddings=normalize_embeddings,
+        ),
+    )
+    embeddings = batcher.submit(texts)
+    if not embeddings:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack(embeddings)
+
+
+def get_reranking_model_ensemble() -> list["CrossEncoder | OnnxCrossEncoder"]:
+    """The reranking ensemble with the models configured via ONNX_MODEL_NAMES swapped for
+    their ONNX Runtime version"""
+    cross_encoders: list["CrossEncoder | OnnxCrossEncoder"] = []
+    for model_name, cross_encoder in zip(
+        CROSS_ENCODER_MODEL_ENSEMBLE, get_local_reranking_model_ensemble()
+    ):
+        if model_name not in ONNX_MODEL_NAMES:
+            cross_encoders.append(cross_encoder)
+            continue
+
+        if model_name not in _ONNX_RERANK_MODELS:
+            _ONNX_RERANK_MODELS[model_name] = load_onnx_reranking_model(
+                cross_encoder, model_name
+            )
+        cross_encoders.append(_ONNX_RERANK_MODELS[model_name])
+
+    return cross_encoders
+
+
+def _calc_sim_scores_batch(pairs: list[tuple[str, str]]) -> list[list[float]]:
+    """Returns the scores of each pair, one score per cross encoder of the ensemble"""
+    cross_encoders = get_reranking_model_ensemble()
+    ensemble_scores = [
+        encoder.predict(pairs).tolist() for encoder in cross_encoders  # type: ignore
+    ]
+    return [list(pair_scores) for pair_scores in zip(*ensemble_scores)]
 
 
 @log_function_time(print_only=True)
 def calc_sim_scores(query: str, docs: list[str]) -> list[list[float]]:
-    cross_encoders = get_local_reranking_model_ensemble()
-    sim_scores = [
-        encoder.predict([(query, doc) for doc in docs]).tolist()  # type: ignore
-        for encoder in cross_encoders
-    ]
-    return sim_scores
+    batcher = get_dynamic_batcher(
+        key=("cross-encoder", *CROSS_ENCODER_MODEL_ENSEMBLE),
+        process_batch=_calc_sim_scores_batch,
+    )
+    pair_scores = batcher.submit([(query, doc) for doc in docs])
+    if not pair_scores:
+        return [[] for _ in CROSS_ENCODER_MODEL_ENSEMBLE]
+
+    # Response is expected as one list of scores per cross encoder
+    return [list(encoder_scores) for encoder_scores in zip(*pair_scores)]
 
 
-@router.post("/bi-encoder-embed")
+@router.post("/bi-encoder-embed", response_model=EmbedResponse)
 def process_embed_request(
     embed_request: EmbedRequest,
-) -> EmbedResponse:
+    accept: str | None = Header(default=None),
+) -> EmbedResponse | Response:
+    """Responds with JSON by default, clients that accept the binary embedding content type
+    get the raw embedding matrix instead, which is much cheaper to encode and decode"""
     try:
         embeddings = embed_text(
             texts=embed_request.texts,
             model_name=embed_request.model_name,
             normalize_embeddings=embed_request.normalize_embeddings,
         )
-        return EmbedResponse(embeddings=embeddings)
+
+        binary_dtype = get_requested_binary_dtype(accept)
+        if binary_dtype:
+            return Response(
+                content=serialize_embeddings(embeddings, dtype=binary_dtype),
+                media_type=EMBEDDINGS_BINARY_CONTENT_TYPE,
+            )
+
+        return EmbedResponse(embeddings=embeddings.tolist())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -100,7 +176,7 @@ def process_rerank_request(embed_request: RerankRequest) -> RerankResponse:
 def warm_up_cross_encoders() -> None:
     logger.info(f"Warming up Cross-Encoders: {CROSS_ENCODER_MODEL_ENSEMBLE}")
 
-    cross_encoders = get_local_reranking_model_ensemble()
+    cross_encoders = get_reranking_model_ensemble()
     [
         cross_encoder.predict((WARM_UP_STRING, WARM_UP_STRING))
         for cross_encoder in cross_encoders
@@ -0,0 +1,342 @@
+import os
+from collections.abc import Callable
+from typing import Any
+from typing import TYPE_CHECKING
+
+import numpy as np
+from filelock import FileLock
+
+from danswer.configs.model_configs import ONNX_MODEL_CACHE_DIR
+from danswer.configs.model_configs import ONNX_PARITY_MIN_SIMILARITY
+from danswer.configs.model_configs import ONNX_QUANTIZE
+from danswer.search.search_nlp_models import clean_model_name
+from danswer.utils.logger import setup_logger
+
+if TYPE_CHECKING:
+    from onnxruntime import InferenceSession  # type: ignore
+    from sentence_transformers import CrossEncoder  # type: ignore
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
+
+logger = setup_logger()
+
+_ONNX_OPSET_VERSION = 14
+_ONNX_BATCH_SIZE = 32
+# Exporting a large model can take several minutes
+_BUILD_LOCK_TIMEOUT_SECONDS = 30 * 60
+
+_PARITY_CHECK_TEXTS = [
+    "Danswer is amazing",
+    "How do I reset my password?",
+    "The quarterly report shows revenue growth in all regions except for EMEA.",
+    "Deploy the model server on a CPU only node with at least 4 cores.",
+]
+
+
+class UnsupportedOnnxModelError(ValueError):
+    pass
+
+
+def _get_onnx_model_path(model_name: str, quantize: bool) -> str:
+    file_name = "model_quantized.onnx" if quantize else "model.onnx"
+    return os.path.join(ONNX_MODEL_CACHE_DIR, clean_model_name(model_name), file_name)
+
+
+def _build_file_once(path: str, build: Callable[[str], None]) -> None:
+    """Builds the file at `path` unless it already exists. `build` writes to the temp path it
+    is given, which is only moved into place once complete so a failed build is never picked
+    up as cached. Concurrent loads of the same model, from threads or from other model server
+    processes, wait on a file lock for the first one to finish instead of racing on the temp
+    path"""
+    if os.path.exists(path):
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with FileLock(path + ".lock").acquire(timeout=_BUILD_LOCK_TIMEOUT_SECONDS):
+        if os.path.exists(path):
+            return
+
+        tmp_path = path + ".tmp"
+        build(tmp_path)
+        os.replace(tmp_path, path)
+
+
+def _export_to_onnx(
+    model: Any,
+    tokenizer: Any,
+    output_name: str,
+    output_has_sequence_axis: bool,
+    model_name: str,
+    quantize: bool,
+) -> str:
+    """Exports the Hugging Face model (optionally with dynamic int8 quantization of the
+    weights) unless it's already cached on disk, returns the path of the ONNX model"""
+    import torch
+    from onnxruntime.quantization import quantize_dynamic  # type: ignore
+    from onnxruntime.quantization import QuantType
+
+    model_path = _get_onnx_model_path(model_name, quantize)
+    full_precision_path = _get_onnx_model_path(model_name, quantize=False)
+
+    def _export(output_path: str) -> None:
+        logger.info(f"Exporting {model_name} to ONNX")
+        input_names = list(tokenizer.model_input_names)
+
+        class _PositionalInputsModel(torch.nn.Module):
+            def __init__(self) -> None:
+                super().__init__()
+                self.model = model
+
+            def forward(self, *inputs: torch.Tensor) -> torch.Tensor:
+                return self.model(**dict(zip(input_names, inputs)))[0]
+
+        sample_inputs = tokenizer(
+            _PARITY_CHECK_TEXTS[:2], padding=True, return_tensors="pt"
+        )
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes[output_name] = (
+            {0: "batch", 1: "sequence"} if output_has_sequence_axis else {0: "batch"}
+        )
+
+        with torch.no_grad():
+            torch.onnx.export(
+                _PositionalInputsModel().eval(),
+                tuple(sample_inputs[name] for name in input_names),
+                output_path,
+                input_names=input_names,
+                output_names=[output_name],
+                dynamic_axes=dynamic_axes,
+                opset_version=_ONNX_OPSET_VERSION,
+            )
+
+    def _quantize(output_path: str) -> None:
+        logger.info(f"Quantizing the ONNX model of {model_name}")
+        quantize_dynamic(full_precision_path, output_path, weight_type=QuantType.QInt8)
+
+    _build_file_once(full_precision_path, _export)
+    if quantize:
+        _build_file_once(model_path, _quantize)
+
+    return model_path
+
+
+def _load_session(model_path: str) -> "InferenceSession":
+    from onnxruntime import InferenceSession
+    from onnxruntime import SessionOptions
+
+    options = SessionOptions()
+    return InferenceSession(
+        model_path, sess_options=options, providers=["CPUExecutionProvider"]
+    )
+
+
+def _run_session(
+    session: "InferenceSession", encoded_inputs: dict[str, np.ndarray]
+) -> np.ndarray:
+    session_input_names = {session_input.name for session_input in session.get_inputs()}
+    feed = {
+        name: value.astype(np.int64)
+        for name, value in encoded_inputs.items()
+        if name in session_input_names
+    }
+    return session.run(None, feed)[0]
+
+
+class OnnxSentenceEncoder:
+    """Drop in replacement for the `encode` of a SentenceTransformer made of a Transformer,
+    a CLS or mean Pooling and optionally a Normalize module"""
+
+    def __init__(self, model: "SentenceTransformer", model_name: str) -> None:
+        from sentence_transformers.models import Normalize  # type: ignore
+        from sentence_transformers.models import Pooling
+        from sentence_transformers.models import Transformer
+
+        modules = list(model._modules.values())
+        if (
+            len(modules) not in (2, 3)
+            or not isinstance(modules[0], Transformer)
+            or not isinstance(modules[1], Pooling)
+            or (len(modules) == 3 and not isinstance(modules[2], Normalize))
+        ):
+            raise UnsupportedOnnxModelError(
+                f"Unsupported module layout for {model_name}: {modules}"
+            )
+
+        pooling = modules[1]
+        if pooling.pooling_mode_cls_token:
+            self.pooling_mode = "cls"
+        elif pooling.pooling_mode_mean_tokens:
+            self.pooling_mode = "mean"
+        else:
+            raise UnsupportedOnnxModelError(
+                f"Unsupported pooling for {model_name}: {pooling.get_pooling_mode_str()}"
+            )
+
+        self.model_name = model_name
+        self.always_normalize = len(modules) == 3
+        self.max_seq_length = model.max_seq_length
+        self.tokenizer = model.tokenizer
+        self.session = _load_session(
+            _export_to_onnx(
+                model=modules[0].auto_model,
+                tokenizer=self.tokenizer,
+                output_name="last_hidden_state",
+                output_has_sequence_axis=True,
+                model_name=model_name,
+                quantize=ONNX_QUANTIZE,
+            )
+        )
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encoded_inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation="longest_first",
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        hidden_states = _run_session(self.session, dict(encoded_inputs))
+
+        if self.pooling_mode == "cls":
+            return hidden_states[:, 0]
+
+        attention_mask = encoded_inputs["attention_mask"][..., None].astype(np.float32)
+        summed = (hidden_states * attention_mask).sum(axis=1)
+        return summed / np.clip(attention_mask.sum(axis=1), 1e-9, None)
+
+    def encode(
+        self, texts: list[str], normalize_embeddings: bool = False
+    ) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # Same as SentenceTransformers, sorting by length minimizes padding within batches
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.empty(len(texts), dtype=object)
+        for start_ind in range(0, len(texts), _ONNX_BATCH_SIZE):
+            batch_inds = order[start_ind : start_ind + _ONNX_BATCH_SIZE]
+            batch_embeddings = self._encode_batch([texts[ind] for ind in batch_inds])
+            for ind, embedding in zip(batch_inds, batch_embeddings):
+                embeddings[ind] = embedding
+
+        matrix = np.stack(list(embeddings)).astype(np.float32)
+        if normalize_embeddings or self.always_normalize:
+            matrix /= np.clip(
+                np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None
+            )
+        return matrix
+
+
+class OnnxCrossEncoder:
+    """Drop in replacement for the `predict` of a sentence-transformers CrossEncoder"""
+
+    def __init__(self, model: "CrossEncoder", model_name: str) -> None:
+        self.model_name = model_name
+        self.max_length = model.max_length
+        self.tokenizer = model.tokenizer
+        self.num_labels = model.config.num_labels
+        self.activation_fct = model.default_activation_function
+        self.session = _load_session(
+            _export_to_onnx(
+                model=model.model,
+                tokenizer=self.tokenizer,
+                output_name="logits",
+                output_has_sequence_axis=False,
+                model_name=model_name,
+                quantize=ONNX_QUANTIZE,
+            )
+        )
+
+    def predict(self, pairs: list[tuple[str, str]] | tuple[str, str]) -> np.ndarray:
+        import torch
+
+        single_pair = isinstance(pairs, tuple)
+        pair_list: list[tuple[str, str]] = [pairs] if single_pair else pairs  # type: ignore
+        if not pair_list:
+            return np.empty(0, dtype=np.float32)
+
+        all_scores = []
+        for start_ind in range(0, len(pair_list), _ONNX_BATCH_SIZE):
+            batch = pair_list[start_ind : start_ind + _ONNX_BATCH_SIZE]
+            encoded_inputs = self.tokenizer(
+                [query for query, _ in batch],
+                [doc for _, doc in batch],
+                padding=True,
+                truncation="longest_first",
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            logits = _run_session(self.session, dict(encoded_inputs))
+            scores = self.activation_fct(torch.from_numpy(logits)).numpy()
+            all_scores.append(scores[:, 0] if self.num_labels == 1 else scores)
+
+        predictions = np.concatenate(all_scores)
+        return predictions[0] if single_pair else predictions
+
+
+def _min_cosine_similarity(reference: np.ndarray, candidate: np.ndarray) -> float:
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return float((reference * candidate).sum(axis=1).min())
+
+
+def load_onnx_embedding_model(
+    model: "SentenceTransformer", model_name: str
+) -> "OnnxSentenceEncoder | SentenceTransformer":
+    """Returns the ONNX version of the model if it can be exported and agrees with the PyTorch
+    model on the sample texts, otherwise logs why and falls back to the PyTorch model"""
+    try:
+        onnx_model = OnnxSentenceEncoder(model, model_name)
+        similarity = _min_cosine_similarity(
+            np.asarray(model.encode(_PARITY_CHECK_TEXTS)),
+            onnx_model.encode(_PARITY_CHECK_TEXTS),
+        )
+    except Exception as e:
+        logger.exception(f"Failed to load ONNX model for {model_name}: {e}")
+        return model
+
+    if similarity < ONNX_PARITY_MIN_SIMILARITY:
+        logger.error(
+            f"ONNX model for {model_name} failed the parity check, min cosine similarity "
+            f"{similarity:.4f} < {ONNX_PARITY_MIN_SIMILARITY}. Falling back to PyTorch."
+        )
+        return model
+
+    logger.info(
+        f"Using ONNX for {model_name}, parity check similarity {similarity:.4f}"
+    )
+    return onnx_model
+
+
+def load_onnx_reranking_model(
+    model: "CrossEncoder", model_name: str
+) -> "OnnxCrossEncoder | CrossEncoder":
+    """Same as `load_onnx_embedding_model`, the parity check is done on the correlation of
+    the scores of every pair of the sample texts as only the ranking order matters"""
+    pairs = [
+        (query, doc) for query in _PARITY_CHECK_TEXTS for doc in _PARITY_CHECK_TEXTS
+    ]
+    try:
+        onnx_model = OnnxCrossEncoder(model, model_name)
+        correlation = float(
+            np.corrcoef(
+                np.asarray(model.predict(pairs)).ravel(),
+                onnx_model.predict(pairs).ravel(),
+            )[0, 1]
+        )
+    except Exception as e:
+        logger.exception(f"Failed to load ONNX model for {model_name}: {e}")
+        return model
+
+    # NaN if either model returns constant scores, treated as a failure as well
+    if not correlation >= ONNX_PARITY_MIN_SIMILARITY:
+        logger.error(
+            f"ONNX model for {model_name} failed the parity check, score correlation "
+            f"{correlation:.4f} < {ONNX_PARITY_MIN_SIMILARITY}. Falling back to PyTorch."
+        )
+        return model
+
+    logger.info(
+        f"Using ONNX for {model_name}, parity check correlation {correlation:.4f}"
+    )
+    return onnx_model
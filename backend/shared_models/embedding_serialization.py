@@ -0,0 +1,78 @@
+"""Compact binary encoding of embeddings exchanged between the model server and the backend.
+
+Layout (all little-endian): a 16 byte header of magic (4 bytes), format version (uint8),
+dtype code (uint8), 2 padding bytes, number of embeddings (uint32) and embedding dimension
+(uint32), followed by the row-major embedding matrix."""
+import struct
+
+import numpy as np
+
+EMBEDDINGS_BINARY_CONTENT_TYPE = "application/x-danswer-embeddings"
+
+_MAGIC = b"DEMB"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBBxxII")
+_DTYPE_CODES: dict[str, int] = {"float32": 0, "float16": 1}
+_CODE_TO_DTYPE = {
+    code: np.dtype(name).newbyteorder("<") for name, code in _DTYPE_CODES.items()
+}
+
+
+def get_requested_binary_dtype(accept_header: str | None) -> str | None:
+    """Returns the dtype (float32 unless specified otherwise) if the client accepts the
+    binary format, e.g. `application/x-danswer-embeddings; dtype=float16`, otherwise None
+    """
+    if not accept_header:
+        return None
+
+    for media_range in accept_header.split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if media_type != EMBEDDINGS_BINARY_CONTENT_TYPE:
+            continue
+
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "dtype" and value.strip() in _DTYPE_CODES:
+                return value.strip()
+        return "float32"
+
+    return None
+
+
+def build_binary_accept_header(dtype: str) -> str:
+    if dtype not in _DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    # JSON is still accepted so that older model servers keep working
+    return f"{EMBEDDINGS_BINARY_CONTENT_TYPE}; dtype={dtype}, application/json;q=0.5"
+
+
+def serialize_embeddings(embeddings: np.ndarray, dtype: str = "float32") -> bytes:
+    if embeddings.ndim != 2:
+        raise ValueError(f"Expected a 2D embedding matrix, got {embeddings.ndim}D")
+
+    dtype_code = _DTYPE_CODES[dtype]
+    matrix = np.ascontiguousarray(embeddings, dtype=_CODE_TO_DTYPE[dtype_code])
+    header = _HEADER.pack(_MAGIC, _VERSION, dtype_code, *matrix.shape)
+    return header + matrix.tobytes()
+
+
+def deserialize_embeddings(payload: bytes) -> np.ndarray:
+    """Returns a read-only view over the payload, no copy is made for float32"""
+    if len(payload) < _HEADER.size:
+        raise ValueError("Embedding payload is too short to contain a header")
+
+    magic, version, dtype_code, num_rows, dim = _HEADER.unpack_from(payload)
+    if magic != _MAGIC or version != _VERSION or dtype_code not in _CODE_TO_DTYPE:
+        raise ValueError("Unrecognized embedding payload header")
+
+    dtype = _CODE_TO_DTYPE[dtype_code]
+    expected_size = _HEADER.size + num_rows * dim * dtype.itemsize
+    if len(payload) != expected_size:
+        raise ValueError(
+            f"Embedding payload size mismatch, expected {expected_size} bytes "
+            f"but got {len(payload)}"
+        )
+
+    return np.frombuffer(payload, dtype=dtype, offset=_HEADER.size).reshape(
+        num_rows, dim
+    )
@@ -0,0 +1,241 @@
+"""Compares the output and speed of `chunk_document` against the previous implementation,
+which re-tokenized the chunk being built for every section and split every blurb from
+scratch. Both use the same text splitter so the chunks must be identical.
+Run from the backend directory:
+
+python -m tests.regression.chunking.benchmark_chunker --num-docs 200
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+from datetime import timezone
+
+from danswer.configs.app_configs import BLURB_SIZE
+from danswer.configs.app_configs import CHUNK_OVERLAP
+from danswer.configs.constants import DocumentSource
+from danswer.configs.constants import SECTION_SEPARATOR
+from danswer.configs.constants import TITLE_SEPARATOR
+from danswer.configs.model_configs import CHUNK_SIZE
+from danswer.connectors.models import Document
+from danswer.connectors.models import Section
+from danswer.indexing.chunker import chunk_document
+from danswer.indexing.chunker import chunk_large_section
+from danswer.indexing.models import DocAwareChunk
+from danswer.indexing.text_splitter import get_text_splitter
+from danswer.search.search_nlp_models import get_default_tokenizer
+from danswer.utils.text_processing import shared_precompare_cleanup
+
+_WORDS = (
+    "the quick brown fox jumps over lazy dog danswer connector index chunk embedding "
+    "vespa postgres query answer slack thread message deploy release bug fix résumé "
+    "naïve café 東京 数据 api_key user@example.com https://docs.danswer.dev/intro 42 3.14"
+).split()
+
+
+def _reference_extract_blurb(text: str, blurb_size: int) -> str:
+    blurb_splitter = get_text_splitter(
+        get_default_tokenizer(), chunk_size=blurb_size, chunk_overlap=0
+    )
+
+    split_texts = blurb_splitter.split_text(text)
+    return split_texts[0] if split_texts else ""
+
+
+def _reference_chunk_document(
+    document: Document,
+    chunk_tok_size: int = CHUNK_SIZE,
+    subsection_overlap: int = CHUNK_OVERLAP,
+    blurb_size: int = BLURB_SIZE,
+) -> list[DocAwareChunk]:
+    title = document.get_title_for_document_index()
+    title_prefix = title.replace("\n", " ") + TITLE_SEPARATOR if title else ""
+    tokenizer = get_default_tokenizer()
+
+    chunks: list[DocAwareChunk] = []
+    link_offsets: dict[int, str] = {}
+    chunk_text = ""
+    for ind, section in enumerate(document.sections):
+        section_text = title_prefix + section.text if ind == 0 else section.text
+        section_link_text = section.link or ""
+
+        section_tok_length = len(tokenizer.tokenize(section_text))
+        current_tok_length = len(tokenizer.tokenize(chunk_text))
+        curr_offset_len = len(shared_precompare_cleanup(chunk_text))
+
+        # Large sections are considered self-contained/unique therefore they start a new chunk and are not concatenated
+        # at the end by other sections
+        if section_tok_length > chunk_tok_size:
+            if chunk_text:
+                chunks.append(
+                    DocAwareChunk(
+                        source_document=document,
+                        chunk_id=len(chunks),
+                        blurb=_reference_extract_blurb(chunk_text, blurb_size),
+                        content=chunk_text,
+                        source_links=link_offsets,
+                        section_continuation=False,
+                    )
+                )
+                link_offsets = {}
+                chunk_text = ""
+
+            large_section_chunks = chunk_large_section(
+                section_text=section_text,
+                section_link_text=section_link_text,
+                document=document,
+                start_chunk_id=len(chunks),
+                tokenizer=tokenizer,
+                chunk_size=chunk_tok_size,
+                chunk_overlap=subsection_overlap,
+                blurb_size=blurb_size,
+            )
+            chunks.extend(large_section_chunks)
+            continue
+
+        # In the case where the whole section is shorter than a chunk, either adding to chunk or start a new one
+        if (
+            current_tok_length
+            + len(tokenizer.tokenize(SECTION_SEPARATOR))
+            + section_tok_length
+            <= chunk_tok_size
+        ):
+            chunk_text += (
+                SECTION_SEPARATOR + section_text if chunk_text else section_text
+            )
+            link_offsets[curr_offset_len] = section_link_text
+        else:
+            chunks.append(
+                DocAwareChunk(
+                    source_document=document,
+                    chunk_id=len(chunks),
+                    blurb=_reference_extract_blurb(chunk_text, blurb_size),
+                    content=chunk_text,
+                    source_links=link_offsets,
+                    section_continuation=False,
+                )
+            )
+            link_offsets = {0: section_link_text}
+            chunk_text = section_text
+
+    # Once we hit the end, if we're still in the process of building a chunk, add what we have
+    # NOTE: if it's just whitespace, ignore it.
+    if chunk_text.strip():
+        chunks.append(
+            DocAwareChunk(
+                source_document=document,
+                chunk_id=len(chunks),
+                blurb=_reference_extract_blurb(chunk_text, blurb_size),
+                content=chunk_text,
+                source_links=link_offsets,
+                section_continuation=False,
+            )
+        )
+    return chunks
+
+
+def _random_sentence(rng: random.Random, min_words: int, max_words: int) -> str:
+    words = rng.choices(_WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + rng.choice([".", "!", "?", ":", ""])
+
+
+def _random_text(rng: random.Random, num_sentences: int) -> str:
+    paragraphs = []
+    for _ in range(max(1, num_sentences // 5)):
+        paragraphs.append(
+            " ".join(_random_sentence(rng, 3, 25) for _ in range(rng.randint(1, 8)))
+        )
+    return "\n\n".join(paragraphs)
+
+
+def build_sample_corpus(num_docs: int, seed: int = 0) -> list[Document]:
+    """Mix of chat like documents with many tiny sections, wiki like documents with a few
+    medium sections and documents with sections larger than a chunk"""
+    rng = random.Random(seed)
+    docs = []
+    for doc_ind in range(num_docs):
+        doc_type = doc_ind % 3
+        if doc_type == 0:
+            sections = [
+                Section(
+                    text=_random_sentence(rng, 1, 30),
+                    link=f"https://chat.example.com/{doc_ind}/{ind}",
+                )
+                for ind in range(rng.randint(50, 2000))
+            ]
+        elif doc_type == 1:
+            sections = [
+                Section(text=_random_text(rng, rng.randint(1, 40)), link=None)
+                for _ in range(rng.randint(1, 30))
+            ]
+        else:
+            sections = [
+                Section(
+                    text=_random_text(rng, rng.randint(5, 400)),
+                    link=f"https://wiki.example.com/{doc_ind}#{ind}",
+                )
+                for ind in range(rng.randint(1, 10))
+            ]
+
+        docs.append(
+            Document(
+                id=f"doc_{doc_ind}",
+                sections=sections,
+                source=DocumentSource.WEB,
+                semantic_identifier=f"Sample document {doc_ind}",
+                title=None if doc_ind % 5 else "",
+                metadata={},
+                doc_updated_at=datetime.now(timezone.utc),
+            )
+        )
+    return docs
+
+
+def _chunk_fields(chunks: list[DocAwareChunk]) -> list[tuple]:
+    return [
+        (
+            chunk.chunk_id,
+            chunk.blurb,
+            chunk.content,
+            chunk.source_links,
+            chunk.section_continuation,
+        )
+        for chunk in chunks
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-docs", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    docs = build_sample_corpus(args.num_docs, args.seed)
+    # Load the tokenizer outside of the timed sections
+    get_default_tokenizer()
+
+    start = time.monotonic()
+    reference_chunks = [_reference_chunk_document(doc) for doc in docs]
+    reference_time = time.monotonic() - start
+
+    start = time.monotonic()
+    new_chunks = [chunk_document(doc) for doc in docs]
+    new_time = time.monotonic() - start
+
+    mismatches = [
+        doc.id
+        for doc, reference, new in zip(docs, reference_chunks, new_chunks)
+        if _chunk_fields(reference) != _chunk_fields(new)
+    ]
+
+    num_chunks = sum(len(chunks) for chunks in new_chunks)
+    print(f"Documents: {len(docs)}, chunks: {num_chunks}")
+    print(f"Previous chunker: {reference_time:.2f}s")
+    print(f"Current chunker: {new_time:.2f}s ({reference_time / new_time:.1f}x)")
+    if mismatches:
+        raise RuntimeError(f"Chunks differ for documents: {mismatches}")
+    print("Output is identical")
+
+
+if __name__ == "__main__":
+    main()
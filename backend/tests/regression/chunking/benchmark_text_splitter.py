@@ -0,0 +1,84 @@
+"""Compares `OffsetTextSplitter` against the llama_index `SentenceSplitter` it replaced, on the
+section texts of the sample corpus of `benchmark_chunker`. Sentence boundaries are found
+differently so the chunks are not identical, instead both are checked for staying within
+the token limit and keeping all of the text. Run from the backend directory:
+
+python -m tests.regression.chunking.benchmark_text_splitter --num-docs 200
+"""
+import argparse
+import time
+
+from llama_index.text_splitter import SentenceSplitter
+
+from danswer.configs.app_configs import CHUNK_OVERLAP
+from danswer.configs.model_configs import CHUNK_SIZE
+from danswer.indexing.text_splitter import OffsetTextSplitter
+from danswer.indexing.text_splitter import TextSplitter
+from danswer.search.search_nlp_models import get_default_tokenizer
+from tests.regression.chunking.benchmark_chunker import build_sample_corpus
+
+
+def _split_all(
+    splitter: TextSplitter, texts: list[str]
+) -> tuple[list[list[str]], float]:
+    start = time.monotonic()
+    splits = [splitter.split_text(text) for text in texts]
+    return splits, time.monotonic() - start
+
+
+def _check_splits(
+    name: str, texts: list[str], splits: list[list[str]], chunk_size: int
+) -> None:
+    tokenizer = get_default_tokenizer()
+    num_chunks = sum(len(chunks) for chunks in splits)
+    max_tokens = max(
+        len(tokenizer.tokenize(chunk)) for chunks in splits for chunk in chunks
+    )
+    # Only checked without overlap, where the chunks put together are the whole text
+    lost_text = [
+        ind
+        for ind, (text, chunks) in enumerate(zip(texts, splits))
+        if "".join(text.split()) != "".join("".join(chunks).split())
+    ]
+    print(
+        f"{name}: {num_chunks} chunks, largest is {max_tokens} tokens (limit "
+        f"{chunk_size}), text lost in {len(lost_text)} of {len(texts)} texts"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-docs", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    docs = build_sample_corpus(args.num_docs, args.seed)
+    texts = [section.text for doc in docs for section in doc.sections]
+    tokenizer = get_default_tokenizer()
+
+    for chunk_overlap in sorted({0, CHUNK_OVERLAP}):
+        sentence_splitter = SentenceSplitter(
+            tokenizer=tokenizer.tokenize,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=chunk_overlap,
+        )
+        offset_splitter = OffsetTextSplitter(
+            tokenizer=tokenizer, chunk_size=CHUNK_SIZE, chunk_overlap=chunk_overlap
+        )
+
+        sentence_splits, sentence_time = _split_all(sentence_splitter, texts)
+        offset_splits, offset_time = _split_all(offset_splitter, texts)
+
+        print(f"Texts: {len(texts)}, overlap: {chunk_overlap} tokens")
+        print(f"SentenceSplitter: {sentence_time:.2f}s")
+        print(
+            f"OffsetTextSplitter: {offset_time:.2f}s "
+            f"({sentence_time / offset_time:.1f}x)"
+        )
+        if not chunk_overlap:
+            _check_splits("SentenceSplitter", texts, sentence_splits, CHUNK_SIZE)
+            _check_splits("OffsetTextSplitter", texts, offset_splits, CHUNK_SIZE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import unittest
+from collections.abc import Iterator
+
+from danswer.background.indexing.checkpointing import ConnectorCheckpointTracker
+from danswer.configs.constants import DocumentSource
+from danswer.connectors.interfaces import ConnectorCheckpoint
+from danswer.connectors.models import Document
+from danswer.connectors.models import Section
+from danswer.indexing.document_batching import rebatch_documents
+
+
+def _make_doc(doc_id: str, num_chars: int = 40) -> Document:
+    return Document(
+        id=doc_id,
+        sections=[Section(text="a" * num_chars, link=None)],
+        source=DocumentSource.GOOGLE_DRIVE,
+        semantic_identifier="",
+        title="",
+        metadata={},
+    )
+
+
+def _connector_batches(
+    batch_sizes: list[int], checkpoint_every: int = 1
+) -> Iterator[tuple[list[Document], ConnectorCheckpoint | None]]:
+    num_docs = 0
+    for batch_ind, batch_size in enumerate(batch_sizes):
+        batch = [_make_doc(f"doc_{num_docs + i}") for i in range(batch_size)]
+        num_docs += batch_size
+        checkpoint = (
+            {"batch": batch_ind} if (batch_ind + 1) % checkpoint_every == 0 else None
+        )
+        yield batch, checkpoint
+
+
+class TestConnectorCheckpointTracker(unittest.TestCase):
+    def test_checkpoints_wait_for_their_documents(self) -> None:
+        tracker = ConnectorCheckpointTracker()
+        # Tracking is lazy, documents are only counted as they are loaded
+        batches = tracker.track(_connector_batches([3, 2, 4]))
+
+        self.assertEqual(len(next(batches)), 3)
+        self.assertIsNone(tracker.pop_committable(2))
+        self.assertEqual(tracker.pop_committable(3), {"batch": 0})
+
+        self.assertEqual(len(next(batches)), 2)
+        self.assertEqual(len(next(batches)), 4)
+        # Only the latest of the checkpoints that are complete
+        self.assertEqual(tracker.pop_committable(9), {"batch": 2})
+        self.assertIsNone(tracker.pop_committable(9))
+
+    def test_batches_without_checkpoints(self) -> None:
+        tracker = ConnectorCheckpointTracker()
+        batches = list(tracker.track(_connector_batches([2, 2, 2], checkpoint_every=2)))
+
+        self.assertEqual(len(batches), 3)
+        self.assertIsNone(tracker.pop_committable(2))
+        self.assertEqual(tracker.pop_committable(6), {"batch": 1})
+
+    def test_commit_order_across_rebatched_batches(self) -> None:
+        """Mimics the indexing loop, connector batches are merged and split before being
+        indexed and come out of the pipeline in order. A checkpoint must never be
+        committed before all of the documents loaded before it are indexed"""
+        batch_sizes = [1, 7, 2, 2, 9, 1, 3]
+        tracker = ConnectorCheckpointTracker()
+        loaded_doc_ids: list[list[str]] = []
+
+        def _record(
+            doc_batches: Iterator[list[Document]],
+        ) -> Iterator[list[Document]]:
+            for doc_batch in doc_batches:
+                loaded_doc_ids.append([doc.id for doc in doc_batch])
+                yield doc_batch
+
+        indexed_doc_ids: set[str] = set()
+        committed: list[ConnectorCheckpoint] = []
+        for doc_batch in rebatch_documents(
+            _record(tracker.track(_connector_batches(batch_sizes))),
+            token_budget=30,
+            max_docs=4,
+        ):
+            indexed_doc_ids.update(doc.id for doc in doc_batch)
+            checkpoint = tracker.pop_committable(len(indexed_doc_ids))
+            if checkpoint is None:
+                continue
+            committed.append(checkpoint)
+            # Every document of the connector batches up to the checkpoint is indexed
+            for doc_ids in loaded_doc_ids[: checkpoint["batch"] + 1]:
+                self.assertTrue(indexed_doc_ids.issuperset(doc_ids))
+
+        self.assertEqual(committed, sorted(committed, key=lambda c: c["batch"]))
+        self.assertEqual(committed[-1], {"batch": len(batch_sizes) - 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import random
+import threading
+import time
+import unittest
+
+from danswer.connectors.cross_connector_utils.concurrent_fetch import (
+    fetch_concurrently,
+)
+from danswer.connectors.cross_connector_utils.rate_limit_wrapper import (
+    rate_limit_builder,
+)
+from danswer.connectors.cross_connector_utils.retry_wrapper import retry_builder
+
+
+class TestFetchConcurrently(unittest.TestCase):
+    def test_results_are_in_item_order(self) -> None:
+        def fetch(item: int) -> int:
+            # Later items finish first
+            time.sleep(random.uniform(0, 0.02))
+            return item * 2
+
+        items = list(range(40))
+        self.assertEqual(
+            fetch_concurrently(fetch, items, max_workers=8), [i * 2 for i in items]
+        )
+        self.assertEqual(
+            fetch_concurrently(fetch, items, max_workers=1), [i * 2 for i in items]
+        )
+        self.assertEqual(fetch_concurrently(fetch, [], max_workers=8), [])
+
+    def test_calls_run_concurrently(self) -> None:
+        barrier = threading.Barrier(4, timeout=5)
+
+        def fetch(item: int) -> int:
+            # Only passes if all 4 calls are in flight at once
+            barrier.wait()
+            return item
+
+        self.assertEqual(
+            fetch_concurrently(fetch, range(4), max_workers=4), [0, 1, 2, 3]
+        )
+
+    def test_first_error_is_raised(self) -> None:
+        def fetch(item: int) -> int:
+            if item == 3:
+                raise ValueError("item 3 failed")
+            return item
+
+        with self.assertRaisesRegex(ValueError, "item 3 failed"):
+            fetch_concurrently(fetch, range(10), max_workers=4)
+
+    def test_on_error_replaces_failed_items(self) -> None:
+        def fetch(item: int) -> int | None:
+            if item % 3 == 0:
+                raise ValueError(f"item {item} failed")
+            return item
+
+        errors: list[int] = []
+
+        def on_error(item: int, e: Exception) -> int | None:
+            errors.append(item)
+            return None
+
+        self.assertEqual(
+            fetch_concurrently(fetch, range(7), max_workers=4, on_error=on_error),
+            [None, 1, 2, None, 4, 5, None],
+        )
+        self.assertEqual(sorted(errors), [0, 3, 6])
+
+    def test_retries_before_giving_up(self) -> None:
+        attempts: dict[int, int] = {}
+        lock = threading.Lock()
+
+        def fetch(item: int) -> int:
+            with lock:
+                attempts[item] = attempts.get(item, 0) + 1
+                num_attempts = attempts[item]
+            if item % 2 and num_attempts < 3:
+                raise ConnectionError("flaky")
+            return item
+
+        results = fetch_concurrently(
+            fetch,
+            range(6),
+            max_workers=3,
+            retry_decorator=retry_builder(tries=3, delay=0, jitter=0),
+        )
+
+        self.assertEqual(results, list(range(6)))
+        self.assertEqual(attempts, {0: 1, 1: 3, 2: 1, 3: 3, 4: 1, 5: 3})
+
+    def test_shared_rate_limiter_across_workers(self) -> None:
+        call_times: list[float] = []
+        lock = threading.Lock()
+
+        def fetch(item: int) -> int:
+            with lock:
+                call_times.append(time.monotonic())
+            return item
+
+        limiter = rate_limit_builder(max_calls=3, period=0.5, sleep_time=0.1)
+        start = time.monotonic()
+        results = fetch_concurrently(
+            fetch, range(9), max_workers=9, rate_limiter=limiter
+        )
+
+        self.assertEqual(results, list(range(9)))
+        # Never more than 3 calls within a period, even with all the workers racing
+        call_times.sort()
+        for first, fourth in zip(call_times, call_times[3:]):
+            self.assertGreaterEqual(fourth - first, 0.5)
+        self.assertGreater(time.monotonic() - start, 1.0)
+
+
+class TestRetryBuilder(unittest.TestCase):
+    def test_retries_the_call(self) -> None:
+        attempts = 0
+
+        @retry_builder(tries=4, delay=0, jitter=0)
+        def func() -> str:
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise RuntimeError("flaky")
+            return "ok"
+
+        self.assertEqual(func(), "ok")
+        self.assertEqual(attempts, 3)
+
+    def test_gives_up_after_tries(self) -> None:
+        attempts = 0
+
+        @retry_builder(tries=2, delay=0, jitter=0)
+        def func() -> None:
+            nonlocal attempts
+            attempts += 1
+            raise RuntimeError("down")
+
+        with self.assertRaises(RuntimeError):
+            func()
+        self.assertEqual(attempts, 2)
+
+    def test_only_retries_given_exceptions(self) -> None:
+        attempts = 0
+
+        @retry_builder(tries=5, delay=0, jitter=0, exceptions=ConnectionError)
+        def func() -> None:
+            nonlocal attempts
+            attempts += 1
+            raise ValueError("not transient")
+
+        with self.assertRaises(ValueError):
+            func()
+        self.assertEqual(attempts, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
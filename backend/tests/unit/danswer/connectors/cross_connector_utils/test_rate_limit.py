@@ -1,9 +1,17 @@
 import time
 import unittest
 
+import requests
+
+from danswer.connectors.cross_connector_utils.rate_limit_wrapper import (
+    _InMemoryTokenBucketBackend,
+)
 from danswer.connectors.cross_connector_utils.rate_limit_wrapper import (
     rate_limit_builder,
 )
+from danswer.connectors.cross_connector_utils.rate_limit_wrapper import (
+    TokenBucketRateLimiter,
+)
 
 
 class TestRateLimit(unittest.TestCase):
@@ -32,5 +40,40 @@ class TestRateLimit(unittest.TestCase):
         self.assertGreater(time_to_finish_ratelimited, 5)
 
 
+class TestTokenBucketRateLimit(unittest.TestCase):
+    def test_token_bucket_spreads_calls(self) -> None:
+        limiter = TokenBucketRateLimiter(
+            "test", max_calls=2, period=1, backend=_InMemoryTokenBucketBackend()
+        )
+
+        start = time.time()
+        # the first 2 calls use the burst capacity, the next ones get a token every 0.5s
+        for _ in range(4):
+            limiter.acquire()
+        elapsed = time.time() - start
+
+        self.assertGreater(elapsed, 0.9)
+        self.assertLess(elapsed, 1.5)
+
+    def test_token_bucket_honors_retry_after(self) -> None:
+        limiter = TokenBucketRateLimiter(
+            "test", max_calls=100, period=1, backend=_InMemoryTokenBucketBackend()
+        )
+        response = requests.Response()
+        response.status_code = 429
+        response.headers["Retry-After"] = "1"
+
+        @limiter
+        def func() -> None:
+            raise requests.HTTPError(response=response)
+
+        with self.assertRaises(requests.HTTPError):
+            func()
+
+        start = time.time()
+        limiter.acquire()
+        self.assertGreater(time.time() - start, 0.9)
+
+
 if __name__ == "__main__":
     unittest.main()
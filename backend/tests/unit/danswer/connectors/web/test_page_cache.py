@@ -0,0 +1,112 @@
+import os
+import time
+
+import requests
+
+from danswer.connectors.web.page_cache import CachedWebPage
+from danswer.connectors.web.page_cache import get_conditional_headers
+from danswer.connectors.web.page_cache import get_validators
+from danswer.connectors.web.page_cache import WebPageCache
+
+_PARSE_OPTIONS = {"mintlify_cleanup": True}
+
+
+def _page(url: str, etag: str | None = '"v1"') -> CachedWebPage:
+    return CachedWebPage(
+        url=url,
+        final_url=url,
+        etag=etag,
+        last_modified=None,
+        title="Title",
+        text=f"Text of {url}",
+        links=[],
+        parse_options=_PARSE_OPTIONS,
+    )
+
+
+def test_get_and_put(tmp_path: str) -> None:
+    cache = WebPageCache(str(tmp_path), scope="connector", max_pages=10)
+    url = "https://example.com/a"
+
+    assert cache.get(url, _PARSE_OPTIONS) is None
+    cache.put(_page(url))
+
+    assert cache.get(url, _PARSE_OPTIONS) == _page(url)
+    # Pages parsed with other options have to be parsed again
+    assert cache.get(url, {"mintlify_cleanup": False}) is None
+
+
+def test_scopes_are_separate(tmp_path: str) -> None:
+    url = "https://example.com/a"
+    WebPageCache(str(tmp_path), scope="connector_1", max_pages=10).put(_page(url))
+
+    assert (
+        WebPageCache(str(tmp_path), scope="connector_2", max_pages=10).get(
+            url, _PARSE_OPTIONS
+        )
+        is None
+    )
+    assert (
+        WebPageCache(str(tmp_path), scope="connector_1", max_pages=10).get(
+            url, _PARSE_OPTIONS
+        )
+        is not None
+    )
+
+
+def test_least_recently_used_pages_are_evicted(tmp_path: str) -> None:
+    cache = WebPageCache(str(tmp_path), scope="connector", max_pages=10)
+    urls = [f"https://example.com/{i}" for i in range(10)]
+    for ind, url in enumerate(urls):
+        cache.put(_page(url))
+        # Spread out the modification times, their resolution may be coarse
+        path = cache._get_path(url)
+        os.utime(path, (time.time() - 100 + ind, time.time() - 100 + ind))
+    # Used recently, so kept even though it was cached first
+    assert cache.get(urls[0], _PARSE_OPTIONS) is not None
+
+    cache.put(_page("https://example.com/new"))
+
+    kept_urls = [url for url in urls if cache.get(url, _PARSE_OPTIONS) is not None]
+    assert kept_urls == [urls[0]] + urls[3:]
+    assert cache.get("https://example.com/new", _PARSE_OPTIONS) is not None
+    assert len(os.listdir(cache.cache_dir)) == 9
+
+
+def test_overwriting_a_page_does_not_count_twice(tmp_path: str) -> None:
+    cache = WebPageCache(str(tmp_path), scope="connector", max_pages=2)
+    for _ in range(5):
+        cache.put(_page("https://example.com/a"))
+    cache.put(_page("https://example.com/b"))
+
+    assert cache.get("https://example.com/a", _PARSE_OPTIONS) is not None
+    assert cache.get("https://example.com/b", _PARSE_OPTIONS) is not None
+
+
+def test_unusable_cache_dir_disables_the_cache(tmp_path: str) -> None:
+    blocking_file = os.path.join(str(tmp_path), "file")
+    with open(blocking_file, "w") as f:
+        f.write("")
+
+    cache = WebPageCache(blocking_file, scope="connector", max_pages=10)
+    cache.put(_page("https://example.com/a"))
+
+    assert not cache.enabled
+    assert cache.get("https://example.com/a", _PARSE_OPTIONS) is None
+
+
+def test_validators() -> None:
+    response = requests.Response()
+    response.headers["ETag"] = '"v1"'
+    response.headers["Last-Modified"] = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert get_validators(response.headers) == (
+        '"v1"',
+        "Wed, 21 Oct 2015 07:28:00 GMT",
+    )
+    # Playwright lower cases the header names
+    assert get_validators({"etag": '"v2"'}) == ('"v2"', None)
+
+    assert get_conditional_headers(None) == {}
+    assert get_conditional_headers(_page("https://example.com/a")) == {
+        "If-None-Match": '"v1"'
+    }
@@ -0,0 +1,210 @@
+import threading
+import time
+import unittest
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import MagicMock
+
+from danswer.connectors.web.page_pool import BrowserPagePool
+from danswer.connectors.web.page_pool import ContextGetter
+from danswer.connectors.web.page_pool import HostThrottle
+
+
+class _FakeBrowsers:
+    """Counts the browsers started and stopped by the pool"""
+
+    def __init__(self) -> None:
+        self.started: list[MagicMock] = []
+        self.lock = threading.Lock()
+
+    def start(self) -> tuple[Any, Any]:
+        playwright = MagicMock()
+        with self.lock:
+            self.started.append(playwright)
+        return playwright, MagicMock()
+
+    @property
+    def num_stopped(self) -> int:
+        return sum(playwright.stop.called for playwright in self.started)
+
+
+def _run_pool(
+    process_page: Callable[[str, ContextGetter], Any],
+    urls: list[str],
+    browsers: _FakeBrowsers,
+    num_workers: int = 1,
+    pages_per_browser: int = 100,
+) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    with BrowserPagePool(
+        process_page=process_page,
+        start_browser=browsers.start,
+        num_workers=num_workers,
+        host_delay=0,
+        pages_per_browser=pages_per_browser,
+    ) as pool:
+        for url in urls:
+            pool.submit(url)
+        while pool.num_in_flight:
+            page_result = pool.get_result()
+            results[page_result.url] = page_result.error or page_result.result
+    return results
+
+
+class TestHostThrottle(unittest.TestCase):
+    def test_visits_to_a_host_are_spaced_out(self) -> None:
+        throttle = HostThrottle(delay=0.1)
+        visit_times: list[float] = []
+        for _ in range(3):
+            throttle.wait("https://example.com/a")
+            visit_times.append(time.monotonic())
+
+        for first, second in zip(visit_times, visit_times[1:]):
+            self.assertGreaterEqual(second - first, 0.09)
+
+    def test_hosts_are_throttled_separately(self) -> None:
+        throttle = HostThrottle(delay=1)
+        start = time.monotonic()
+        throttle.wait("https://example.com/a")
+        throttle.wait("https://other.com/a")
+        throttle.wait("https://example.com:8080/a")
+
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_shared_by_threads(self) -> None:
+        throttle = HostThrottle(delay=0.1)
+        visit_times: list[float] = []
+        lock = threading.Lock()
+
+        def _visit() -> None:
+            throttle.wait("https://example.com/a")
+            with lock:
+                visit_times.append(time.monotonic())
+
+        threads = [threading.Thread(target=_visit) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        visit_times.sort()
+        for first, second in zip(visit_times, visit_times[1:]):
+            self.assertGreaterEqual(second - first, 0.09)
+
+
+class TestBrowserPagePool(unittest.TestCase):
+    def test_every_page_is_processed(self) -> None:
+        browsers = _FakeBrowsers()
+        urls = [f"https://example.com/{i}" for i in range(10)]
+
+        results = _run_pool(
+            lambda url, get_context: url.upper(), urls, browsers, num_workers=3
+        )
+
+        self.assertEqual(results, {url: url.upper() for url in urls})
+        # Pages that weren't rendered don't need a browser
+        self.assertEqual(browsers.started, [])
+
+    def test_pages_run_concurrently_up_to_num_workers(self) -> None:
+        browsers = _FakeBrowsers()
+        in_flight = 0
+        max_in_flight = 0
+        lock = threading.Lock()
+
+        def _process_page(url: str, get_context: ContextGetter) -> str:
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.05)
+            with lock:
+                in_flight -= 1
+            return url
+
+        _run_pool(
+            _process_page,
+            [f"https://example.com/{i}" for i in range(8)],
+            browsers,
+            num_workers=2,
+        )
+
+        self.assertEqual(max_in_flight, 2)
+
+    def test_browser_is_restarted_after_a_failure(self) -> None:
+        browsers = _FakeBrowsers()
+
+        def _process_page(url: str, get_context: ContextGetter) -> str:
+            get_context()
+            if url.endswith("bad"):
+                raise RuntimeError("page crashed")
+            return url
+
+        results = _run_pool(
+            _process_page,
+            [
+                "https://example.com/1",
+                "https://example.com/bad",
+                "https://example.com/2",
+            ],
+            browsers,
+        )
+
+        self.assertIsInstance(results["https://example.com/bad"], RuntimeError)
+        self.assertEqual(results["https://example.com/2"], "https://example.com/2")
+        self.assertEqual(len(browsers.started), 2)
+        self.assertEqual(browsers.num_stopped, 2)
+
+    def test_browser_is_restarted_every_pages_per_browser_renders(self) -> None:
+        browsers = _FakeBrowsers()
+
+        def _process_page(url: str, get_context: ContextGetter) -> str:
+            get_context()
+            return url
+
+        _run_pool(
+            _process_page,
+            [f"https://example.com/{i}" for i in range(7)],
+            browsers,
+            pages_per_browser=3,
+        )
+
+        self.assertEqual(len(browsers.started), 3)
+        self.assertEqual(browsers.num_stopped, 3)
+
+    def test_close_drops_pages_not_started(self) -> None:
+        browsers = _FakeBrowsers()
+        started = threading.Event()
+        release = threading.Event()
+        processed: list[str] = []
+
+        def _process_page(url: str, get_context: ContextGetter) -> str:
+            started.set()
+            release.wait(timeout=5)
+            processed.append(url)
+            return url
+
+        pool = BrowserPagePool(
+            process_page=_process_page,
+            start_browser=browsers.start,
+            num_workers=1,
+            host_delay=0,
+            pages_per_browser=100,
+        )
+        for i in range(5):
+            pool.submit(f"https://example.com/{i}")
+        self.assertTrue(started.wait(timeout=5))
+
+        closer = threading.Thread(target=pool.close)
+        closer.start()
+        # Only let the first page finish once the pool is closing
+        self.assertTrue(pool._stop_event.wait(timeout=5))
+        release.set()
+        closer.join(timeout=5)
+
+        self.assertFalse(closer.is_alive())
+        # The page in progress is finished, the rest never start
+        self.assertEqual(processed, ["https://example.com/0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
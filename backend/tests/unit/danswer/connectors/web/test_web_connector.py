@@ -0,0 +1,236 @@
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockFixture
+
+from danswer.configs.constants import DocumentSource
+from danswer.connectors.models import Document
+from danswer.connectors.models import Section
+from danswer.connectors.web import connector as web_connector
+from danswer.connectors.web.connector import _CrawledPage
+from danswer.connectors.web.connector import normalize_url
+from danswer.connectors.web.connector import WebConnector
+from danswer.connectors.web.page_pool import ContextGetter
+
+_URL = "https://example.com/docs/page"
+_HTML = """
+<html><head><title>Page</title></head><body>
+<p>Some documentation</p>
+<a href="/docs/other">Other</a>
+<a href="https://elsewhere.com/">Elsewhere</a>
+</body></html>
+"""
+
+
+@pytest.fixture
+def connector(mocker: MockFixture, tmp_path: str) -> WebConnector:
+    mocker.patch.object(web_connector, "WEB_CONNECTOR_CACHE_DIR", str(tmp_path))
+    return WebConnector(_URL, web_connector_type="single")
+
+
+def _browser(headers: dict[str, str]) -> tuple[MagicMock, MagicMock]:
+    """Context getter of the page pool and the page it renders"""
+    page = MagicMock()
+    page.url = _URL
+    page.content.return_value = _HTML
+    page.goto.return_value = MagicMock(ok=True, headers=headers)
+    context = MagicMock()
+    context.new_page.return_value = page
+    return MagicMock(return_value=context), page
+
+
+def _head_response(status_code: int) -> MagicMock:
+    return MagicMock(status_code=status_code)
+
+
+def test_rendered_page_is_cached_with_its_validators(
+    connector: WebConnector, mocker: MockFixture
+) -> None:
+    head = mocker.patch.object(web_connector.requests, "head")
+    get = mocker.patch.object(web_connector.requests, "get")
+    get_context, page = _browser({"etag": '"v1"'})
+
+    crawled_page = connector._crawl_page(_URL, get_context)
+
+    assert not crawled_page.from_cache
+    assert crawled_page.links == ["https://example.com/docs/other"]
+    # Nothing cached yet so nothing to check, and the page is only downloaded by the browser
+    head.assert_not_called()
+    get.assert_not_called()
+    assert connector.page_cache is not None
+    cached_page = connector.page_cache.get(_URL, connector._parse_options)
+    assert cached_page is not None
+    assert cached_page.etag == '"v1"'
+    assert cached_page.text == crawled_page.document.sections[0].text
+
+
+def test_unmodified_page_is_not_rendered(
+    connector: WebConnector, mocker: MockFixture
+) -> None:
+    get_context, _ = _browser({"etag": '"v1"'})
+    connector._crawl_page(_URL, get_context)
+
+    head = mocker.patch.object(
+        web_connector.requests, "head", return_value=_head_response(304)
+    )
+    get_context, page = _browser({"etag": '"v1"'})
+    crawled_page = connector._crawl_page(_URL, get_context)
+
+    assert crawled_page.from_cache
+    assert "Some documentation" in crawled_page.document.sections[0].text
+    assert head.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+    page.goto.assert_not_called()
+
+
+@pytest.mark.parametrize("status_code", [200, 405, 500])
+def test_page_is_rendered_unless_the_server_confirms_it_is_unchanged(
+    connector: WebConnector, mocker: MockFixture, status_code: int
+) -> None:
+    get_context, _ = _browser({"etag": '"v1"'})
+    connector._crawl_page(_URL, get_context)
+
+    mocker.patch.object(
+        web_connector.requests, "head", return_value=_head_response(status_code)
+    )
+    get_context, page = _browser({"etag": '"v2"'})
+    crawled_page = connector._crawl_page(_URL, get_context)
+
+    assert not crawled_page.from_cache
+    page.goto.assert_called_once_with(_URL)
+    assert connector.page_cache is not None
+    cached_page = connector.page_cache.get(_URL, connector._parse_options)
+    assert cached_page is not None and cached_page.etag == '"v2"'
+
+
+def test_pages_without_validators_are_not_cached(
+    connector: WebConnector, mocker: MockFixture
+) -> None:
+    head = mocker.patch.object(web_connector.requests, "head")
+    for _ in range(2):
+        get_context, page = _browser({"content-type": "text/html"})
+        assert not connector._crawl_page(_URL, get_context).from_cache
+        page.goto.assert_called_once()
+
+    head.assert_not_called()
+
+
+def test_cache_is_scoped_to_the_connector(mocker: MockFixture, tmp_path: Any) -> None:
+    mocker.patch.object(web_connector, "WEB_CONNECTOR_CACHE_DIR", str(tmp_path))
+    recursive_connector = WebConnector(_URL, web_connector_type="recursive")
+    single_connector = WebConnector(_URL, web_connector_type="single")
+    get_context, _ = _browser({"etag": '"v1"'})
+    recursive_connector._crawl_page(_URL, get_context)
+
+    assert single_connector.page_cache is not None
+    assert (
+        single_connector.page_cache.get(_URL, single_connector._parse_options) is None
+    )
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        ("HTTPS://Example.COM/Docs/Page", "https://example.com/Docs/Page"),
+        ("https://example.com:443/docs", "https://example.com/docs"),
+        ("http://example.com:80/docs", "http://example.com/docs"),
+        # Only the default port of the scheme is dropped
+        ("http://example.com:443/docs", "http://example.com:443/docs"),
+        ("https://example.com:8443/docs", "https://example.com:8443/docs"),
+        ("https://example.com", "https://example.com/"),
+        ("https://example.com/docs?a=1#b", "https://example.com/docs?a=1#b"),
+    ],
+)
+def test_normalize_url(url: str, expected: str) -> None:
+    assert normalize_url(url) == expected
+
+
+def _crawl_site(
+    mocker: MockFixture, site: dict[str, tuple[str, list[str]]], start_url: str
+) -> tuple[list[str], list[str]]:
+    """Crawls `site`, which maps each URL to the URL it redirects to and its links.
+    Returns the visited URLs and the IDs of the documents"""
+    mocker.patch.object(web_connector, "WEB_CONNECTOR_CONCURRENCY", 3)
+    mocker.patch.object(web_connector, "WEB_CONNECTOR_HOST_DELAY_SECONDS", 0)
+    mocker.patch.object(web_connector, "WEB_CONNECTOR_CACHE_DIR", "")
+    mocker.patch.object(web_connector, "get_oauth_headers", return_value={})
+    mocker.patch.object(
+        web_connector, "start_playwright", side_effect=AssertionError("no browser")
+    )
+    visited_urls: list[str] = []
+
+    def _crawl_page(
+        self: WebConnector, url: str, get_context: ContextGetter
+    ) -> _CrawledPage:
+        visited_urls.append(url)
+        final_url, links = site[normalize_url(url)]
+        return _CrawledPage(
+            final_url=final_url,
+            document=Document(
+                id=final_url,
+                sections=[Section(link=final_url, text=final_url)],
+                source=DocumentSource.WEB,
+                semantic_identifier=final_url,
+                metadata={},
+            ),
+            links=links,
+            from_cache=False,
+        )
+
+    mocker.patch.object(WebConnector, "_crawl_page", _crawl_page)
+    connector = WebConnector(start_url, web_connector_type="recursive", batch_size=2)
+    doc_ids = [doc.id for batch in connector.load_from_state() for doc in batch]
+    return visited_urls, doc_ids
+
+
+def test_pages_are_only_visited_once(mocker: MockFixture) -> None:
+    site = {
+        "https://example.com/docs": (
+            "https://example.com/docs",
+            [
+                "https://example.com/docs/a",
+                "HTTPS://EXAMPLE.com:443/docs/a",
+                "https://example.com/docs/b",
+                # Outside of the base URL
+                "https://example.com/blog",
+            ],
+        ),
+        "https://example.com/docs/a": (
+            "https://example.com/docs/a",
+            ["https://example.com/docs", "https://example.com/docs/b"],
+        ),
+        "https://example.com/docs/b": (
+            "https://example.com/docs/b",
+            ["https://example.com/docs/a"],
+        ),
+    }
+
+    visited_urls, doc_ids = _crawl_site(mocker, site, "https://example.com/docs")
+
+    assert sorted(visited_urls) == sorted(site)
+    assert sorted(doc_ids) == sorted(site)
+
+
+def test_redirects_to_seen_pages_are_skipped(mocker: MockFixture) -> None:
+    site: dict[str, tuple[str, list[str]]] = {
+        "https://example.com/docs": (
+            "https://example.com/docs",
+            [
+                "https://example.com/docs/old",
+                "https://example.com/docs/new",
+                "https://example.com/docs/moved",
+            ],
+        ),
+        "https://example.com/docs/old": ("https://example.com/docs/new", []),
+        "https://example.com/docs/new": ("https://example.com/docs/new", []),
+        "https://example.com/docs/moved": ("https://example.com/docs/target", []),
+    }
+
+    _, doc_ids = _crawl_site(mocker, site, "https://example.com/docs")
+
+    # The page both URLs lead to is indexed once, under its final URL
+    assert sorted(doc_ids) == [
+        "https://example.com/docs",
+        "https://example.com/docs/new",
+        "https://example.com/docs/target",
+    ]
@@ -0,0 +1,84 @@
+import uuid
+from collections.abc import Callable
+from collections.abc import Generator
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from danswer.configs.constants import DocumentSource
+from danswer.connectors.models import InputType
+from danswer.db.engine import build_connection_string
+from danswer.db.engine import SYNC_DB_API
+from danswer.db.models import Base
+from danswer.db.models import Connector
+from danswer.db.models import ConnectorCredentialPair
+from danswer.db.models import Credential
+
+
+@pytest.fixture(scope="session")
+def db_engine() -> Generator[Engine, None, None]:
+    """Engine of a throwaway database on the configured Postgres server, with all the
+    tables created from the models. The tests are skipped if the server is unreachable
+    """
+    admin_engine = create_engine(
+        build_connection_string(db_api=SYNC_DB_API), isolation_level="AUTOCOMMIT"
+    )
+    db_name = f"danswer_test_{uuid.uuid4().hex[:8]}"
+    try:
+        with admin_engine.connect() as conn:
+            conn.execute(text(f"CREATE DATABASE {db_name}"))
+    except Exception as e:
+        admin_engine.dispose()
+        pytest.skip(f"Postgres is not available: {e}")
+
+    engine = create_engine(build_connection_string(db_api=SYNC_DB_API, db=db_name))
+    try:
+        Base.metadata.create_all(engine)
+        yield engine
+    finally:
+        engine.dispose()
+        with admin_engine.connect() as conn:
+            conn.execute(text(f"DROP DATABASE {db_name}"))
+        admin_engine.dispose()
+
+
+@pytest.fixture
+def db_session(db_engine: Engine) -> Generator[Session, None, None]:
+    with Session(db_engine, expire_on_commit=False) as session:
+        yield session
+
+    # Every test starts from empty tables
+    with db_engine.begin() as conn:
+        table_names = ", ".join(
+            f'"{table.name}"' for table in Base.metadata.sorted_tables
+        )
+        conn.execute(text(f"TRUNCATE {table_names} CASCADE"))
+
+
+@pytest.fixture
+def create_cc_pair(
+    db_session: Session,
+) -> Callable[[str], ConnectorCredentialPair]:
+    """Creates a cc pair with its own connector and credential"""
+
+    def _create_cc_pair(name: str) -> ConnectorCredentialPair:
+        connector = Connector(
+            name=name,
+            source=DocumentSource.WEB,
+            input_type=InputType.LOAD_STATE,
+            connector_specific_config={},
+        )
+        credential = Credential(credential_json={})
+        db_session.add_all([connector, credential])
+        db_session.flush()
+        cc_pair = ConnectorCredentialPair(
+            name=name, connector_id=connector.id, credential_id=credential.id
+        )
+        db_session.add(cc_pair)
+        db_session.commit()
+        return cc_pair
+
+    return _create_cc_pair
@@ -0,0 +1,91 @@
+from collections.abc import Callable
+
+import pytest
+from sqlalchemy.orm import Session
+
+from danswer.db.document import get_index_info_for_documents
+from danswer.db.models import ConnectorCredentialPair
+from danswer.db.models import Document
+from danswer.db.models import DocumentByConnectorCredentialPair
+from danswer.db.models import DocumentSet
+from danswer.db.models import DocumentSet__ConnectorCredentialPair
+from danswer.server.documents.models import ConnectorCredentialPairIdentifier
+
+
+@pytest.fixture
+def cc_pairs(
+    db_session: Session,
+    create_cc_pair: Callable[[str], ConnectorCredentialPair],
+) -> tuple[ConnectorCredentialPair, ...]:
+    """Documents `doc_1` (in both cc pairs), `doc_2` (second cc pair only) and `doc_3`
+    (no cc pair). Only the first cc pair is in document sets"""
+    cc_pair_1 = create_cc_pair("first")
+    cc_pair_2 = create_cc_pair("second")
+    db_session.add_all(
+        [
+            Document(id="doc_1", semantic_id="1", boost=2, chunk_counts={"index": 3}),
+            Document(id="doc_2", semantic_id="2", boost=0),
+            Document(id="doc_3", semantic_id="3", boost=0),
+        ]
+    )
+    db_session.flush()
+    for document_id, cc_pair in [
+        ("doc_1", cc_pair_1),
+        ("doc_1", cc_pair_2),
+        ("doc_2", cc_pair_2),
+    ]:
+        db_session.add(
+            DocumentByConnectorCredentialPair(
+                id=document_id,
+                connector_id=cc_pair.connector_id,
+                credential_id=cc_pair.credential_id,
+            )
+        )
+
+    for name, is_current in [("current_1", True), ("current_2", True), ("old", False)]:
+        document_set = DocumentSet(name=name, description="")
+        db_session.add(document_set)
+        db_session.flush()
+        db_session.add(
+            DocumentSet__ConnectorCredentialPair(
+                document_set_id=document_set.id,
+                connector_credential_pair_id=cc_pair_1.id,
+                is_current=is_current,
+            )
+        )
+    db_session.commit()
+    return cc_pair_1, cc_pair_2
+
+
+def test_get_index_info_for_documents(
+    db_session: Session, cc_pairs: tuple[ConnectorCredentialPair, ...]
+) -> None:
+    index_info = get_index_info_for_documents(
+        db_session=db_session, document_ids=["doc_1", "doc_2", "doc_3"]
+    )
+
+    # Documents without a cc pair are left out
+    assert set(index_info) == {"doc_1", "doc_2"}
+    # Only the current document sets, not multiplied by the number of cc pairs
+    assert index_info["doc_1"].document_sets == {"current_1", "current_2"}
+    assert index_info["doc_1"].boost == 2
+    assert index_info["doc_1"].chunk_counts == {"index": 3}
+    assert index_info["doc_2"].document_sets == set()
+    assert index_info["doc_2"].chunk_counts == {}
+
+
+def test_get_index_info_as_if_a_cc_pair_was_deleted(
+    db_session: Session, cc_pairs: tuple[ConnectorCredentialPair, ...]
+) -> None:
+    cc_pair_1, _ = cc_pairs
+    index_info = get_index_info_for_documents(
+        db_session=db_session,
+        document_ids=["doc_1", "doc_2"],
+        cc_pair_to_delete=ConnectorCredentialPairIdentifier(
+            connector_id=cc_pair_1.connector_id,
+            credential_id=cc_pair_1.credential_id,
+        ),
+    )
+
+    assert set(index_info) == {"doc_1", "doc_2"}
+    assert index_info["doc_1"].document_sets == set()
@@ -0,0 +1,86 @@
+from collections.abc import Callable
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from danswer.db.document_set import fetch_documents_for_changed_cc_pairs
+from danswer.db.document_set import insert_document_set
+from danswer.db.document_set import mark_document_set_as_synced
+from danswer.db.document_set import update_document_set
+from danswer.db.models import ConnectorCredentialPair
+from danswer.db.models import Document
+from danswer.db.models import DocumentByConnectorCredentialPair
+from danswer.server.features.document_set.models import DocumentSetCreationRequest
+from danswer.server.features.document_set.models import DocumentSetUpdateRequest
+
+
+def _add_documents(
+    db_session: Session, documents: dict[str, list[ConnectorCredentialPair]]
+) -> None:
+    db_session.add_all(
+        [Document(id=document_id, semantic_id=document_id) for document_id in documents]
+    )
+    db_session.flush()
+    db_session.add_all(
+        [
+            DocumentByConnectorCredentialPair(
+                id=document_id,
+                connector_id=cc_pair.connector_id,
+                credential_id=cc_pair.credential_id,
+            )
+            for document_id, cc_pairs in documents.items()
+            for cc_pair in cc_pairs
+        ]
+    )
+    db_session.commit()
+
+
+def test_only_documents_of_changed_cc_pairs_are_synced(
+    db_session: Session,
+    db_engine: Engine,
+    create_cc_pair: Callable[[str], ConnectorCredentialPair],
+) -> None:
+    removed, kept, added = (create_cc_pair(name) for name in ["a", "b", "c"])
+    _add_documents(
+        db_session,
+        {
+            "removed_doc": [removed],
+            "kept_doc": [kept],
+            "added_doc": [added],
+            "removed_and_kept_doc": [removed, kept],
+        },
+    )
+    cc_pair_ids = [removed.id, kept.id]
+    # Ends the read transaction, the insert starts its own
+    db_session.commit()
+    document_set, _ = insert_document_set(
+        DocumentSetCreationRequest(name="set", description="", cc_pair_ids=cc_pair_ids),
+        user_id=None,
+        db_session=db_session,
+    )
+
+    # A new document set has every document of its cc pairs to sync
+    assert {
+        document.id
+        for document in fetch_documents_for_changed_cc_pairs(
+            document_set_id=document_set.id, db_session=db_session
+        )
+    } == {"removed_doc", "kept_doc", "removed_and_kept_doc"}
+
+    mark_document_set_as_synced(document_set.id, db_session)
+
+    # Updated by another request, with its own session
+    with Session(db_engine) as update_session:
+        update_document_set(
+            DocumentSetUpdateRequest(
+                id=document_set.id, description="", cc_pair_ids=[kept.id, added.id]
+            ),
+            db_session=update_session,
+        )
+
+    assert {
+        document.id
+        for document in fetch_documents_for_changed_cc_pairs(
+            document_set_id=document_set.id, db_session=db_session
+        )
+    } == {"removed_doc", "added_doc", "removed_and_kept_doc"}
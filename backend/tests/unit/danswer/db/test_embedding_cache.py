@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from pytest_mock import MockFixture
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from danswer.db.models import EmbeddingCacheEntry
+from danswer.indexing.embedding_cache import get_text_hash
+from danswer.indexing.embedding_cache import PostgresEmbeddingCache
+
+_MODEL = "test-model"
+
+
+@pytest.fixture
+def engine(db_engine: Engine, db_session: Session, mocker: MockFixture) -> Engine:
+    mocker.patch(
+        "danswer.indexing.embedding_cache.get_sqlalchemy_engine",
+        return_value=db_engine,
+    )
+    return db_engine
+
+
+def _store(cache: PostgresEmbeddingCache, texts: list[str]) -> None:
+    cache.store_embeddings(
+        _MODEL,
+        True,
+        "passage: ",
+        texts,
+        [np.array([len(text), 0.5], dtype=np.float32) for text in texts],
+    )
+
+
+def _get(cache: PostgresEmbeddingCache, texts: list[str]) -> list[list[float] | None]:
+    return [
+        embedding.tolist() if embedding is not None else None
+        for embedding in cache.get_embeddings(_MODEL, True, "passage: ", texts)
+    ]
+
+
+def _get_last_accessed(db_session: Session, text: str) -> datetime:
+    last_accessed = db_session.scalar(
+        select(EmbeddingCacheEntry.last_accessed).where(
+            EmbeddingCacheEntry.text_hash == get_text_hash(text)
+        )
+    )
+    assert last_accessed is not None
+    return last_accessed
+
+
+def test_hits_and_misses(engine: Engine) -> None:
+    cache = PostgresEmbeddingCache()
+    _store(cache, ["a", "bb"])
+
+    assert _get(cache, ["bb", "ccc", "a"]) == [[2.0, 0.5], None, [1.0, 0.5]]
+    # Any part of the key differing is a miss
+    assert cache.get_embeddings(_MODEL, False, "passage: ", ["a"]) == [None]
+    assert cache.get_embeddings(_MODEL, True, "", ["a"]) == [None]
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_store_upserts(engine: Engine, db_session: Session) -> None:
+    cache = PostgresEmbeddingCache()
+    _store(cache, ["a"])
+    first_accessed = _get_last_accessed(db_session, "a")
+    _store(cache, ["a", "bb"])
+
+    assert db_session.scalar(select(func.count(EmbeddingCacheEntry.id))) == 2
+    assert _get_last_accessed(db_session, "a") > first_accessed
+
+
+def test_hits_are_touched_in_batches(engine: Engine, db_session: Session) -> None:
+    cache = PostgresEmbeddingCache(touch_flush_interval=2)
+    _store(cache, ["a", "bb"])
+    stored_at = _get_last_accessed(db_session, "a")
+
+    cache.get_embeddings(_MODEL, True, "passage: ", ["a"])
+    assert _get_last_accessed(db_session, "a") == stored_at
+
+    cache.get_embeddings(_MODEL, True, "passage: ", ["bb"])
+    assert _get_last_accessed(db_session, "a") > stored_at
+    assert _get_last_accessed(db_session, "bb") > stored_at
+
+
+def test_least_recently_used_are_evicted(engine: Engine) -> None:
+    cache = PostgresEmbeddingCache(max_size=2, eviction_check_interval=3)
+    _store(cache, ["a"])
+    _store(cache, ["bb"])
+    # Pending touch, flushed before the eviction so "a" counts as the most recently used
+    cache.get_embeddings(_MODEL, True, "passage: ", ["a"])
+    _store(cache, ["ccc"])
+
+    assert _get(cache, ["a", "bb", "ccc"]) == [[1.0, 0.5], None, [3.0, 0.5]]
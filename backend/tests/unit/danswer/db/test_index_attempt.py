@@ -0,0 +1,160 @@
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+import pytest
+from sqlalchemy.orm import Session
+
+from danswer.configs.constants import DocumentSource
+from danswer.connectors.models import InputType
+from danswer.db.index_attempt import get_checkpoint_to_resume_from
+from danswer.db.index_attempt import update_index_attempt_checkpoint
+from danswer.db.models import Connector
+from danswer.db.models import Credential
+from danswer.db.models import EmbeddingModel
+from danswer.db.models import IndexAttempt
+from danswer.db.models import IndexingStatus
+from danswer.db.models import IndexModelStatus
+
+_START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def connector(db_session: Session) -> Connector:
+    connector = Connector(
+        name="test",
+        source=DocumentSource.GOOGLE_DRIVE,
+        input_type=InputType.LOAD_STATE,
+        connector_specific_config={"folder_paths": ["a"]},
+    )
+    db_session.add(connector)
+    db_session.commit()
+    return connector
+
+
+@pytest.fixture
+def credential(db_session: Session) -> Credential:
+    credential = Credential(credential_json={})
+    db_session.add(credential)
+    db_session.commit()
+    return credential
+
+
+def _embedding_model(
+    db_session: Session, name: str, status: IndexModelStatus = IndexModelStatus.PRESENT
+) -> EmbeddingModel:
+    embedding_model = EmbeddingModel(
+        model_name=name,
+        model_dim=2,
+        normalize=True,
+        query_prefix="",
+        passage_prefix="",
+        status=status,
+        index_name=f"index_{name}",
+    )
+    db_session.add(embedding_model)
+    db_session.commit()
+    return embedding_model
+
+
+@pytest.fixture
+def embedding_model(db_session: Session) -> EmbeddingModel:
+    return _embedding_model(db_session, "model")
+
+
+def _attempt(
+    db_session: Session,
+    connector: Connector,
+    credential: Credential,
+    embedding_model: EmbeddingModel,
+    minutes: int,
+    status: IndexingStatus = IndexingStatus.IN_PROGRESS,
+    checkpoint: dict | None = None,
+) -> IndexAttempt:
+    attempt = IndexAttempt(
+        connector_id=connector.id,
+        credential_id=credential.id,
+        embedding_model_id=embedding_model.id,
+        from_beginning=False,
+        status=status,
+        time_created=_START + timedelta(minutes=minutes),
+    )
+    db_session.add(attempt)
+    db_session.commit()
+    if checkpoint is not None:
+        update_index_attempt_checkpoint(db_session, attempt, checkpoint)
+    return attempt
+
+
+def test_resumes_from_failed_attempt(
+    db_session: Session,
+    connector: Connector,
+    credential: Credential,
+    embedding_model: EmbeddingModel,
+) -> None:
+    args = (db_session, connector, credential, embedding_model)
+    _attempt(*args, 0, IndexingStatus.FAILED, {"page": 1})
+    _attempt(*args, 1, IndexingStatus.FAILED, {"page": 5})
+    attempt = _attempt(*args, 2)
+
+    assert get_checkpoint_to_resume_from(attempt, db_session) == {"page": 5}
+
+
+def test_only_the_latest_attempt_is_resumed(
+    db_session: Session,
+    connector: Connector,
+    credential: Credential,
+    embedding_model: EmbeddingModel,
+) -> None:
+    args = (db_session, connector, credential, embedding_model)
+    _attempt(*args, 0, IndexingStatus.FAILED, {"page": 5})
+    _attempt(*args, 1, IndexingStatus.SUCCESS)
+    attempt = _attempt(*args, 2)
+    # Attempts created later are not previous attempts
+    _attempt(*args, 3, IndexingStatus.FAILED, {"page": 8})
+
+    assert get_checkpoint_to_resume_from(attempt, db_session) is None
+
+
+def test_other_embedding_models_are_ignored(
+    db_session: Session,
+    connector: Connector,
+    credential: Credential,
+    embedding_model: EmbeddingModel,
+) -> None:
+    other_model = _embedding_model(db_session, "other_model", IndexModelStatus.FUTURE)
+    _attempt(db_session, connector, credential, embedding_model, 0)
+    _attempt(
+        db_session,
+        connector,
+        credential,
+        other_model,
+        1,
+        IndexingStatus.FAILED,
+        {"page": 5},
+    )
+    attempt = _attempt(db_session, connector, credential, embedding_model, 2)
+
+    assert get_checkpoint_to_resume_from(attempt, db_session) is None
+
+
+def test_checkpoint_of_another_config_is_ignored(
+    db_session: Session,
+    connector: Connector,
+    credential: Credential,
+    embedding_model: EmbeddingModel,
+) -> None:
+    args = (db_session, connector, credential, embedding_model)
+    _attempt(*args, 0, IndexingStatus.FAILED, {"page": 5})
+
+    connector.connector_specific_config = {"folder_paths": ["a", "b"]}
+    db_session.commit()
+    attempt = _attempt(*args, 1)
+    assert get_checkpoint_to_resume_from(attempt, db_session) is None
+
+    # Checkpoints made before the config was recorded can't be trusted either
+    previous_attempt = _attempt(*args, 2, IndexingStatus.FAILED, {"page": 2})
+    previous_attempt.checkpoint_config_hash = None
+    db_session.commit()
+    attempt = _attempt(*args, 3)
+    assert get_checkpoint_to_resume_from(attempt, db_session) is None
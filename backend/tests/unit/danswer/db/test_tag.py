@@ -0,0 +1,115 @@
+from typing import Any
+
+import pytest
+from pytest_mock import MockFixture
+from sqlalchemy import delete
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from danswer.configs.constants import DocumentSource
+from danswer.db import tag as tag_db
+from danswer.db.models import Document
+from danswer.db.models import Document__Tag
+from danswer.db.models import Tag
+from danswer.db.tag import TagTuple
+from danswer.db.tag import upsert_document_tags
+
+_TOPIC_A: TagTuple = ("topic", "a", DocumentSource.WEB)
+_TOPIC_B: TagTuple = ("topic", "b", DocumentSource.WEB)
+# Same key and value as _TOPIC_A, different source
+_TOPIC_A_SLACK: TagTuple = ("topic", "a", DocumentSource.SLACK)
+
+
+@pytest.fixture
+def documents(db_session: Session) -> list[str]:
+    document_ids = ["doc_1", "doc_2"]
+    db_session.add_all(
+        [
+            Document(id=document_id, semantic_id=document_id)
+            for document_id in document_ids
+        ]
+    )
+    db_session.commit()
+    return document_ids
+
+
+def _get_tags(db_session: Session) -> dict[TagTuple, int]:
+    return {
+        (tag_key, tag_value, source): tag_id
+        for tag_id, tag_key, tag_value, source in db_session.execute(
+            select(Tag.id, Tag.tag_key, Tag.tag_value, Tag.source)
+        )
+    }
+
+
+def _get_document_tags(db_session: Session) -> set[tuple[str, TagTuple]]:
+    stmt = select(
+        Document__Tag.document_id, Tag.tag_key, Tag.tag_value, Tag.source
+    ).join(Tag, Tag.id == Document__Tag.tag_id)
+    return {
+        (document_id, (tag_key, tag_value, source))
+        for document_id, tag_key, tag_value, source in db_session.execute(stmt)
+    }
+
+
+def test_upsert_document_tags(db_session: Session, documents: list[str]) -> None:
+    doc_1, doc_2 = documents
+    upsert_document_tags({doc_1: {_TOPIC_A}}, db_session)
+    existing_tag_ids = _get_tags(db_session)
+
+    upsert_document_tags(
+        {doc_1: {_TOPIC_B}, doc_2: {_TOPIC_A, _TOPIC_B, _TOPIC_A_SLACK}}, db_session
+    )
+
+    tag_ids = _get_tags(db_session)
+    assert set(tag_ids) == {_TOPIC_A, _TOPIC_B, _TOPIC_A_SLACK}
+    # Existing tags are reused rather than created again
+    assert tag_ids[_TOPIC_A] == existing_tag_ids[_TOPIC_A]
+    # Tags attached before are kept
+    assert _get_document_tags(db_session) == {
+        (doc_1, _TOPIC_A),
+        (doc_1, _TOPIC_B),
+        (doc_2, _TOPIC_A),
+        (doc_2, _TOPIC_B),
+        (doc_2, _TOPIC_A_SLACK),
+    }
+
+
+def test_upsert_is_idempotent(db_session: Session, documents: list[str]) -> None:
+    document_tags = {document_id: {_TOPIC_A, _TOPIC_B} for document_id in documents}
+    upsert_document_tags(document_tags, db_session)
+    upsert_document_tags(document_tags, db_session)
+    upsert_document_tags({}, db_session)
+
+    assert len(_get_tags(db_session)) == 2
+    assert len(_get_document_tags(db_session)) == 4
+
+
+def test_tags_deleted_before_they_are_selected_are_inserted_again(
+    db_session: Session, db_engine: Engine, documents: list[str], mocker: MockFixture
+) -> None:
+    doc_1, doc_2 = documents
+    upsert_document_tags({doc_1: {_TOPIC_A}}, db_session)
+    select_tag_ids = tag_db._select_tag_ids
+    num_selects = 0
+
+    def _delete_then_select(tags: list[TagTuple], session: Session) -> Any:
+        """Deletes the orphaned tag from another connection, after the insert skipped it
+        as existing"""
+        nonlocal num_selects
+        num_selects += 1
+        if num_selects == 1:
+            with Session(db_engine) as other_session:
+                other_session.execute(delete(Document__Tag))
+                other_session.execute(delete(Tag))
+                other_session.commit()
+        return select_tag_ids(tags, session)
+
+    mocker.patch.object(tag_db, "_select_tag_ids", side_effect=_delete_then_select)
+
+    upsert_document_tags({doc_2: {_TOPIC_A, _TOPIC_B}}, db_session)
+
+    assert num_selects == 1
+    assert set(_get_tags(db_session)) == {_TOPIC_A, _TOPIC_B}
+    assert _get_document_tags(db_session) == {(doc_2, _TOPIC_A), (doc_2, _TOPIC_B)}
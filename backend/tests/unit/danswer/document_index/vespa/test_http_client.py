@@ -0,0 +1,85 @@
+import threading
+from collections.abc import Generator
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+from pytest_mock import MockFixture
+
+from danswer.document_index.vespa import http_client
+from danswer.document_index.vespa.http_client import get_vespa_http_client
+from danswer.document_index.vespa.http_client import get_vespa_http_client_stats
+from danswer.document_index.vespa.http_client import VespaHttpClientStats
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url() -> Generator[str, None, None]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(mocker: MockFixture) -> Generator[None, None, None]:
+    """Every test starts without a client, the one of the process is restored after"""
+    mocker.patch.object(http_client, "_client", None)
+    mocker.patch.object(http_client, "_client_pid", None)
+    mocker.patch.object(http_client, "_stats", VespaHttpClientStats())
+    yield
+    if http_client._client is not None:
+        http_client._client.close()
+
+
+def test_client_is_shared_within_a_process() -> None:
+    client = get_vespa_http_client()
+
+    assert get_vespa_http_client() is client
+    assert not client.is_closed
+
+
+def test_client_is_recreated_in_forked_processes(mocker: MockFixture) -> None:
+    client = get_vespa_http_client()
+    http_client._stats.num_requests = 5
+
+    mocker.patch.object(http_client.os, "getpid", return_value=-1)
+    forked_client = get_vespa_http_client()
+
+    assert forked_client is not client
+    assert get_vespa_http_client() is forked_client
+    # The stats of the parent process are not carried over
+    assert get_vespa_http_client_stats() == VespaHttpClientStats()
+
+
+def test_stats_count_reused_connections(server_url: str) -> None:
+    client = get_vespa_http_client()
+    for _ in range(3):
+        client.get(server_url).raise_for_status()
+
+    stats = get_vespa_http_client_stats()
+    assert stats == VespaHttpClientStats(num_requests=3, num_new_connections=1)
+    assert stats.num_reused_connections == 2
+    assert stats.summary() == (
+        "3 requests, 1 new connections, 2 over reused connections"
+    )
+    # A copy, later requests don't change it
+    client.get(server_url).raise_for_status()
+    assert stats.num_requests == 3
+    assert get_vespa_http_client_stats().num_requests == 4
@@ -0,0 +1,301 @@
+import json
+import threading
+import time
+from collections.abc import Callable
+from copy import deepcopy
+
+import httpx
+import pytest
+import requests
+from pytest_mock import MockFixture
+
+from danswer.document_index.document_index_utils import get_uuid_from_chunk_info
+from danswer.document_index.interfaces import ChunkSelection
+from danswer.document_index.interfaces import SelectionUpdateProgress
+from danswer.document_index.interfaces import SelectionUpdateRequest
+from danswer.document_index.interfaces import UpdateRequest
+from danswer.document_index.vespa import index as vespa_index
+from danswer.document_index.vespa.index import VespaIndex
+
+_INDEX = "danswer_chunk"
+_SECONDARY_INDEX = "danswer_chunk_new_model"
+
+
+def _use_transport(
+    mocker: MockFixture, handler: Callable[[httpx.Request], httpx.Response]
+) -> list[httpx.Request]:
+    """Routes the Vespa requests to `handler`, returns the requests it got"""
+    requests_sent: list[httpx.Request] = []
+    lock = threading.Lock()
+
+    def _handle(request: httpx.Request) -> httpx.Response:
+        with lock:
+            requests_sent.append(request)
+        return handler(request)
+
+    http_client = httpx.Client(transport=httpx.MockTransport(_handle))
+    mocker.patch.object(vespa_index, "get_vespa_http_client", return_value=http_client)
+    return requests_sent
+
+
+def _chunk_url(index_name: str, document_id: str, chunk_id: int) -> str:
+    chunk_uuid = get_uuid_from_chunk_info(document_id=document_id, chunk_id=chunk_id)
+    return (
+        f"{vespa_index.DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{chunk_uuid}"
+    )
+
+
+def test_update_addresses_chunks_from_their_counts(mocker: MockFixture) -> None:
+    requests_sent = _use_transport(mocker, lambda request: httpx.Response(200))
+    lookup = mocker.patch.object(
+        vespa_index,
+        "_get_vespa_chunk_ids_by_document_id",
+        return_value=["looked-up-chunk"],
+    )
+
+    VespaIndex(_INDEX, _SECONDARY_INDEX).update(
+        [
+            UpdateRequest(
+                document_ids=["doc_1", "doc_2"],
+                boost=3,
+                chunk_counts={"doc_1": {_INDEX: 2, _SECONDARY_INDEX: 1}},
+            )
+        ]
+    )
+
+    # doc_2 has no known chunk count, its chunks are looked up in each index
+    assert [call.kwargs for call in lookup.call_args_list] == [
+        {"document_id": "doc_2", "index_name": _INDEX},
+        {"document_id": "doc_2", "index_name": _SECONDARY_INDEX},
+    ]
+    assert sorted(str(request.url) for request in requests_sent) == sorted(
+        [
+            _chunk_url(_INDEX, "doc_1", 0),
+            _chunk_url(_INDEX, "doc_1", 1),
+            _chunk_url(_SECONDARY_INDEX, "doc_1", 0),
+            f"{vespa_index.DOCUMENT_ID_ENDPOINT.format(index_name=_INDEX)}/looked-up-chunk",
+            f"{vespa_index.DOCUMENT_ID_ENDPOINT.format(index_name=_SECONDARY_INDEX)}/looked-up-chunk",
+        ]
+    )
+    for request in requests_sent:
+        assert request.method == "PUT"
+        assert json.loads(request.content) == {
+            "fields": {vespa_index.BOOST: {"assign": 3}}
+        }
+
+
+def test_updates_are_bounded_by_max_in_flight(mocker: MockFixture) -> None:
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return httpx.Response(200)
+
+    requests_sent = _use_transport(mocker, _handler)
+    updates = [
+        vespa_index._VespaUpdateRequest(
+            document_id="doc",
+            url=_chunk_url(_INDEX, "doc", chunk_id),
+            update_request={},
+        )
+        for chunk_id in range(40)
+    ]
+
+    VespaIndex._apply_updates(updates, max_in_flight=4)
+
+    assert len(requests_sent) == 40
+    assert 1 < max_in_flight <= 4
+
+
+def test_no_updates_are_sent_after_a_failure(mocker: MockFixture) -> None:
+    def _handler(request: httpx.Request) -> httpx.Response:
+        if str(request.url).endswith(str(get_uuid_from_chunk_info("doc", 0))):
+            return httpx.Response(500)
+        return httpx.Response(200)
+
+    requests_sent = _use_transport(mocker, _handler)
+    updates = (
+        vespa_index._VespaUpdateRequest(
+            document_id="doc",
+            url=_chunk_url(_INDEX, "doc", chunk_id),
+            update_request={},
+        )
+        for chunk_id in range(100)
+    )
+
+    with pytest.raises(requests.HTTPError, match="Failed to update document: doc"):
+        VespaIndex._apply_updates(updates, max_in_flight=2)
+    assert len(requests_sent) < 100
+
+
+def test_stale_chunk_lookup_follows_continuations(mocker: MockFixture) -> None:
+    """More stale chunks than fit in a page, which offset based paging could not get
+    past once over the max offset of Vespa"""
+    # doc_1 shrank from 250 to 2 chunks, doc_2 is new
+    matching_chunks = [("doc_1", 0)] + [
+        ("doc_1", chunk_id) for chunk_id in range(2, 250)
+    ]
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        wanted = int(request.url.params["wantedDocumentCount"])
+        start = int(request.url.params.get("continuation", 0))
+        body: dict = {
+            "documents": [
+                {
+                    "id": f"id:default:{_INDEX}::"
+                    f"{get_uuid_from_chunk_info(document_id, chunk_id)}",
+                    "fields": {
+                        vespa_index.DOCUMENT_ID: document_id,
+                        vespa_index.CHUNK_ID: chunk_id,
+                    },
+                }
+                for document_id, chunk_id in matching_chunks[start : start + wanted]
+            ]
+        }
+        if start + wanted < len(matching_chunks):
+            body["continuation"] = str(start + wanted)
+        return httpx.Response(200, json=body)
+
+    requests_sent = _use_transport(mocker, _handler)
+
+    existing_docs, stale_chunk_ids = vespa_index._get_existing_docs_and_stale_chunk_ids(
+        new_chunk_counts={"doc_1": 2, 'doc_"2"': 1},
+        index_name=_INDEX,
+        http_client=vespa_index.get_vespa_http_client(),
+        chunks_per_visit=100,
+    )
+
+    assert existing_docs == {"doc_1"}
+    assert stale_chunk_ids == [
+        str(get_uuid_from_chunk_info("doc_1", chunk_id)) for chunk_id in range(2, 250)
+    ]
+    assert [request.url.params.get("continuation") for request in requests_sent] == [
+        None,
+        "100",
+        "200",
+    ]
+    assert requests_sent[0].method == "GET"
+    assert requests_sent[0].url.params["selection"] == (
+        f'({_INDEX}.{vespa_index.DOCUMENT_ID} == "doc_1" and '
+        f"({_INDEX}.{vespa_index.CHUNK_ID} == 0 or {_INDEX}.{vespa_index.CHUNK_ID} >= 2))"
+        f' or ({_INDEX}.{vespa_index.DOCUMENT_ID} == "doc_\\"2\\"" and '
+        f"({_INDEX}.{vespa_index.CHUNK_ID} == 0 or {_INDEX}.{vespa_index.CHUNK_ID} >= 1))"
+    )
+
+
+def test_build_vespa_selection() -> None:
+    assert (
+        vespa_index._build_vespa_selection(
+            ChunkSelection(document_set='Team "A" \\ B'), _INDEX
+        )
+        == f'{_INDEX}.{vespa_index.DOCUMENT_SETS} == "Team \\"A\\" \\\\ B"'
+    )
+    # An empty selection would match every chunk
+    with pytest.raises(ValueError):
+        vespa_index._build_vespa_selection(ChunkSelection(), _INDEX)
+
+
+def test_build_selection_update_fields() -> None:
+    assert vespa_index._build_selection_update_fields(
+        SelectionUpdateRequest(
+            selection=ChunkSelection(document_set="a"),
+            remove_document_sets={"a"},
+            boost=2,
+        )
+    ) == {
+        vespa_index.DOCUMENT_SETS: {"remove": {"a": 0}},
+        vespa_index.BOOST: {"assign": 2},
+    }
+    with pytest.raises(ValueError):
+        vespa_index._build_selection_update_fields(
+            SelectionUpdateRequest(
+                selection=ChunkSelection(document_set="a"),
+                add_document_sets={"b"},
+                remove_document_sets={"a"},
+            )
+        )
+
+
+def _selection_update_handler(
+    pages: dict[str, int],
+) -> Callable[[httpx.Request], httpx.Response]:
+    """Each index has `pages[index_name]` pages of 10 chunks, continuations are the
+    number of pages done"""
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        index_name = request.url.path.split("/")[-2]
+        page = int(request.url.params.get("continuation", 0)) + 1
+        body: dict = {"documentCount": 10}
+        if page < pages[index_name]:
+            body["continuation"] = str(page)
+        return httpx.Response(200, json=body)
+
+    return _handler
+
+
+def test_update_by_selection_follows_continuations(mocker: MockFixture) -> None:
+    requests_sent = _use_transport(
+        mocker, _selection_update_handler({_INDEX: 3, _SECONDARY_INDEX: 1})
+    )
+    reported: list[SelectionUpdateProgress] = []
+
+    progress = VespaIndex(_INDEX, _SECONDARY_INDEX).update_by_selection(
+        SelectionUpdateRequest(
+            selection=ChunkSelection(document_set="a"), remove_document_sets={"a"}
+        ),
+        progress_callback=lambda progress: reported.append(deepcopy(progress)),
+    )
+
+    assert progress == SelectionUpdateProgress(
+        continuations={_INDEX: None, _SECONDARY_INDEX: None}, num_chunks_updated=40
+    )
+    assert [request.url.params.get("continuation") for request in requests_sent] == [
+        None,
+        "1",
+        "2",
+        None,
+    ]
+    assert requests_sent[0].url.params["selection"] == (
+        f'{_INDEX}.{vespa_index.DOCUMENT_SETS} == "a"'
+    )
+    assert json.loads(requests_sent[0].content) == {
+        "fields": {vespa_index.DOCUMENT_SETS: {"remove": {"a": 0}}}
+    }
+    # Reported after every request, so an interrupted update can resume from the last one
+    assert [progress.continuations for progress in reported] == [
+        {_INDEX: "1"},
+        {_INDEX: "2"},
+        {_INDEX: None},
+        {_INDEX: None, _SECONDARY_INDEX: None},
+    ]
+
+
+def test_update_by_selection_resumes_from_progress(mocker: MockFixture) -> None:
+    requests_sent = _use_transport(
+        mocker, _selection_update_handler({_INDEX: 3, _SECONDARY_INDEX: 3})
+    )
+
+    progress = VespaIndex(_INDEX, _SECONDARY_INDEX).update_by_selection(
+        SelectionUpdateRequest(
+            selection=ChunkSelection(document_set="a"), remove_document_sets={"a"}
+        ),
+        # The primary index was done, the secondary index got through its first page
+        progress=SelectionUpdateProgress(
+            continuations={_INDEX: None, _SECONDARY_INDEX: "1"}, num_chunks_updated=40
+        ),
+    )
+
+    assert [
+        (request.url.path.split("/")[-2], request.url.params.get("continuation"))
+        for request in requests_sent
+    ] == [(_SECONDARY_INDEX, "1"), (_SECONDARY_INDEX, "2")]
+    assert progress.num_chunks_updated == 60
+    assert progress.continuations == {_INDEX: None, _SECONDARY_INDEX: None}
@@ -0,0 +1,34 @@
+import re
+from typing import Any
+
+import pytest
+
+_TOKEN_PAT = re.compile(r"\w+|[^\w\s]")
+
+
+class WordTokenizer:
+    """Stand-in for a Hugging Face tokenizer with one token per word or punctuation mark,
+    so that chunking can run without downloading a model"""
+
+    def __init__(self, is_fast: bool = True) -> None:
+        self.is_fast = is_fast
+
+    def tokenize(self, text: str) -> list[str]:
+        return _TOKEN_PAT.findall(text)
+
+    def __call__(self, text: str, **_: Any) -> dict[str, list[tuple[int, int]]]:
+        return {
+            "offset_mapping": [
+                (match.start(), match.end()) for match in _TOKEN_PAT.finditer(text)
+            ]
+        }
+
+
+@pytest.fixture
+def fast_tokenizer() -> WordTokenizer:
+    return WordTokenizer(is_fast=True)
+
+
+@pytest.fixture
+def slow_tokenizer() -> WordTokenizer:
+    return WordTokenizer(is_fast=False)
@@ -0,0 +1,81 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from pytest_mock import MockFixture
+
+from danswer.configs.constants import DocumentSource
+from danswer.connectors.models import Document
+from danswer.connectors.models import Section
+from danswer.indexing import chunker
+from danswer.indexing.chunker import DefaultChunker
+from danswer.indexing.chunker import ProcessPoolChunker
+from danswer.indexing.chunker import shutdown_chunking_pools
+
+
+def _make_doc(doc_id: str, num_sections: int) -> Document:
+    sections = [
+        Section(
+            text=" ".join(
+                f"Sentence {i} of section {section_ind} in {doc_id}."
+                for i in range(100)
+            ),
+            link=f"https://example.com/{doc_id}/{section_ind}",
+        )
+        for section_ind in range(num_sections)
+    ]
+    return Document(
+        id=doc_id,
+        sections=sections,
+        source=DocumentSource.WEB,
+        semantic_identifier=doc_id,
+        title=f"Title of {doc_id}",
+        metadata={},
+    )
+
+
+def _chunk_fields(chunk: Any) -> tuple:
+    return (
+        chunk.source_document.id,
+        chunk.chunk_id,
+        chunk.blurb,
+        chunk.content,
+        chunk.source_links,
+        chunk.section_continuation,
+    )
+
+
+def test_process_pool_chunker_matches_default_chunker(
+    mocker: MockFixture, fast_tokenizer: Any
+) -> None:
+    mocker.patch.object(chunker, "get_default_tokenizer", return_value=fast_tokenizer)
+    # Forked rather than spawned workers so they get the patched tokenizer
+    pool = ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("fork"))
+    mocker.patch.object(chunker, "_CHUNKING_POOLS", {2: pool})
+
+    documents = [_make_doc(f"doc_{i}", num_sections=i % 4 + 1) for i in range(12)]
+    try:
+        pooled_chunks = ProcessPoolChunker(num_workers=2).chunk_batch(documents)
+    finally:
+        shutdown_chunking_pools()
+    expected_chunks = DefaultChunker().chunk_batch(documents)
+
+    assert len(pooled_chunks) == len(documents)
+    for document, chunks, expected in zip(documents, pooled_chunks, expected_chunks):
+        assert len(chunks) > 1
+        assert [_chunk_fields(chunk) for chunk in chunks] == [
+            _chunk_fields(chunk) for chunk in expected
+        ]
+        # Not the copies that were sent back by the workers
+        assert all(chunk.source_document is document for chunk in chunks)
+
+
+def test_shutdown_chunking_pools(mocker: MockFixture) -> None:
+    pool = mocker.MagicMock()
+    pools = {2: pool}
+    mocker.patch.object(chunker, "_CHUNKING_POOLS", pools)
+
+    shutdown_chunking_pools()
+
+    pool.shutdown.assert_called_once_with(wait=True, cancel_futures=True)
+    assert pools == {}
@@ -0,0 +1,85 @@
+import unittest
+
+from danswer.configs.constants import DocumentSource
+from danswer.connectors.models import Document
+from danswer.connectors.models import Section
+from danswer.indexing.document_batching import DocBatchStats
+from danswer.indexing.document_batching import estimate_document_tokens
+from danswer.indexing.document_batching import rebatch_documents
+
+
+def _make_doc(doc_id: str, num_chars: int) -> Document:
+    return Document(
+        id=doc_id,
+        sections=[Section(text="a" * num_chars, link=None)],
+        source=DocumentSource.WEB,
+        semantic_identifier="",
+        title="",
+        metadata={},
+    )
+
+
+class TestRebatchDocuments(unittest.TestCase):
+    def test_merges_small_and_splits_large_batches(self) -> None:
+        small_docs = [_make_doc(f"small_{i}", 40) for i in range(6)]
+        large_docs = [_make_doc(f"large_{i}", 400) for i in range(3)]
+        stats = DocBatchStats()
+
+        batches = list(
+            rebatch_documents(
+                [small_docs[:3], small_docs[3:], large_docs],
+                token_budget=150,
+                max_docs=10,
+                stats=stats,
+            )
+        )
+
+        self.assertEqual(
+            [[doc.id for doc in batch] for batch in batches],
+            [
+                [doc.id for doc in small_docs],
+                ["large_0"],
+                ["large_1"],
+                ["large_2"],
+            ],
+        )
+        self.assertEqual(stats.num_batches, 4)
+        self.assertEqual(stats.num_docs, 9)
+        self.assertEqual(stats.num_oversized_batches, 0)
+
+    def test_oversized_document_gets_its_own_batch(self) -> None:
+        docs = [_make_doc("a", 40), _make_doc("huge", 4000), _make_doc("b", 40)]
+        stats = DocBatchStats()
+
+        batches = list(
+            rebatch_documents([docs], token_budget=100, max_docs=10, stats=stats)
+        )
+
+        self.assertEqual(
+            [[doc.id for doc in batch] for batch in batches], [["a"], ["huge"], ["b"]]
+        )
+        self.assertEqual(stats.num_oversized_batches, 1)
+        self.assertEqual(stats.max_batch_tokens, estimate_document_tokens(docs[1]))
+
+    def test_max_docs_and_repeated_documents(self) -> None:
+        docs = [_make_doc(f"doc_{i}", 4) for i in range(5)]
+
+        batches = list(
+            rebatch_documents([docs[:2], [docs[1]] + docs[2:]], 1000, max_docs=3)
+        )
+
+        self.assertEqual(
+            [[doc.id for doc in batch] for batch in batches],
+            [["doc_0", "doc_1"], ["doc_1", "doc_2", "doc_3"], ["doc_4"]],
+        )
+
+    def test_disabled_budget_keeps_connector_batches(self) -> None:
+        connector_batches = [[_make_doc("a", 4000)], [_make_doc("b", 4)]]
+
+        batches = list(rebatch_documents(connector_batches, token_budget=0))
+
+        self.assertEqual(batches, connector_batches)
+
+
+if __name__ == "__main__":
+    unittest.main()
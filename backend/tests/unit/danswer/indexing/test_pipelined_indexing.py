@@ -0,0 +1,170 @@
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockFixture
+
+from danswer.configs.constants import DocumentSource
+from danswer.connectors.models import Document
+from danswer.connectors.models import IndexAttemptMetadata
+from danswer.connectors.models import Section
+from danswer.indexing.pipelined_indexing import PipelinedIndexingRunner
+from danswer.indexing.pipelined_indexing import prefetch
+
+_MODULE = "danswer.indexing.pipelined_indexing"
+
+
+def _make_doc(doc_id: str) -> Document:
+    return Document(
+        id=doc_id,
+        sections=[Section(text=doc_id, link=None)],
+        source=DocumentSource.WEB,
+        semantic_identifier=doc_id,
+        title=doc_id,
+        metadata={},
+    )
+
+
+def test_prefetch_yields_in_order() -> None:
+    assert list(prefetch(iter(range(20)), max_prefetched=3)) == list(range(20))
+
+
+def test_prefetch_is_bounded() -> None:
+    produced: list[int] = []
+
+    def _items() -> Iterator[int]:
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    prefetched = prefetch(_items(), max_prefetched=2)
+    assert next(prefetched) == 0
+    time.sleep(0.2)
+    # The consumed item, a full queue and one blocked on the put
+    assert len(produced) <= 4
+    prefetched.close()
+
+
+def test_prefetch_reraises_producer_errors() -> None:
+    def _items() -> Iterator[int]:
+        yield 1
+        raise ValueError("connector failed")
+
+    prefetched = prefetch(_items(), max_prefetched=2)
+    assert next(prefetched) == 1
+    with pytest.raises(ValueError, match="connector failed"):
+        next(prefetched)
+
+
+def test_prefetch_close_stops_the_producer() -> None:
+    finished = threading.Event()
+
+    def _items() -> Iterator[int]:
+        try:
+            for i in range(1000):
+                yield i
+        finally:
+            finished.set()
+
+    prefetched = prefetch(_items(), max_prefetched=1)
+    assert next(prefetched) == 0
+    prefetched.close()
+    # The producer gives up on its blocked put at the next poll
+    assert finished.wait(timeout=5)
+
+
+@pytest.fixture
+def pipeline_mocks(mocker: MockFixture) -> dict[str, Any]:
+    mocker.patch(f"{_MODULE}.Session")
+    mocker.patch(f"{_MODULE}.get_sqlalchemy_engine")
+
+    def _prepare(*, documents: list[Document], **_: Any) -> MagicMock:
+        return MagicMock(updatable_docs=documents)
+
+    def _embed(*, prepared_batch: MagicMock, **_: Any) -> list:
+        return []
+
+    events: list[tuple[str, str]] = []
+    write_delays: dict[str, float] = {}
+
+    def _write(*, prepared_batch: MagicMock, **_: Any) -> tuple[int, int]:
+        batch_id = prepared_batch.updatable_docs[0].id
+        events.append(("write_start", batch_id))
+        time.sleep(write_delays.get(batch_id, 0))
+        events.append(("write_end", batch_id))
+        return 1, len(prepared_batch.updatable_docs)
+
+    prepare = mocker.patch(f"{_MODULE}.prepare_doc_batch", side_effect=_prepare)
+    mocker.patch(f"{_MODULE}.embed_doc_batch", side_effect=_embed)
+    mocker.patch(f"{_MODULE}.write_doc_batch", side_effect=_write)
+    return {"prepare": prepare, "events": events, "write_delays": write_delays}
+
+
+def _runner(max_in_flight_batches: int = 3) -> PipelinedIndexingRunner:
+    return PipelinedIndexingRunner(
+        embedder=MagicMock(),
+        document_index=MagicMock(),
+        chunker=MagicMock(),
+        max_prefetched_batches=2,
+        max_in_flight_batches=max_in_flight_batches,
+    )
+
+
+_METADATA = IndexAttemptMetadata(connector_id=1, credential_id=1)
+
+
+def test_run_yields_batches_in_order(pipeline_mocks: dict[str, Any]) -> None:
+    batches = [[_make_doc(f"doc_{i}"), _make_doc(f"doc_{i}_b")] for i in range(6)]
+    # Earlier batches finishing last must not change the order results come back in
+    pipeline_mocks["write_delays"].update({"doc_0": 0.1, "doc_1": 0.05})
+
+    results = list(_runner().run(batches, _METADATA))
+
+    assert [batch for batch, _, _ in results] == batches
+    assert [(new_docs, chunks) for _, new_docs, chunks in results] == [(1, 2)] * 6
+
+
+def test_run_waits_for_overlapping_batches(pipeline_mocks: dict[str, Any]) -> None:
+    batches = [[_make_doc("a")], [_make_doc("b")], [_make_doc("a")]]
+    pipeline_mocks["write_delays"]["a"] = 0.1
+    prepare_calls: list[str] = []
+    events = pipeline_mocks["events"]
+
+    def _prepare(*, documents: list[Document], **_: Any) -> MagicMock:
+        prepare_calls.append(documents[0].id)
+        if len(prepare_calls) == 3:
+            # The second batch with "a" is only started once the first one was written
+            assert ("write_end", "a") in events
+        return MagicMock(updatable_docs=documents)
+
+    pipeline_mocks["prepare"].side_effect = _prepare
+
+    results = list(_runner().run(batches, _METADATA))
+
+    assert [batch for batch, _, _ in results] == batches
+    assert prepare_calls == ["a", "b", "a"]
+
+
+def test_run_checks_for_stops_before_submitting(pipeline_mocks: dict[str, Any]) -> None:
+    batches = [[_make_doc(f"doc_{i}")] for i in range(5)]
+    num_checks = 0
+
+    def _raise_if_stopped() -> None:
+        nonlocal num_checks
+        num_checks += 1
+        if num_checks == 3:
+            raise RuntimeError("Connector was disabled mid run")
+
+    # One batch in flight at a time so every submitted batch is done before the next check
+    runner = _runner(max_in_flight_batches=1)
+    with pytest.raises(RuntimeError, match="disabled mid run"):
+        list(runner.run(batches, _METADATA, raise_if_stopped=_raise_if_stopped))
+
+    # Only the batches submitted before the stop were processed
+    assert pipeline_mocks["prepare"].call_count == 2
+    assert [
+        batch_id for event, batch_id in pipeline_mocks["events"] if event == "write_end"
+    ] == ["doc_0", "doc_1"]
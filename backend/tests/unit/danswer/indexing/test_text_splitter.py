@@ -0,0 +1,100 @@
+from typing import Any
+
+import pytest
+from llama_index.text_splitter import SentenceSplitter
+
+from danswer.indexing.text_splitter import get_text_splitter
+from danswer.indexing.text_splitter import OffsetTextSplitter
+
+
+def _sentences(num_sentences: int) -> str:
+    return " ".join(
+        f"Sentence number {i} talks about topic {i % 7} at some length."
+        for i in range(num_sentences)
+    )
+
+
+def _without_whitespace(text: str) -> str:
+    return "".join(text.split())
+
+
+def test_chunks_stay_within_token_limit(fast_tokenizer: Any) -> None:
+    text = "\n\n".join(_sentences(num_sentences) for num_sentences in (3, 40, 1, 25))
+    splitter = OffsetTextSplitter(fast_tokenizer, chunk_size=40, chunk_overlap=8)
+
+    chunks = splitter.split_text(text)
+
+    assert len(chunks) > 1
+    assert all(len(fast_tokenizer.tokenize(chunk)) <= 40 for chunk in chunks)
+
+
+def test_no_text_is_lost(fast_tokenizer: Any) -> None:
+    text = _sentences(50) + "\n\nA final paragraph!\nWith a line break"
+    splitter = OffsetTextSplitter(fast_tokenizer, chunk_size=30)
+
+    chunks = splitter.split_text(text)
+
+    assert _without_whitespace("".join(chunks)) == _without_whitespace(text)
+
+
+def test_chunks_end_on_sentence_boundaries(fast_tokenizer: Any) -> None:
+    # Each sentence is 11 tokens, 3 of them fit in a chunk
+    splitter = OffsetTextSplitter(fast_tokenizer, chunk_size=40)
+
+    chunks = splitter.split_text(_sentences(20))
+
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert all(len(fast_tokenizer.tokenize(chunk)) == 33 for chunk in chunks[:-1])
+
+
+def test_overlap(fast_tokenizer: Any) -> None:
+    # Words only, so every chunk ends at a word boundary at the token limit
+    words = [f"word{i}" for i in range(200)]
+    splitter = OffsetTextSplitter(fast_tokenizer, chunk_size=50, chunk_overlap=10)
+
+    chunks = [chunk.split() for chunk in splitter.split_text(" ".join(words))]
+
+    assert chunks[0] == words[:50]
+    for prev_chunk, chunk in zip(chunks, chunks[1:]):
+        assert chunk[:10] == prev_chunk[-10:]
+        assert len(chunk) <= 50
+    assert chunks[-1][-1] == words[-1]
+
+
+def test_text_without_boundaries(fast_tokenizer: Any) -> None:
+    # 599 tokens without whitespace or sentence ends, split at the token limit
+    text = ".".join(["ab"] * 300)
+    splitter = OffsetTextSplitter(fast_tokenizer, chunk_size=100)
+
+    chunks = splitter.split_text(text)
+
+    assert [len(fast_tokenizer.tokenize(chunk)) for chunk in chunks] == [100] * 5 + [99]
+    assert "".join(chunks) == text
+
+
+def test_whitespace_and_short_text(fast_tokenizer: Any) -> None:
+    splitter = OffsetTextSplitter(fast_tokenizer, chunk_size=20)
+
+    assert splitter.split_text("") == []
+    assert splitter.split_text(" \n\n\t ") == []
+    assert splitter.split_text("  Short text.\n") == ["Short text."]
+
+
+def test_overlap_must_be_smaller_than_chunk_size(fast_tokenizer: Any) -> None:
+    with pytest.raises(ValueError):
+        OffsetTextSplitter(fast_tokenizer, chunk_size=20, chunk_overlap=20)
+
+
+def test_slow_tokenizers_use_sentence_splitter(
+    fast_tokenizer: Any, slow_tokenizer: Any
+) -> None:
+    assert isinstance(
+        get_text_splitter(fast_tokenizer, chunk_size=40), OffsetTextSplitter
+    )
+
+    splitter = get_text_splitter(slow_tokenizer, chunk_size=40)
+
+    assert isinstance(splitter, SentenceSplitter)
+    chunks = splitter.split_text(_sentences(20))
+    assert len(chunks) > 1
+    assert all(len(slow_tokenizer.tokenize(chunk)) <= 40 for chunk in chunks)
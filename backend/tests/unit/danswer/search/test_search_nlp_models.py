@@ -0,0 +1,101 @@
+import json
+from unittest.mock import MagicMock
+
+import numpy as np
+import requests
+from pytest_mock import MockFixture
+
+from danswer.indexing.embedding_cache import EmbeddingCache
+from danswer.indexing.models import EmbeddingArray
+from danswer.search.search_nlp_models import EmbeddingModel
+from danswer.search.search_nlp_models import EmbedTextType
+from shared_models.embedding_serialization import EMBEDDINGS_BINARY_CONTENT_TYPE
+from shared_models.embedding_serialization import serialize_embeddings
+
+
+class _InMemoryEmbeddingCache(EmbeddingCache):
+    def __init__(self) -> None:
+        super().__init__()
+        self.entries: dict[str, EmbeddingArray] = {}
+
+    def _get_embeddings(
+        self, model_name: str, normalize: bool, prefix: str, texts: list[str]
+    ) -> list[EmbeddingArray | None]:
+        return [self.entries.get(text) for text in texts]
+
+    def _store_embeddings(
+        self,
+        model_name: str,
+        normalize: bool,
+        prefix: str,
+        texts: list[str],
+        embeddings: list[EmbeddingArray],
+    ) -> None:
+        self.entries.update(zip(texts, embeddings))
+
+
+def _fake_embeddings(texts: list[str]) -> np.ndarray:
+    return np.array([[len(text), 0.25, -1.0] for text in texts])
+
+
+def _build_response(texts: list[str], binary: bool) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    if binary:
+        response.headers["Content-Type"] = EMBEDDINGS_BINARY_CONTENT_TYPE
+        response._content = serialize_embeddings(_fake_embeddings(texts))
+    else:
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(
+            {"embeddings": _fake_embeddings(texts).tolist()}
+        ).encode()
+    return response
+
+
+def _mock_model_server(mocker: MockFixture, binary: bool) -> MagicMock:
+    return mocker.patch(
+        "danswer.search.search_nlp_models.requests.post",
+        side_effect=lambda url, **kwargs: _build_response(
+            kwargs["json"]["texts"], binary
+        ),
+    )
+
+
+def _build_model(cache: EmbeddingCache | None = None) -> EmbeddingModel:
+    return EmbeddingModel(
+        model_name="test-model",
+        query_prefix="query: ",
+        passage_prefix="passage: ",
+        normalize=True,
+        server_host="model-server",
+        server_port=9000,
+        embedding_cache=cache,
+    )
+
+
+def test_binary_and_json_responses_decode_the_same(mocker: MockFixture) -> None:
+    texts = ["a", "bbb"]
+    expected = _fake_embeddings(["passage: a", "passage: bbb"]).astype(np.float32)
+
+    for binary in [True, False]:
+        _mock_model_server(mocker, binary)
+        embeddings = _build_model().encode(texts, text_type=EmbedTextType.PASSAGE)
+
+        assert embeddings.dtype == np.float32
+        np.testing.assert_array_equal(embeddings, expected)
+
+
+def test_cached_embeddings_are_merged_in_order(mocker: MockFixture) -> None:
+    cache = _InMemoryEmbeddingCache()
+    cache.entries["b"] = np.array([7, 7, 7], dtype=np.float32)
+    post = _mock_model_server(mocker, binary=True)
+
+    embeddings = _build_model(cache).encode(
+        ["a", "b", "cc"], text_type=EmbedTextType.QUERY
+    )
+
+    # Only the misses are sent to the model server, prefixed, and cached unprefixed
+    assert post.call_args.kwargs["json"]["texts"] == ["query: a", "query: cc"]
+    assert embeddings.tolist() == [[8, 0.25, -1], [7, 7, 7], [9, 0.25, -1]]
+    assert sorted(cache.entries) == ["a", "b", "cc"]
+    assert (cache.hits, cache.misses) == (1, 2)
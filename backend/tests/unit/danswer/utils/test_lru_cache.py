@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import patch
+
+from danswer.utils.lru_cache import TTLLRUCache
+
+
+class TestTTLLRUCache(unittest.TestCase):
+    def test_entries_expire_after_ttl(self) -> None:
+        cache: TTLLRUCache[str, int] = TTLLRUCache(max_size=10, ttl_seconds=60)
+        with patch("danswer.utils.lru_cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("danswer.utils.lru_cache.time.monotonic", return_value=160.0):
+            self.assertEqual(cache.get("a"), 1)
+        with patch("danswer.utils.lru_cache.time.monotonic", return_value=160.5):
+            self.assertIsNone(cache.get("a"))
+
+        # Expired entries are dropped on access
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_is_evicted(self) -> None:
+        cache: TTLLRUCache[str, int] = TTLLRUCache(max_size=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        # Reading "a" makes "b" the least recently used
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_keys(self) -> None:
+        cache: TTLLRUCache[tuple[int, str], str] = TTLLRUCache(
+            max_size=10, ttl_seconds=60
+        )
+        cache.set((1, "query"), "first")
+        cache.set((2, "query"), "other model")
+        cache.set((1, "query"), "second")
+
+        # Equal keys share an entry, any differing part of a key is a different entry
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get((1, "query")), "second")
+        self.assertEqual(cache.get((2, "query")), "other model")
+        self.assertIsNone(cache.get((1, "query ")))
+
+        cache.clear()
+        self.assertIsNone(cache.get((1, "query")))
+
+    def test_zero_size_disables_cache(self) -> None:
+        cache: TTLLRUCache[str, int] = TTLLRUCache(max_size=0, ttl_seconds=60)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
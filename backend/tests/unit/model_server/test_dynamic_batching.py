@@ -0,0 +1,82 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from model_server.dynamic_batching import DynamicBatcher
+
+
+class _RecordingProcessor:
+    """Squares the items, fails for negative ones, and records every call"""
+
+    def __init__(self) -> None:
+        self.calls: list[list[int]] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, items: list[int]) -> list[int]:
+        with self._lock:
+            self.calls.append(list(items))
+        if any(item < 0 for item in items):
+            raise ValueError("negative item")
+        return [item * item for item in items]
+
+
+def _submit_concurrently(
+    batcher: DynamicBatcher[int, int], requests: list[list[int]]
+) -> list[list[int] | Exception]:
+    def _submit(items: list[int]) -> list[int] | Exception:
+        try:
+            return batcher.submit(items)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+        return list(executor.map(_submit, requests))
+
+
+class TestDynamicBatcher(unittest.TestCase):
+    def test_concurrent_requests_are_coalesced(self) -> None:
+        processor = _RecordingProcessor()
+        batcher = DynamicBatcher("test", processor, max_batch_size=100, max_wait_ms=500)
+
+        results = _submit_concurrently(batcher, [[1, 2], [3], [4, 5, 6]])
+
+        self.assertEqual(results, [[1, 4], [9], [16, 25, 36]])
+        self.assertEqual(len(processor.calls), 1)
+        self.assertEqual(sorted(processor.calls[0]), [1, 2, 3, 4, 5, 6])
+
+    def test_batches_are_capped_at_max_batch_size(self) -> None:
+        processor = _RecordingProcessor()
+        batcher = DynamicBatcher("test", processor, max_batch_size=4, max_wait_ms=500)
+
+        results = _submit_concurrently(batcher, [[1, 2], [3, 4], [5, 6]])
+
+        self.assertEqual(results, [[1, 4], [9, 16], [25, 36]])
+        self.assertTrue(all(len(call) <= 4 for call in processor.calls))
+        # Requests at least the max batch size are not queued at all
+        self.assertEqual(batcher.submit([1, 2, 3, 4]), [1, 4, 9, 16])
+
+    def test_lone_request_runs_after_the_wait(self) -> None:
+        processor = _RecordingProcessor()
+        batcher = DynamicBatcher("test", processor, max_batch_size=100, max_wait_ms=50)
+
+        start = time.monotonic()
+        self.assertEqual(batcher.submit([3]), [9])
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(processor.calls, [[3]])
+
+    def test_failure_only_reaches_the_failing_request(self) -> None:
+        processor = _RecordingProcessor()
+        batcher = DynamicBatcher("test", processor, max_batch_size=100, max_wait_ms=500)
+
+        results = _submit_concurrently(batcher, [[1, 2], [-1], [3]])
+
+        self.assertEqual(results[0], [1, 4])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], [9])
+        # The failed batch, then each of its requests on its own
+        self.assertEqual(len(processor.calls), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from typing import Any
+from unittest.mock import patch
+
+import numpy as np
+
+from model_server import onnx_models
+from model_server.onnx_models import _build_file_once
+from model_server.onnx_models import load_onnx_embedding_model
+from model_server.onnx_models import load_onnx_reranking_model
+from model_server.onnx_models import OnnxSentenceEncoder
+
+
+class _FakeTokenizer:
+    """Every word is a token, the token ids are the number of words of the text"""
+
+    def __call__(self, texts: list[str], **kwargs: Any) -> dict[str, np.ndarray]:
+        lengths = [len(text.split()) for text in texts]
+        max_length = max(lengths)
+        attention_mask = np.array(
+            [[1] * length + [0] * (max_length - length) for length in lengths]
+        )
+        input_ids = np.array(lengths)[:, None] * attention_mask
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+
+def _fake_run_session(
+    session: Any, encoded_inputs: dict[str, np.ndarray]
+) -> np.ndarray:
+    """Hidden state of each token is [token id, position], padding gets garbage values"""
+    input_ids = encoded_inputs["input_ids"]
+    positions = np.broadcast_to(np.arange(input_ids.shape[1]), input_ids.shape)
+    hidden_states = np.stack([input_ids, positions], axis=-1).astype(np.float32)
+    hidden_states[encoded_inputs["attention_mask"] == 0] = 1000.0
+    return hidden_states
+
+
+def _build_encoder(pooling_mode: str, always_normalize: bool) -> OnnxSentenceEncoder:
+    encoder = OnnxSentenceEncoder.__new__(OnnxSentenceEncoder)
+    encoder.model_name = "test-model"
+    encoder.pooling_mode = pooling_mode
+    encoder.always_normalize = always_normalize
+    encoder.max_seq_length = 512
+    encoder.tokenizer = _FakeTokenizer()
+    encoder.session = None
+    return encoder
+
+
+class _FixedOutputModel:
+    def __init__(self, output: np.ndarray) -> None:
+        self.output = output
+
+    def encode(self, texts: list[str], **kwargs: Any) -> np.ndarray:
+        return self.output[: len(texts)]
+
+    def predict(self, pairs: list[tuple[str, str]], **kwargs: Any) -> np.ndarray:
+        return self.output[: len(pairs)]
+
+
+@patch("model_server.onnx_models._run_session", _fake_run_session)
+class TestOnnxSentenceEncoderPooling(unittest.TestCase):
+    texts = ["one two three", "one", "one two three four five"]
+
+    def test_mean_pooling_ignores_padding(self) -> None:
+        embeddings = _build_encoder("mean", always_normalize=False).encode(self.texts)
+
+        # Mean of the positions of the real tokens, in the order of the input texts
+        np.testing.assert_allclose(embeddings, [[3, 1], [1, 0], [5, 2]])
+        self.assertEqual(embeddings.dtype, np.float32)
+
+    def test_cls_pooling(self) -> None:
+        embeddings = _build_encoder("cls", always_normalize=False).encode(self.texts)
+
+        np.testing.assert_allclose(embeddings, [[3, 0], [1, 0], [5, 0]])
+
+    def test_normalization(self) -> None:
+        embeddings = _build_encoder("mean", always_normalize=True).encode(self.texts)
+        np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1, rtol=1e-6)
+
+        embeddings = _build_encoder("cls", always_normalize=False).encode(
+            self.texts, normalize_embeddings=True
+        )
+        np.testing.assert_allclose(embeddings, [[1, 0], [1, 0], [1, 0]])
+
+    def test_batches_keep_input_order(self) -> None:
+        texts = [" ".join(["word"] * (ind % 7 + 1)) for ind in range(70)]
+        embeddings = _build_encoder("cls", always_normalize=False).encode(texts)
+
+        np.testing.assert_allclose(
+            embeddings[:, 0], [len(text.split()) for text in texts]
+        )
+
+
+class TestParityCheck(unittest.TestCase):
+    def setUp(self) -> None:
+        self.reference = np.random.default_rng(0).standard_normal((4, 8))
+
+    def test_embedding_model_parity(self) -> None:
+        model = _FixedOutputModel(self.reference)
+        matching_onnx = _FixedOutputModel(self.reference * 2 + 1e-4)
+        with patch.object(
+            onnx_models, "OnnxSentenceEncoder", return_value=matching_onnx
+        ):
+            self.assertIs(load_onnx_embedding_model(model, "test-model"), matching_onnx)
+
+        diverging_onnx = _FixedOutputModel(-self.reference)
+        with patch.object(
+            onnx_models, "OnnxSentenceEncoder", return_value=diverging_onnx
+        ):
+            self.assertIs(load_onnx_embedding_model(model, "test-model"), model)
+
+        with patch.object(onnx_models, "OnnxSentenceEncoder", side_effect=RuntimeError):
+            self.assertIs(load_onnx_embedding_model(model, "test-model"), model)
+
+    def test_reranking_model_parity(self) -> None:
+        scores = np.random.default_rng(0).standard_normal(16)
+        model = _FixedOutputModel(scores)
+        matching_onnx = _FixedOutputModel(scores + 1)
+        with patch.object(onnx_models, "OnnxCrossEncoder", return_value=matching_onnx):
+            self.assertIs(load_onnx_reranking_model(model, "test-model"), matching_onnx)
+
+        # Constant scores have no correlation (NaN), which must not pass either
+        constant_onnx = _FixedOutputModel(np.zeros(16))
+        with patch.object(onnx_models, "OnnxCrossEncoder", return_value=constant_onnx):
+            self.assertIs(load_onnx_reranking_model(model, "test-model"), model)
+
+
+class TestBuildFileOnce(unittest.TestCase):
+    def test_concurrent_builds_run_once(self) -> None:
+        builds: list[str] = []
+
+        def _build(tmp_path: str) -> None:
+            builds.append(tmp_path)
+            with open(tmp_path, "w") as f:
+                f.write("partial")
+                time.sleep(0.2)
+                f.write(" done")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "model", "model.onnx")
+            threads = [
+                threading.Thread(target=_build_file_once, args=(path, _build))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(len(builds), 1)
+            with open(path) as f:
+                self.assertEqual(f.read(), "partial done")
+
+    def test_failed_build_is_not_cached(self) -> None:
+        def _failing_build(tmp_path: str) -> None:
+            with open(tmp_path, "w") as f:
+                f.write("partial")
+            raise RuntimeError("export failed")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "model.onnx")
+            with self.assertRaises(RuntimeError):
+                _build_file_once(path, _failing_build)
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import struct
+import unittest
+
+import numpy as np
+
+from shared_models.embedding_serialization import build_binary_accept_header
+from shared_models.embedding_serialization import deserialize_embeddings
+from shared_models.embedding_serialization import get_requested_binary_dtype
+from shared_models.embedding_serialization import serialize_embeddings
+
+
+class TestEmbeddingSerialization(unittest.TestCase):
+    def setUp(self) -> None:
+        self.embeddings = np.random.default_rng(0).standard_normal((3, 8))
+
+    def test_float32_round_trip(self) -> None:
+        payload = serialize_embeddings(self.embeddings)
+        decoded = deserialize_embeddings(payload)
+
+        self.assertEqual(len(payload), 16 + 3 * 8 * 4)
+        self.assertEqual(decoded.dtype, np.dtype("<f4"))
+        np.testing.assert_array_equal(decoded, self.embeddings.astype(np.float32))
+        # A view over the payload rather than a copy
+        self.assertFalse(decoded.flags.writeable)
+
+    def test_float16_round_trip(self) -> None:
+        payload = serialize_embeddings(self.embeddings, dtype="float16")
+        decoded = deserialize_embeddings(payload)
+
+        self.assertEqual(len(payload), 16 + 3 * 8 * 2)
+        self.assertEqual(decoded.dtype, np.dtype("<f2"))
+        np.testing.assert_allclose(decoded, self.embeddings, atol=1e-2)
+
+    def test_header(self) -> None:
+        payload = serialize_embeddings(self.embeddings, dtype="float16")
+        self.assertEqual(
+            struct.unpack_from("<4sBBxxII", payload), (b"DEMB", 1, 1, 3, 8)
+        )
+
+        with self.assertRaises(ValueError):
+            deserialize_embeddings(b"XXXX" + payload[4:])
+        with self.assertRaises(ValueError):
+            deserialize_embeddings(payload[:-1])
+        with self.assertRaises(ValueError):
+            deserialize_embeddings(payload[:10])
+        with self.assertRaises(ValueError):
+            serialize_embeddings(self.embeddings[0])
+
+    def test_accept_header_negotiation(self) -> None:
+        # Clients fall back to JSON, for which no binary dtype is requested
+        self.assertIsNone(get_requested_binary_dtype(None))
+        self.assertIsNone(get_requested_binary_dtype("application/json"))
+        self.assertEqual(
+            get_requested_binary_dtype("application/x-danswer-embeddings"), "float32"
+        )
+        for dtype in ["float32", "float16"]:
+            self.assertEqual(
+                get_requested_binary_dtype(build_binary_accept_header(dtype)), dtype
+            )
+        with self.assertRaises(ValueError):
+            build_binary_accept_header("int8")
+
+
+if __name__ == "__main__":
+    unittest.main()